@@ -3,214 +3,328 @@ ast分析依赖
 @author: xmqsvip
 Created on 2025-01-05
 """
-import copy
+import importlib.machinery
 import logging
 import os
+import pickle
 import re
 import sys
 
 from soeasypack.core.re_find_pkg import find_pkgs, CHECK_PKGS, EXCLUDE_DIRS
-from soeasypack.lib.modulegraph2 import ModuleGraph, PyPIDistribution
+from soeasypack.core.pkg_hooks import DirListing, hook_files
+from soeasypack.core.pe_imports import dll_closure, load_import_cache, save_import_cache
+from soeasypack.core.ref_scan import compile_names, find_names, find_names_in_file
+from soeasypack.core.tree_scan import SHARED_SCANNER
+from soeasypack.lib.modulegraph2 import ModuleGraph, NamespacePackage, Package, PyPIDistribution
 
 logging.getLogger("comtypes").setLevel(logging.ERROR)
 
 
-def add_depends(depends: set, special_pkgs: set):
+# # 去除注释和文档字符串
+STRIP_COMMENT_COMPILE = re.compile(r'(?<!\\)#.*?$|(?:\'\'\'[\s\S]*?\'\'\'|\"\"\"[\s\S]*?\"\"\")', flags=re.MULTILINE)
+
+
+def site_package_path(depend_path: str):
+    """
+    site-packages下的文件所属的顶层包(或单文件模块)路径
+    :param depend_path:
+    :return: 不在site-packages下时返回None
+    """
+    head, sep, tail = depend_path.partition('site-packages')
+    if not sep:
+        return None
+    parts = re.split(r'[\\/]', tail, 2)
+    if len(parts) < 2 or not parts[1]:
+        return None
+    return os.path.join(head + sep, parts[1])
+
+
+def package_depends(package_path: str, depends: set, import_cache: dict = None) -> set:
+    """
+    查找包内可能需要的文件: json/pem文件, pyd和py文件引用的pyd/dll以及dll的传递依赖
+    :param package_path: site-packages下的包目录
+    :param depends: 依赖图中的文件
+    :param import_cache: pyd/dll导入表缓存
+    :return: 需要补充的文件集合
+    """
+    add_depend_paths = set()
+    py_files_path = []
+    other_files = {}
+    py_files_append = py_files_path.append
+    # # pyside的插件由钩子按需补充, 遍历时直接跳过
+    skip_dirs = {'__pycache__', 'plugins'} if 'PySide' in package_path else {'__pycache__'}
+    for entry in SHARED_SCANNER.walk_files(package_path, lambda root, names: skip_dirs.intersection(names)):
+        f = entry.name
+        file_path = entry.path
+        if f.endswith('.pyx'):
+            py_files_append(file_path)
+        elif f.endswith('.py'):
+            if file_path in depends:
+                py_files_append(file_path)
+        elif f.endswith(('.json', '.pem')):
+            add_depend_paths.add(file_path)
+        elif f.endswith('.dll'):
+            other_files[f] = file_path
+        elif f.endswith('.pyd'):
+            other_files[f.split('.', 1)[0]] = file_path
+
+    if not other_files:
+        return add_depend_paths
+    # # pyd之间的引用: pyd中出现'.'+模块名; py文件中按不含后缀的dll/pyd名称查找(ctypes等按名称加载)
+    # # 包内所有名称合并成一个正则, 每个文件只扫描一遍
+    pyd_names = {}
+    text_names = {}
+    for dll_file_name in other_files:
+        if not dll_file_name.endswith('.dll'):
+            pyd_names[b'.' + dll_file_name.encode('utf-8')] = dll_file_name
+        text_names.setdefault(dll_file_name.split('.', 1)[0], []).append(dll_file_name)
+    pyd_compile = compile_names(pyd_names)
+    text_compile = compile_names(text_names)
+
+    py_files_path.extend(other_files.values())
+    binaries = []
+    for file in py_files_path:
+        if file.endswith('.dll'):
+            continue
+        file_name = os.path.basename(file)
+        if file.endswith(('.py', 'pyx')):
+            with open(file, mode='r', encoding='utf-8') as fp:
+                content = STRIP_COMMENT_COMPILE.sub('', fp.read())
+            found = {dll_file_name for base_dll_name in find_names(text_compile, content)
+                     for dll_file_name in text_names[base_dll_name]}
+        else:
+            binaries.append(file)
+            found = {pyd_names[name] for name in find_names_in_file(pyd_compile, file)}
+
+        for dll_file_name in found:
+            if dll_file_name.split('.', 1)[0].replace('Qt6', '') not in file_name:
+                add_depend_paths.add(other_files[dll_file_name])
+                if dll_file_name.endswith('.dll'):
+                    binaries.append(other_files[dll_file_name])
+
+    # # pyd和上面找到的dll依赖的dll: 读取导入表和延迟导入表, 包括dll之间的传递依赖
+    dll_paths = {name.lower(): path for name, path in other_files.items() if name.endswith('.dll')}
+    add_depend_paths.update(dll_closure(binaries, dll_paths, import_cache))
+
+    return add_depend_paths
+
+
+def exclude_depends(add_depend_paths: set, depends: set) -> set:
+    """
+    排除规则, 收集完所有包需要补充的文件后统一过滤一次:
+    依赖图中没有QtWebEngine模块时, 去除pyside包中Web相关的文件
+    :param add_depend_paths: 需要补充的文件
+    :param depends: 依赖图中的文件
+    :return: 过滤后的文件集合
+    """
+    if any('QtWebEngine' in os.path.basename(path) for path in depends):
+        return add_depend_paths
+
+    excluded = set()
+    for path in add_depend_paths:
+        package_path = site_package_path(path)
+        if package_path and 'PySide' in os.path.basename(package_path) and 'Web' in path[len(package_path):]:
+            excluded.add(path)
+    return add_depend_paths - excluded
+
+
+def add_depends(depends: set, packages: dict, cache_dir: str = None):
     """
     补充依赖文件
+    :param depends:
+    :param packages: 依赖图中的顶层包, {包名: 包目录, 单文件模块或命名空间包为None}
+    :param cache_dir: 缓存pyd/dll导入表的目录
     """
-    add_depend_paths = []
-    depend_paths_append = add_depend_paths.append
+    import_cache = load_import_cache(cache_dir)
+    add_depend_paths = set()
     checked_dir = set()
-    has_web_engine = False
-    sub_compile = re.compile(r'(?<!\\)#.*?$|(?:\'\'\'[\s\S]*?\'\'\'|\"\"\"[\s\S]*?\"\"\")', flags=re.MULTILINE)
     # # 查找可能需要的文件
     for depend_path in depends:
-        if 'site-packages' not in depend_path:
-            continue
-        depend_path_split = depend_path.split('site-packages')
-        package_name = depend_path_split[1].split('\\', 2)[1]
-        package_path = depend_path_split[0] + f'site-packages\\{package_name}'
-        if package_path in checked_dir or os.path.isfile(package_path):
+        package_path = site_package_path(depend_path)
+        if package_path is None or package_path in checked_dir or os.path.isfile(package_path):
             continue
         checked_dir.add(package_path)
+        add_depend_paths |= package_depends(package_path, depends, import_cache)
 
-        py_files_path = []
-        other_files = {}
-        py_files_append = py_files_path.append
-        for root, dirs, files in os.walk(package_path):
-            if '__pycache__' in root or ('plugins' in root and 'PySide' in root):
-                continue
-            for f in files:
-                file_path = os.path.join(root, f)
-                if f.endswith('.pyx'):
-                    py_files_append(file_path)
-                elif f.endswith('.py'):
-                    if file_path in depends:
-                        py_files_append(file_path)
-                else:
-                    file_name = os.path.basename(file_path)
-                    if f.endswith(('.json', '.pem')):
-                        add_depend_paths.append(file_path)
-                        continue
-                    elif f.endswith('.dll'):
-                        other_files[file_name] = file_path
-                    elif f.endswith('.pyd'):
-                        file_name = file_name.split('.', 1)[0]
-                        other_files[file_name] = file_path
-
-        has_pyside = False
-        # # 判断似乎否有 QtWebEngine
-        if 'PySide' in package_path:
-            has_pyside = True
-            if 'QtWebEngineWidgets' in depends:
-                has_web_engine = True
-
-        if not other_files:
-            continue
-        py_files_path.extend(other_files.values())
-        for file in py_files_path:
-            if file.endswith('.dll'):
-                continue
-            file_name = os.path.basename(file)
-            mode = 'rb'
-            encodings = None
-            if file.endswith(('.py', 'pyx')):
-                mode = 'r'
-                encodings = 'utf-8'
-
-            with open(file, mode=mode, encoding=encodings) as fp:
-                content = fp.read()
-
-            for dll_file_name in other_files:
-                base_dll_name = dll_file_name.split('.', 1)[0]
-                if base_dll_name.replace('Qt6', '') not in file_name:
-                    is_in = False
-                    if mode == 'rb':
-                        dll_file_name = dll_file_name.encode('utf-8')
-                        if dll_file_name.endswith(b'.dll'):
-                            if dll_file_name in content:
-                                is_in = True
-                        else:
-                            # # pyd
-                            if b'.' + dll_file_name in content:
-                                is_in = True
-                    else:
-                        # # py
-                        # # 去除注释和文档字符串
-                        content = sub_compile.sub('', content)
-                        if dll_file_name in content or base_dll_name in content:
-                            is_in = True
-
-                    if is_in:
-                        if mode == 'rb':
-                            dll_file_name = dll_file_name.decode('utf-8')
-                        depend_paths_append(other_files[dll_file_name])
-
-            del content
-            # # 去除WebEngine
-            if not has_web_engine:
-                depends_ = copy.deepcopy(add_depend_paths)
-                for depend in depends_:
-                    if 'Web' in depend:
-                        add_depend_paths.remove(depend)
-                del depends_
-
-        # # 补充pyside/plugins文件夹内容
-        if has_pyside:
-            file_plugin_map = {
-                "QtQuick": ["scenegraph"],
-                "QtQml": ["qmltooling"],
-                "QtXml": ["scxmldatamodel"],
-                "QtDesigner": ["designer"],
-                "QtWidgets": ["styles"],
-                "QtSql": ["sqldrivers"],
-                "QtSensors": ["sensors"],
-                "QtDeclarative": ["qml1tooling"],
-                "QtPositioning": ["position"],
-                "QtLocation": ["geoservices"],
-                "QtPrintSupport": ["printsupport"],
-                "QtNetwork": ["networkinformation", "tls"],
-                "Qt3DRender": ["geometryloaders", "renderplugins", "renderers", "sceneparsers"],
-                "QtMultimedia": ["multimedia"],
-                "QtGui": ["accessiblebridge", "generic", "iconengines", "imageformats",
-                          "platforms", "platforminputcontexts"]
-            }
-            plugins_dir = os.path.join(package_path, 'plugins')
-            for pyd_file in other_files:
-                if not pyd_file.endswith('.dll'):
-                    if pyd_file in file_plugin_map:
-                        for i in file_plugin_map[pyd_file]:
-                            plugin_dir = os.path.join(plugins_dir, i)
-                            if os.path.exists(plugin_dir):
-                                for file in os.listdir(plugin_dir):
-                                    file_path = os.path.join(plugins_dir, i, file)
-                                    add_depend_paths.append(file_path)
-
-    for file_path in add_depend_paths:
-        depends.add(file_path)
+    depends |= exclude_depends(add_depend_paths, depends)
+    if cache_dir is not None:
+        save_import_cache(cache_dir, import_cache)
 
     current_env_dir = sys.prefix
     site_pkg_dir = os.path.join(current_env_dir, 'Lib\\site-packages')
-
-    # #补充python目录下的dll
     base_env_dir = sys.base_prefix
-    for f in os.listdir(base_env_dir):
-        if os.path.isfile(os.path.join(base_env_dir, f)) and f.endswith('.dll'):
-            dll_file = os.path.join(base_env_dir, f)
-            depends.add(dll_file)
+    listing = DirListing()
 
-    # # 补充encodings
-    encodings_dir_files = ('gbk.py', 'latin_1.py', 'utf_8.py', 'utf_16_be.py', 'cp437.py')
-    for encodings_file in encodings_dir_files:
-        depends.add(os.path.join(base_env_dir, 'Lib', 'encodings', encodings_file))
+    # #补充python目录下的dll
+    depends.update(path for path in listing.files(base_env_dir) if path.endswith('.dll'))
 
     # # 补充libxxx.dll
     dlls_dir = os.path.join(base_env_dir, 'DLLs')
-    for f in os.listdir(dlls_dir):
-        file_path = os.path.join(dlls_dir, f)
-        if 'lib' in f and os.path.isfile(file_path):
-            dll_file_path = file_path
-            depends.add(dll_file_path)
-
-    # #补充tkinter包数据
-    dlls_dir_files = []
-    if 'tkinter' in special_pkgs:
-        import tkinter
-        import _tkinter
-        tcl_version, tk_version = _tkinter.TCL_VERSION, _tkinter.TK_VERSION
-        tcl_v = tcl_version.replace('.', '')
-        tk_v = tk_version.replace('.', '')
-        tcl = tkinter.Tcl()
-        tcl_dir = tcl.eval("info library")
-        tk_dir = f"{os.path.dirname(tcl_dir)}\\tk{tk_version}"
-        dlls_dir_files.extend([f'tcl{tcl_v}t.dll', f'tk{tk_v}t.dll'])
-        for root, _, files in os.walk(tcl_dir, topdown=True):
-            for f in files:
-                depends.add(os.path.join(root, f))
-        for root, _, files in os.walk(tk_dir, topdown=True):
-            if 'demos' in root or '__pycache__' in root:
-                continue
-            for f in files:
-                depends.add(os.path.join(root, f))
+    depends.update(path for path in listing.files(dlls_dir) if 'lib' in os.path.basename(path))
+
+    # # 补充tkinter, curl_cffi, pyside插件, encodings等包的数据, 见pkg_hooks
+    depends |= hook_files(packages, base_env_dir, site_pkg_dir, listing)
+
 
-    for dlls_file in dlls_dir_files:
-        depends.add(os.path.join(dlls_dir, dlls_file))
+# # 依赖图状态文件的格式版本, 格式变化时递增
+GRAPH_STATE_FORMAT = 2
 
-    # #补充curl_cffi包数据
-    if 'curl_cffi' in special_pkgs:
-        for dir_ in os.listdir(site_pkg_dir):
-            if 'curl_cffi' in dir_ and (not dir_.endswith('curl_cffi')):
-                full_dir = os.path.join(site_pkg_dir, dir_)
-                for root, dirs, files in os.walk(full_dir):
-                    for f in files:
-                        depends.add(os.path.join(root, f))
 
+def _file_stamp(file_path: str):
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
 
-def analyze_depends(main_script_path: str, except_pkgs: list = None):
+
+def _import_listing(dir_path: str):
+    """
+    目录中可导入的文件名和子目录名, 其它文件(日志, 数据等)的增删不影响依赖图
+    """
+    suffixes = tuple(importlib.machinery.all_suffixes())
+    try:
+        with os.scandir(dir_path) as it:
+            return sorted(entry.name for entry in it
+                          if entry.name.endswith(suffixes) or
+                          (entry.name != '__pycache__' and entry.is_dir()))
+    except OSError:
+        return None
+
+
+def _graph_key(main_script_path: str, excludes: list, static: bool):
+    """
+    依赖图的有效条件: 主文件, 排除的包, 查找模块的方式, 搜索路径及环境目录的修改时间(安装或卸载包时变化)
+    """
+    script_dir = os.path.dirname(main_script_path)
+    search_paths = tuple(sys.path)
+    # # 项目目录单独检查, 编辑器保存文件时也会修改目录的修改时间
+    env_stamps = tuple(_file_stamp(path) for path in search_paths if path != script_dir)
+    return GRAPH_STATE_FORMAT, main_script_path, tuple(sorted(excludes)), static, search_paths, env_stamps
+
+
+def _project_state(mg: ModuleGraph, script_dir: str):
+    """
+    依赖图中项目文件的修改时间和大小, 以及项目中可导入的目录内容
+    :return: ({文件路径: (节点名, 时间和大小)}, {目录: 目录内容})
+    """
+    base_env_dir = sys.base_prefix
+    current_env_dir = sys.prefix
+    files = {}
+    dirs = {script_dir: _import_listing(script_dir)}
+
+    def in_project(path):
+        return (path.startswith(script_dir + os.sep) and
+                base_env_dir not in path and current_env_dir not in path)
+
+    for node in mg.nodes():
+        if isinstance(node, (Package, NamespacePackage)):
+            for path in node.search_path:
+                path = os.path.abspath(path)
+                if in_project(path):
+                    dirs[path] = _import_listing(path)
+            if isinstance(node, NamespacePackage):
+                continue
+            node_file = node.init_module.filename
+        elif isinstance(node, PyPIDistribution):
+            continue
+        else:
+            node_file = node.filename
+        if not node_file:
+            continue
+        file_path = os.path.abspath(node_file)
+        if in_project(file_path):
+            files[file_path] = (node.identifier, _file_stamp(file_path))
+    return files, dirs
+
+
+def _load_graph(state_path: str, key: tuple):
+    """
+    读取上次保存的依赖图, 只重新分析修改过的项目文件
+    :return: (依赖图, 是否有更新), 依赖图无效时返回(None, True)
+    """
+    try:
+        with open(state_path, 'rb') as fp:
+            state = pickle.load(fp)
+    except Exception:
+        return None, True
+
+    if not isinstance(state, dict) or state.get('key') != key:
+        return None, True
+
+    # # 项目中新增或删除了模块时, 模块的查找结果可能变化, 需要重新构建
+    for dir_path, listing in state['dirs'].items():
+        if _import_listing(dir_path) != listing:
+            return None, True
+
+    mg = state['graph']
+    changed = [identifier for file_path, (identifier, stamp) in state['files'].items()
+               if _file_stamp(file_path) != stamp]
+    if changed:
+        mg.update_nodes(changed)
+        mg.remove_unreachable()
+    return mg, bool(changed)
+
+
+def _save_graph(state_path: str, key: tuple, mg: ModuleGraph, script_dir: str):
+    files, dirs = _project_state(mg, script_dir)
+    state = {'key': key, 'files': files, 'dirs': dirs, 'graph': mg}
+    os.makedirs(os.path.dirname(state_path), exist_ok=True)
+    tmp_path = f'{state_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as fp:
+        pickle.dump(state, fp, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, state_path)
+
+
+def build_graph(main_script_path: str, excludes: list, cache_dir: str = None, workers: int = None,
+                static: bool = False):
+    """
+    构建主文件的依赖图。
+    给定cache_dir时保存依赖图, 下次只有项目文件被修改时, 只重新分析修改过的文件和新导入的模块,
+    并删除不再被使用的模块; 项目中增删了模块, 或者排除的包, 搜索路径, python环境有变化时重新构建。
+    :param main_script_path: 主文件路径
+    :param excludes: 排除的包
+    :param cache_dir: 缓存目录, 依赖图用pickle保存, 只能使用打包工具自己的缓存目录(见slimfile.get_cache_dir),
+                      不要使用会随程序发布或者别人能写入的目录
+    :param workers: 重新构建时并行解析源码的进程数
+    :param static: 只从文件系统和zip文件中查找模块, 不导入任何包(不执行包的__init__代码),
+                   分析耗时和内存不受依赖包导入开销的影响; 不支持自定义的导入钩子, 运行时修改的__path__
+                   (如pywin32的win32com.shell)和setuptools等注册的模块别名, 默认关闭
+    :return: 只包含主文件能到达的模块的依赖图
+    """
+    main_script_path = os.path.abspath(main_script_path)
+    script_dir = os.path.dirname(main_script_path)
+    mg = None
+    updated = True
+    if cache_dir is not None:
+        key = _graph_key(main_script_path, excludes, static)
+        state_path = os.path.join(cache_dir, f'soeasypack-{sys.implementation.cache_tag}-graph.pickle')
+        mg, updated = _load_graph(state_path, key)
+
+    if mg is None:
+        mg = ModuleGraph(cache_dir=cache_dir, workers=workers, keep_code=False, static=static)
+        mg.add_excludes(excludes)
+        mg.add_script(main_script_path)
+        mg.remove_unreachable()
+
+    if cache_dir is not None and updated:
+        _save_graph(state_path, key, mg, script_dir)
+    return mg
+
+
+def analyze_depends(main_script_path: str, except_pkgs: list = None, cache_dir: str = None, workers: int = None,
+                    static: bool = False):
     """
     分析给定Python项目主文件的所有依赖关系。
+    :param main_script_path:
+    :param except_pkgs:
+    :param cache_dir: 模块分析结果和依赖图的缓存目录, 再次打包时未修改的文件不再重新解析,
+                      只修改了项目文件时只更新依赖图中相关的部分
+    :param workers: 并行读取和解析源码的进程数, 默认在当前进程中解析, 结果与进程数无关
+    :param static: 使用静态模式查找模块, 不导入任何包, 见build_graph
     """
+    # # 每次分析都重新读取目录, 不使用之前调用留下的目录缓存
+    SHARED_SCANNER.clear()
 
     base_env_dir = sys.base_prefix
     current_env_dir = sys.prefix
@@ -235,27 +349,24 @@ def analyze_depends(main_script_path: str, except_pkgs: list = None):
     if except_pkgs:
         excludes.extend(except_pkgs)
 
-    mg = ModuleGraph()
-    mg.add_excludes(excludes)
+    mg = build_graph(main_script_path, excludes, cache_dir=cache_dir, workers=workers, static=static)
 
     depends = set()
-    special_pkgs = set()
-    mg.add_script(main_script_path)
-
-    for node in mg.iter_graph():
+    packages = {}
+    for node in mg.nodes():
         if isinstance(node, PyPIDistribution):
             continue
         if node.filename:
             file_path = os.path.abspath(node.filename)
             if base_env_dir in file_path or current_env_dir in file_path:
+                top_name = node.identifier.partition('.')[0]
                 if type(node).__name__ == "Package":
+                    if node.identifier == top_name:
+                        packages[top_name] = file_path
                     file_path = os.path.join(file_path, '__init__.py')
-                if 'tkinter' in file_path:
-                    special_pkgs.add('tkinter')
-                elif 'curl_cffi' in file_path:
-                    special_pkgs.add('curl_cffi')
+                packages.setdefault(top_name, None)
 
                 depends.add(file_path)
 
-    add_depends(depends, special_pkgs)
+    add_depends(depends, packages, cache_dir=cache_dir)
     return depends
\ No newline at end of file
@@ -5,14 +5,16 @@ Created on 2024-11-30
 """
 
 import json
+import mmap
 import os
-import py_compile
 import random
 import string
+import struct
 import subprocess
 import sys
 import shutil
 import fnmatch
+import hashlib
 import zipfile
 from functools import partial
 from pathlib import Path
@@ -21,7 +23,11 @@ from concurrent.futures import as_completed, ThreadPoolExecutor
 
 from .my_logger import my_logger
 from .py_to_pyd import to_pyd
-from .slimfile import to_slim_file, check_dependency_files
+from .pyc_compiler import compile_all, reuse_cached_pyc, update_pyc_cache
+from .pack_zip import STORED_POLICY, merge_policy, write_zip, log_compress_report
+from .pkg_hooks import hook_files
+from .slimfile import to_slim_file, check_dependency_files, get_cache_dir
+from .tree_scan import SHARED_SCANNER
 
 
 class KwargsType(TypedDict, total=False):
@@ -37,22 +43,20 @@ def copy_file(src, dest):
 
 # 复制目录的并行化版本
 def copytree_parallel(src, dest, ignore_func=None):
+    src = os.fspath(src)
     if not os.path.exists(dest):
         os.makedirs(dest)
 
     futures = []
     with ThreadPoolExecutor() as executor:
-        for root, dirs, files in os.walk(src):
+        # # 忽略规则在遍历时应用, 被忽略的目录不会被读取
+        for root, dirs, files in SHARED_SCANNER.walk(src, ignore_func):
             dest_dir = os.path.join(dest, str(os.path.relpath(root, src)))
             if not os.path.exists(dest_dir):
                 os.makedirs(dest_dir)
 
-            # 过滤需要忽略的目录和文件
-            dirs[:] = [d for d in dirs if not any(fnmatch.fnmatch(d, pattern) for pattern in ignore_func(root, dirs))]
-            files_to_copy = [f for f in files if f not in ignore_func(root, files)]
-
-            for file in files_to_copy:
-                futures.append(executor.submit(copy_file, os.path.join(root, file), os.path.join(dest_dir, file)))
+            for entry in files:
+                futures.append(executor.submit(copy_file, entry.path, os.path.join(dest_dir, entry.name)))
 
     # 等待所有任务完成
     for future in as_completed(futures):
@@ -62,7 +66,8 @@ def copytree_parallel(src, dest, ignore_func=None):
             my_logger.error(f"复制线程出错: {e}")
 
 
-def copy_py_env(save_dir, main_run_path=None, pack_mode=0, monitoring_time=18, except_packages=None, embed_exe=False):
+def copy_py_env(save_dir, main_run_path=None, pack_mode=0, monitoring_time=18, except_packages=None, embed_exe=False,
+                analyze_workers=None, static_analysis=False):
     """
     复制 Python环境依赖
     :param save_dir:
@@ -71,6 +76,8 @@ def copy_py_env(save_dir, main_run_path=None, pack_mode=0, monitoring_time=18, e
     :param monitoring_time:
     :param except_packages:
     :param embed_exe:
+    :param analyze_workers: ast模式分析依赖时解析源码的进程数
+    :param static_analysis: ast模式使用静态方式查找模块, 不导入任何依赖包
     :return:
     """
 
@@ -84,7 +91,8 @@ def copy_py_env(save_dir, main_run_path=None, pack_mode=0, monitoring_time=18, e
     my_logger.info(f"当前模式：{mode_info[pack_mode]}")
     if pack_mode in (0, 3):
         dependency_files = check_dependency_files(main_run_path, save_dir, pack_mode=pack_mode,
-                                                  monitoring_time=monitoring_time, except_packages=except_packages)
+                                                  monitoring_time=monitoring_time, except_packages=except_packages,
+                                                  analyze_workers=analyze_workers, static_analysis=static_analysis)
         if pack_mode == 3 and not embed_exe:
             dependency_files.add(os.path.join(base_env_dir, 'python.exe'))
         rundep_dir = Path.joinpath(Path(save_dir), 'rundep').resolve()
@@ -180,10 +188,11 @@ def copy_embed_depend(save_dir, base_env_dir):
             to_save_dir = Path.joinpath(Path(save_dir), f"rundep/Lib/{py_file}")
             shutil.copytree(py_file_dir, to_save_dir, dirs_exist_ok=True)
 
-    encodings_files = ('cp437', 'gbk')
-    for encodings_file in encodings_files:
-        encodings_file_path = Path.joinpath(Path(base_env_dir), f"Lib/encodings/{encodings_file}.py")
-        to_encodings_file_path = Path.joinpath(Path(save_dir), f"rundep/Lib/encodings/{encodings_file}.py")
+    # # encodings需要的文件与ast模式一样由pkg_hooks声明
+    for encodings_file_path in hook_files({'encodings': None}, base_env_dir, base_env_dir):
+        to_encodings_file_path = Path.joinpath(Path(save_dir), 'rundep', os.path.relpath(encodings_file_path,
+                                                                                        base_env_dir))
+        to_encodings_file_path.parent.mkdir(parents=True, exist_ok=True)
         shutil.copyfile(encodings_file_path, to_encodings_file_path)
 
     multiprocessing_dir = Path.joinpath(Path(base_env_dir), 'Lib/multiprocessing')
@@ -195,25 +204,115 @@ def copy_embed_depend(save_dir, base_env_dir):
     shutil.copytree(importlib_dir, to_importlib_dir, dirs_exist_ok=True)
 
 
-def xor_encrypt(file_path, key):
+# # 异或分块大小, 实际使用时会向下取整为密钥长度的整数倍
+XOR_CHUNK_SIZE = 64 * 1024
+
+
+def xor_bytes(data, key_bytes: bytes, offset: int = 0) -> bytes:
+    """
+    整块异或：把密钥平铺到与数据等长，转成大整数后一次完成异或
+    :param data: 待处理的数据(bytes/bytearray/memoryview)
+    :param key_bytes: 密钥
+    :param offset: data在整个文件中的起始偏移，用于对齐密钥
+    :return:
+    """
+    length = len(data)
+    if not length:
+        return b''
+    key_length = len(key_bytes)
+    start = offset % key_length
+    key_stream = (key_bytes[start:] + key_bytes * (length // key_length + 1))[:length]
+    value = int.from_bytes(data, 'little') ^ int.from_bytes(key_stream, 'little')
+    return value.to_bytes(length, 'little')
+
+
+def xor_range(buffer, start: int, end: int, key_bytes: bytes, chunk_size: int = XOR_CHUNK_SIZE):
+    """
+    原地异或buffer[start:end], 密钥按绝对偏移对齐
+    :param buffer: 可写的缓冲区(mmap/bytearray)
+    :param start:
+    :param end:
+    :param key_bytes:
+    :param chunk_size: 每块字节数
+    :return:
     """
-    xor混淆
+    key_length = len(key_bytes)
+    # # 块大小取密钥长度的整数倍, 每块的密钥流都相同, 只需生成一次
+    chunk_size = max(chunk_size // key_length, 1) * key_length
+    if end - start < chunk_size:
+        buffer[start:end] = xor_bytes(buffer[start:end], key_bytes, start)
+        return
+    shift = start % key_length
+    key_stream = (key_bytes[shift:] + key_bytes[:shift]) * (chunk_size // key_length)
+    key_value = int.from_bytes(key_stream, 'little')
+    for chunk_start in range(start, end, chunk_size):
+        chunk_end = min(chunk_start + chunk_size, end)
+        if chunk_end - chunk_start == chunk_size:
+            value = int.from_bytes(buffer[chunk_start:chunk_end], 'little') ^ key_value
+            buffer[chunk_start:chunk_end] = value.to_bytes(chunk_size, 'little')
+        else:
+            buffer[chunk_start:chunk_end] = xor_bytes(buffer[chunk_start:chunk_end], key_bytes, chunk_start)
+
+
+def xor_encrypt(file_path, key, chunk_size: int = XOR_CHUNK_SIZE):
+    """
+    xor混淆, 通过内存映射分块原地处理, 内存占用与文件大小无关
     :param file_path:
     :param key:
+    :param chunk_size: 每块字节数
     :return:
     """
     key_bytes = key.encode('utf-8')
-    key_length = len(key_bytes)
-
     with open(file_path, 'r+b') as f:
-        data = bytearray(f.read())
-        len_data = len(data)
+        file_size = os.fstat(f.fileno()).st_size
+        if not file_size:
+            return
+        with mmap.mmap(f.fileno(), 0) as mm:
+            xor_range(mm, 0, file_size, key_bytes, chunk_size)
+            mm.flush()
 
-        for i in range(len_data):
-            data[i] ^= key_bytes[i % key_length]
-        f.seek(0)
-        f.write(data)
-        f.truncate()
+
+def zip_data_offset(buffer, header_offset: int) -> int:
+    """
+    根据本地文件头计算zip中文件数据的起始偏移
+    """
+    name_length, extra_length = struct.unpack('<HH', buffer[header_offset + 26:header_offset + 30])
+    return header_offset + 30 + name_length + extra_length
+
+
+def xor_zip_members(zip_path, key):
+    """
+    xor混淆zip中每个文件的数据部分, 密钥按数据在归档中的偏移对齐。
+    文件头和中央目录保持明文, 运行时只需解密实际导入的模块
+    :param zip_path:
+    :param key:
+    :return:
+    """
+    key_bytes = key.encode('utf-8')
+    with zipfile.ZipFile(zip_path) as zip_fp:
+        infos = zip_fp.infolist()
+    if not infos:
+        return
+    with open(zip_path, 'r+b') as f:
+        with mmap.mmap(f.fileno(), 0) as mm:
+            for info in infos:
+                data_start = zip_data_offset(mm, info.header_offset)
+                xor_range(mm, data_start, data_start + info.compress_size, key_bytes)
+            mm.flush()
+
+
+def file_digest(file_path, block_size: int = 1024 * 1024) -> str:
+    """
+    分块计算文件的sha256, 单文件模式用它作为解压缓存目录名
+    :param file_path:
+    :param block_size:
+    :return: 16位十六进制摘要
+    """
+    sha = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        while block := f.read(block_size):
+            sha.update(block)
+    return sha.hexdigest()[:16]
 
 
 def copy_py_script(main_py_path, save_dir):
@@ -261,7 +360,7 @@ start /B "" %python_path% main.{py_suffix}"
 def build_exe(save_dir, hide_cmd: bool = True, exe_name: str = 'main', png_path: str = None,
               embed_exe: bool = False, onefile: bool = False, pack_mode=0, winres_json_path: str = None,
               file_version: str = None, product_name: str = None, company: str = None, uac: bool = False,
-              all_pyc_zip: bool = False, pip_source: str = None
+              all_pyc_zip: bool = False, pip_source: str = None, compress_policy: dict = None
               ):
     """
     使用go语言编译
@@ -279,6 +378,7 @@ def build_exe(save_dir, hide_cmd: bool = True, exe_name: str = 'main', png_path:
     :param uac:
     :param all_pyc_zip:
     :param pip_source:
+    :param compress_policy:
     :return:
     """
 
@@ -303,17 +403,19 @@ def build_exe(save_dir, hide_cmd: bool = True, exe_name: str = 'main', png_path:
             main_py_code = fp.read()
             main_py_code_hex = main_py_code.hex()
         os.remove(main_py_path)
+        compress_policy = merge_policy(compress_policy)
         if onefile:
             all_zip_path = Path.joinpath(temp_build_dir, 'rundep.zip')
-            with zipfile.ZipFile(all_zip_path, 'w', compression=zipfile.ZIP_DEFLATED) as zipf:
-                for root, dirs, files in os.walk(rundep_dir):
-                    for file in files:
-                        if 'AppData' in root and file.endswith('.pyc'):
-                            continue
-                        else:
-                            full_path = os.path.join(root, file)
-                            archive_name = os.path.relpath(full_path, start=rundep_dir)
-                            zipf.write(full_path, arcname=archive_name)
+            rundep_members = []
+            for root, dirs, files in os.walk(rundep_dir):
+                for file in files:
+                    if 'AppData' in root and file.endswith('.pyc'):
+                        continue
+                    else:
+                        full_path = os.path.join(root, file)
+                        archive_name = os.path.relpath(full_path, start=rundep_dir)
+                        rundep_members.append((full_path, archive_name))
+            log_compress_report('rundep.zip', write_zip(all_zip_path, rundep_members, compress_policy))
         # # 生成密钥
         characters = random.choices(string.ascii_letters + string.digits, k=14)
         xor_key = list(characters) + [random.choice(string.digits), random.choice(string.ascii_letters)]
@@ -332,7 +434,8 @@ def build_exe(save_dir, hide_cmd: bool = True, exe_name: str = 'main', png_path:
             if onefile:
                 edited_go_code = (edited_go_code.replace('embed soeasypack.sz',
                                                          'embed soeasypack.sz rundep.zip', 1).
-                                  replace('onefile bool = false', 'onefile bool = true', 1)
+                                  replace('onefile bool = false', 'onefile bool = true', 1).
+                                  replace('rundep_hash', file_digest(all_zip_path), 1)
                                   )
             elif pack_mode == 2:
                 if not pip_source:
@@ -350,35 +453,38 @@ def build_exe(save_dir, hide_cmd: bool = True, exe_name: str = 'main', png_path:
             # # 压缩python自带的模块
             python_zip_path = Path.joinpath(Path(save_dir), f'rundep/python{py_version}.zip')
             lib_dir = Path.joinpath(Path(save_dir), 'rundep/Lib')
-            with zipfile.ZipFile(python_zip_path, 'w') as zip_fp:
-                for root, dirs, files in os.walk(lib_dir):
-                    for file in files:
-                        if file.endswith('.pyc') and 'site-packages' not in root:
-                            full_path = os.path.join(root, file)
-                            archive_name = os.path.relpath(full_path, start=lib_dir)
-                            zip_fp.write(full_path, arcname=archive_name)
-                            ready_remove_pyc.append(full_path)
-
-        with zipfile.ZipFile(zip_path, 'w', compression=zipfile.ZIP_DEFLATED) as zip_fp:
-            nn = 0
-            for root, dirs, files in os.walk(app_data_dir):
-                if nn == 0:
-                    if all_pyc_zip:
-                        dirs[:] = ['AppData', 'Lib']
-                    else:
-                        dirs[:] = ['AppData']
-                    nn = 1
-
+            python_zip_members = []
+            for root, dirs, files in os.walk(lib_dir):
                 for file in files:
-                    if file.endswith('.pyc'):
+                    if file.endswith('.pyc') and 'site-packages' not in root:
                         full_path = os.path.join(root, file)
-                        archive_name = os.path.relpath(full_path, start=app_data_dir)
-                        if 'AppData' in root or (all_pyc_zip and 'site-packages' in root):
-                            archive_name = archive_name.replace('Lib\\site-packages\\', '').replace('AppData\\', '')
-                            zip_fp.write(full_path, arcname=archive_name)
-                            ready_remove_pyc.append(full_path)
-
-        xor_encrypt(zip_path, xor_key)
+                        archive_name = os.path.relpath(full_path, start=lib_dir)
+                        python_zip_members.append((full_path, archive_name))
+                        ready_remove_pyc.append(full_path)
+            # # python{ver}.zip由zipimport读取, 保持不压缩
+            write_zip(python_zip_path, python_zip_members, STORED_POLICY)
+
+        sz_members = []
+        nn = 0
+        for root, dirs, files in os.walk(app_data_dir):
+            if nn == 0:
+                if all_pyc_zip:
+                    dirs[:] = ['AppData', 'Lib']
+                else:
+                    dirs[:] = ['AppData']
+                nn = 1
+
+            for file in files:
+                if file.endswith('.pyc'):
+                    full_path = os.path.join(root, file)
+                    archive_name = os.path.relpath(full_path, start=app_data_dir)
+                    if 'AppData' in root or (all_pyc_zip and 'site-packages' in root):
+                        archive_name = archive_name.replace('Lib\\site-packages\\', '').replace('AppData\\', '')
+                        sz_members.append((full_path, archive_name))
+                        ready_remove_pyc.append(full_path)
+        log_compress_report('soeasypack.sz', write_zip(zip_path, sz_members, compress_policy))
+
+        xor_zip_members(zip_path, xor_key)
         for i in ready_remove_pyc:
             if os.path.exists(i):
                 os.remove(i)
@@ -448,10 +554,22 @@ go 1.23
                     pass
 
 
-def py_to_pyc(dest_dir, optimize):
+# # 文件数超过该值才启动进程池编译pyc
+PYC_PARALLEL_MIN_FILES = 200
+
+
+def py_to_pyc(dest_dir, optimize, workers: int = None, cache_dir=None):
+    """
+    多进程把py文件编译成pyc, 并删除编译成功的py文件和__pycache__目录
+    :param dest_dir:
+    :param optimize:
+    :param workers: 进程数, 默认为cpu核数
+    :param cache_dir: pyc缓存目录, 源码和优化级别都没变的文件直接复用上次编译的pyc
+    :return:
+    """
     my_logger.info(f'开始将py文件转成pyc文件, pyc优化级别:{optimize}')
     ready_remove_dirs = []
-    ready_remove_files = []
+    py_files = []
 
     for root, dirs, files in os.walk(dest_dir):
         if '__pycache__' in root:
@@ -462,18 +580,45 @@ def py_to_pyc(dest_dir, optimize):
                 # # cv2会读取config.py文件, 跳过tcl的WmDefault(缩进有问题)
                 continue
             if file.endswith('.py'):
-                py_file = os.path.join(root, file)
-                try:
-                    py_compile.compile(py_file, cfile=py_file + 'c', quiet=1, optimize=optimize)
-                    ready_remove_files.append(py_file)
-                except Exception as e:
-                    my_logger.error(f"{py_file} 转pyc时发生错误: {e}")
+                py_files.append(os.path.join(root, file))
+
+    if optimize == -1:
+        optimize = sys.flags.optimize
+    reused = []
+    if cache_dir:
+        reused, py_files, manifest_files, digests = reuse_cached_pyc(py_files, dest_dir, cache_dir, optimize)
+        if reused:
+            my_logger.info(f'复用缓存的pyc文件{len(reused)}个, 需要编译{len(py_files)}个')
+
+    workers = workers or os.cpu_count() or 1
+    errors = None
+    if workers > 1 and len(py_files) > PYC_PARALLEL_MIN_FILES:
+        # # 在独立进程中启动进程池, 避免子进程重新执行调用to_pack的脚本
+        result = subprocess.run([sys.executable, str(Path(__file__).with_name('pyc_compiler.py')),
+                                 str(optimize), str(workers)],
+                                input=json.dumps(py_files).encode('utf-8'), capture_output=True)
+        if result.returncode == 0:
+            errors = json.loads(result.stdout)
+        else:
+            my_logger.warning(f'多进程编译pyc失败, 改为单进程编译: {result.stderr.decode(errors="replace")}')
+    if errors is None:
+        errors = compile_all(py_files, optimize, workers=1)
+
+    compiled = []
+    for py_file, error in zip(py_files, errors):
+        if error is None:
+            compiled.append(py_file)
+        else:
+            my_logger.error(f"{py_file} 转pyc时发生错误: {error}")
+    if cache_dir:
+        update_pyc_cache(compiled, dest_dir, cache_dir, optimize, manifest_files, digests)
+    ready_remove_files = reused + compiled
 
     # 删除成功编译的py文件和__pycache__目录
     for root in ready_remove_dirs:
-        shutil.rmtree(root)
-    for file in ready_remove_files:
-        os.remove(file)
+        shutil.rmtree(root, ignore_errors=True)
+    with ThreadPoolExecutor() as executor:
+        list(executor.map(os.remove, ready_remove_files))
 
 
 def to_pack(main_py_path: str, save_dir: str = None,
@@ -484,6 +629,7 @@ def to_pack(main_py_path: str, save_dir: str = None,
             monitoring_time: int = 18, uac: bool = False, requirements_path: str = None,
             except_packages: [str] = None, winres_json_path: str = None, delay_time: int = 3,
             all_pyc_zip: bool = False, pip_source: str = None, enable_slim: bool = True,
+            compress_policy: dict = None, analyze_workers: int = None, static_analysis: bool = False,
             **kwargs: KwargsType) -> None:
     """
     :param main_py_path:主入口py文件路径
@@ -515,6 +661,12 @@ def to_pack(main_py_path: str, save_dir: str = None,
     :param all_pyc_zip: 把所有.pyc文件压缩进zip
     :param pip_source: 轻量模式pip下载源地址，默认为 https://pypi.tuna.tsinghua.edu.cn/simple
     :param enable_slim: 是否启用项目瘦身功能（仅在pack_mode=1时有效），默认为True
+    :param compress_policy: 按文件后缀设置rundep.zip和soeasypack.sz的压缩级别，会合并到默认策略上，
+    值为0-9的deflate级别，None表示不压缩直接存储，'*'表示其它文件，如 {'.pyc': 9, '.dat': None}
+    :param analyze_workers: ast模式分析依赖时并行解析源码的进程数，默认在当前进程中解析，分析结果与进程数无关，
+    解析进程是独立启动的python，不会重新执行调用to_pack的脚本
+    :param static_analysis: ast模式只从文件系统查找模块，不导入任何依赖包，分析更快且不执行包的初始化代码，
+    但不支持自定义导入钩子、运行时修改的__path__(如pywin32)和setuptools等注册的模块别名，可能漏掉依赖，默认为False
     :param kwargs: file_version: str, product_name: str, company: str
     :return:
     """
@@ -545,17 +697,21 @@ def to_pack(main_py_path: str, save_dir: str = None,
             my_logger.error(f'未找到依赖包文件：{requirements_path}')
             return
 
+    # # 目录列表缓存只在一次打包中有效
+    SHARED_SCANNER.clear()
     rundep_dir = str(save_dir) + '/rundep'
     if force_copy_env:
         my_logger.info('强制复制环境')
         if os.path.exists(rundep_dir):
             shutil.rmtree(rundep_dir)
-        copy_py_env(save_dir, main_py_path, pack_mode, monitoring_time, except_packages, embed_exe)
+        copy_py_env(save_dir, main_py_path, pack_mode, monitoring_time, except_packages, embed_exe,
+                    analyze_workers, static_analysis)
     else:
         if os.path.exists(rundep_dir):
             my_logger.info('rundep文件夹已存在，跳过环境复制')
         else:
-            copy_py_env(save_dir, main_py_path, pack_mode, monitoring_time, except_packages, embed_exe)
+            copy_py_env(save_dir, main_py_path, pack_mode, monitoring_time, except_packages, embed_exe,
+                        analyze_workers, static_analysis)
 
     new_main_py_path = copy_py_script(main_py_path, save_dir)
 
@@ -588,13 +744,13 @@ def to_pack(main_py_path: str, save_dir: str = None,
             my_logger.error(f"转pyd出错：{e}")
 
     if auto_py_pyc or embed_exe or onefile:
-        py_to_pyc(rundep_dir, pyc_optimize)
+        py_to_pyc(rundep_dir, pyc_optimize, cache_dir=get_cache_dir(save_dir))
 
     if not (embed_exe or onefile):
         create_bat(save_dir, embed_exe)
 
     build_exe(save_dir, hide_cmd, exe_name, png_path, embed_exe=embed_exe, onefile=onefile, uac=uac,
               pack_mode=pack_mode, winres_json_path=winres_json_path, all_pyc_zip=all_pyc_zip, pip_source=pip_source,
-              **kwargs)
+              compress_policy=compress_policy, **kwargs)
 
     my_logger.info('结束')
@@ -0,0 +1,202 @@
+"""
+读取PE文件(dll/pyd/exe)的导入表和延迟导入表, 计算dll的传递依赖
+只通过mmap读取文件头和导入表所在的几页, 不读入整个文件
+Created on 2026-10-18
+"""
+import os
+import json
+import mmap
+import struct
+
+IMPORT_CACHE_NAME = 'pe_imports.json'
+# # 导入表缓存的格式版本, 格式变化时递增
+IMPORT_CACHE_FORMAT = 1
+
+# # 数据目录中导入表和延迟导入表的序号
+IMPORT_DIRECTORY = 1
+DELAY_IMPORT_DIRECTORY = 13
+# # dll名称的最大长度, 防止损坏的文件读取过长的字符串
+MAX_NAME_LENGTH = 512
+
+
+def _read_name(data, offset: int) -> str:
+    """
+    读取以\\0结尾的ascii字符串
+    """
+    end = data.find(b'\x00', offset, offset + MAX_NAME_LENGTH)
+    if end < 0:
+        raise ValueError('dll名称没有结尾')
+    return data[offset:end].decode('ascii', errors='replace')
+
+
+def _parse_imports(data):
+    """
+    解析PE文件的导入表和延迟导入表
+    :param data: bytes或mmap
+    :return: (导入的dll名称列表, 延迟导入的dll名称列表)
+    """
+    if data[:2] != b'MZ':
+        raise ValueError('不是PE文件')
+    pe_offset = struct.unpack_from('<I', data, 0x3C)[0]
+    if data[pe_offset:pe_offset + 4] != b'PE\x00\x00':
+        raise ValueError('不是PE文件')
+
+    section_count, optional_size = struct.unpack_from('<H12xH', data, pe_offset + 6)
+    optional_offset = pe_offset + 24
+    magic = struct.unpack_from('<H', data, optional_offset)[0]
+    if magic == 0x10b:
+        # # PE32
+        image_base = struct.unpack_from('<I', data, optional_offset + 28)[0]
+        directory_offset = optional_offset + 96
+    elif magic == 0x20b:
+        # # PE32+
+        image_base = struct.unpack_from('<Q', data, optional_offset + 24)[0]
+        directory_offset = optional_offset + 112
+    else:
+        raise ValueError('未知的可选头格式')
+    directory_count = struct.unpack_from('<I', data, directory_offset - 4)[0]
+
+    sections = []
+    section_offset = optional_offset + optional_size
+    for idx in range(section_count):
+        virtual_size, virtual_address, raw_size, raw_offset = struct.unpack_from(
+            '<4I', data, section_offset + idx * 40 + 8)
+        sections.append((virtual_address, max(virtual_size, raw_size), raw_offset))
+    headers_size = min((raw_offset for _, _, raw_offset in sections if raw_offset), default=len(data))
+
+    def rva_to_offset(rva):
+        for virtual_address, size, raw_offset in sections:
+            if virtual_address <= rva < virtual_address + size:
+                return rva - virtual_address + raw_offset
+        if rva < headers_size:
+            return rva
+        raise ValueError(f'rva不在任何节中: {rva:#x}')
+
+    def directory(index):
+        if index >= directory_count:
+            return 0
+        return struct.unpack_from('<I', data, directory_offset + index * 8)[0]
+
+    imports = []
+    rva = directory(IMPORT_DIRECTORY)
+    if rva:
+        # # IMAGE_IMPORT_DESCRIPTOR: 20字节, 名称rva在第12字节, 全0结束
+        offset = rva_to_offset(rva)
+        while True:
+            name_rva = struct.unpack_from('<12xI', data, offset)[0]
+            if not name_rva:
+                break
+            imports.append(_read_name(data, rva_to_offset(name_rva)))
+            offset += 20
+
+    delay_imports = []
+    rva = directory(DELAY_IMPORT_DIRECTORY)
+    if rva:
+        # # IMAGE_DELAYLOAD_DESCRIPTOR: 32字节, 属性和名称rva在开头;
+        # # 属性最低位为0时是旧格式, 保存的是虚拟地址而不是rva
+        offset = rva_to_offset(rva)
+        while True:
+            attributes, name_rva = struct.unpack_from('<2I', data, offset)
+            if not name_rva:
+                break
+            if not attributes & 1:
+                name_rva -= image_base
+            delay_imports.append(_read_name(data, rva_to_offset(name_rva)))
+            offset += 32
+
+    return imports, delay_imports
+
+
+def read_imports(file_path):
+    """
+    读取PE文件导入和延迟导入的dll名称
+    :param file_path:
+    :return: (导入的dll名称列表, 延迟导入的dll名称列表), 不是PE文件或文件损坏时返回None
+    """
+    try:
+        with open(file_path, 'rb') as fp:
+            if os.fstat(fp.fileno()).st_size == 0:
+                return None
+            with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return _parse_imports(data)
+    except (OSError, ValueError, struct.error):
+        return None
+
+
+def load_import_cache(cache_dir) -> dict:
+    """
+    读取导入表缓存
+    :param cache_dir: 缓存目录, 为None时返回空缓存
+    :return: {文件路径: [文件大小, 修改时间, 导入的dll名称列表, 延迟导入的dll名称列表]}
+    """
+    if cache_dir is None:
+        return {}
+    try:
+        with open(os.path.join(cache_dir, IMPORT_CACHE_NAME), encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if cache.get('format') != IMPORT_CACHE_FORMAT:
+        return {}
+    return cache.get('files', {})
+
+
+def save_import_cache(cache_dir, files: dict):
+    """
+    保存导入表缓存
+    :param cache_dir:
+    :param files: load_import_cache返回的格式
+    :return:
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    temp_path = os.path.join(cache_dir, IMPORT_CACHE_NAME + '.tmp')
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump({'format': IMPORT_CACHE_FORMAT, 'files': files}, f)
+    os.replace(temp_path, os.path.join(cache_dir, IMPORT_CACHE_NAME))
+
+
+def cached_imports(file_path, cache: dict = None) -> list:
+    """
+    读取PE文件导入和延迟导入的所有dll名称, 文件大小和修改时间没变时使用缓存
+    :param file_path:
+    :param cache: load_import_cache的结果, 会加入新读取的文件
+    :return: dll名称列表, 不是PE文件时为空列表
+    """
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return []
+    stamp = [stat.st_size, stat.st_mtime_ns]
+    key = os.path.normcase(os.path.abspath(file_path))
+    if cache is not None:
+        entry = cache.get(key)
+        if entry is not None and entry[:2] == stamp:
+            return entry[2] + entry[3]
+
+    result = read_imports(file_path) or ([], [])
+    if cache is not None:
+        cache[key] = stamp + [result[0], result[1]]
+    return result[0] + result[1]
+
+
+def dll_closure(binaries, dll_paths: dict, cache: dict = None) -> set:
+    """
+    计算binaries依赖的dll及其传递依赖
+    :param binaries: 需要检查的pyd/dll/exe文件路径
+    :param dll_paths: 可以打包的dll, {小写的dll文件名: 路径}, 其余dll(系统dll等)忽略
+    :param cache: load_import_cache的结果
+    :return: 依赖的dll路径集合, 不包含binaries本身
+    """
+    binaries = list(binaries)
+    checked = set(binaries)
+    result = set()
+    while binaries:
+        binary = binaries.pop()
+        for dll_name in cached_imports(binary, cache):
+            dll_path = dll_paths.get(dll_name.lower())
+            if dll_path is None or dll_path in checked:
+                continue
+            checked.add(dll_path)
+            result.add(dll_path)
+            binaries.append(dll_path)
+    return result
@@ -0,0 +1,225 @@
+"""
+按顶层包名注册的打包钩子
+每个钩子声明包需要额外打包的数据目录, 数据文件, DLLs目录下的dll和插件目录,
+只对依赖图中出现的包求值, 所有钩子共用一个目录列表缓存, 同一个目录只读取一次
+路径模板中可以使用的变量:
+    {base}: python安装目录, {dlls}: python安装目录下的DLLs, {site}: 包所在的site-packages,
+    {package}: 包目录, 以及钩子的variables函数返回的变量
+数据目录模板的最后一级可以是通配符, 匹配的目录都会被打包
+Created on 2026-10-18
+"""
+import os
+import fnmatch
+
+from .tree_scan import SHARED_SCANNER, TreeScanner
+
+
+class DirListing:
+    """
+    目录列表, 读取由TreeScanner完成并缓存, 每个目录只调用一次os.scandir
+    :param scanner: 默认使用一次打包中共用的扫描器
+    """
+
+    def __init__(self, scanner: TreeScanner = None):
+        self.scanner = scanner or SHARED_SCANNER
+        self._entries = {}
+
+    def entries(self, dir_path: str) -> dict:
+        """
+        :param dir_path:
+        :return: {名称: 是否目录}, 目录不存在时为空
+        """
+        entries = self._entries.get(dir_path)
+        if entries is None:
+            dirs, files = self.scanner.scandir(dir_path)
+            entries = {entry.name: False for entry in files}
+            entries.update((entry.name, True) for entry in dirs)
+            self._entries[dir_path] = entries
+        return entries
+
+    def exists(self, path: str) -> bool:
+        """
+        文件或目录是否存在
+        """
+        return os.path.basename(path) in self.entries(os.path.dirname(path))
+
+    def files(self, dir_path: str) -> list:
+        """
+        目录下的文件(不包括子目录)
+        """
+        return [os.path.join(dir_path, name) for name, is_dir in self.entries(dir_path).items() if not is_dir]
+
+    def glob_dirs(self, pattern_path: str) -> list:
+        """
+        最后一级是通配符的目录
+        """
+        parent, pattern = os.path.split(pattern_path)
+        return [os.path.join(parent, name) for name, is_dir in self.entries(parent).items()
+                if is_dir and fnmatch.fnmatchcase(name, pattern)]
+
+    def walk_files(self, dir_path: str, skip_dirs=()):
+        """
+        递归列出目录下的所有文件, 子目录并发读取
+        :param dir_path:
+        :param skip_dirs: 跳过的子目录名
+        """
+        skip_dirs = set(skip_dirs)
+        for root, dirs, files in self.scanner.walk(dir_path, lambda root, names: skip_dirs.intersection(names)):
+            for entry in files:
+                yield entry.path
+
+
+class PackageHook:
+    """
+    一个包的打包钩子
+    :param data_dirs: 整个打包的目录模板
+    :param data_files: 单个文件模板, 不存在的文件忽略
+    :param dlls: DLLs目录下的dll文件名模板
+    :param plugin_dirs: {包内的pyd模块名: [插件目录名]}, 包目录下有该pyd时打包{package}/plugins下的插件目录
+    :param skip_dirs: 打包目录时跳过的子目录名
+    :param variables: 返回额外模板变量的函数, 只在包出现在依赖图中时调用
+    """
+
+    def __init__(self, data_dirs=(), data_files=(), dlls=(), plugin_dirs=None, skip_dirs=('__pycache__',),
+                 variables=None):
+        self.data_dirs = tuple(data_dirs)
+        self.data_files = tuple(data_files)
+        self.dlls = tuple(dlls)
+        self.plugin_dirs = plugin_dirs or {}
+        self.skip_dirs = tuple(skip_dirs)
+        self.variables = variables
+
+    def files(self, context: dict, listing: DirListing) -> set:
+        """
+        钩子声明的所有存在的文件
+        :param context: 模板变量
+        :param listing: 共用的目录列表缓存
+        :return:
+        """
+        if self.variables is not None:
+            context = dict(context, **self.variables())
+        files = set()
+        for template in self.data_dirs:
+            for dir_path in listing.glob_dirs(os.path.normpath(template.format(**context))):
+                files.update(listing.walk_files(dir_path, self.skip_dirs))
+        for template in self.data_files:
+            file_path = os.path.normpath(template.format(**context))
+            if listing.exists(file_path):
+                files.add(file_path)
+        for template in self.dlls:
+            file_path = os.path.join(context['dlls'], template.format(**context))
+            if listing.exists(file_path):
+                files.add(file_path)
+
+        if self.plugin_dirs:
+            package_dir = context['package']
+            plugins_dir = os.path.join(package_dir, 'plugins')
+            modules = {name.split('.', 1)[0] for name in listing.entries(package_dir) if name.endswith('.pyd')}
+            for module in modules:
+                for plugin_name in self.plugin_dirs.get(module, ()):
+                    files.update(listing.walk_files(os.path.join(plugins_dir, plugin_name), self.skip_dirs))
+        return files
+
+
+# # {顶层包名: 钩子}
+HOOKS = {}
+# # 运行时总是需要的包, 不管是否出现在依赖图中
+ALWAYS_PACKAGES = ('encodings',)
+
+
+def register_hook(names, hook: PackageHook):
+    """
+    注册钩子
+    :param names: 顶层包名或包名列表
+    :param hook:
+    :return:
+    """
+    if isinstance(names, str):
+        names = [names]
+    for name in names:
+        HOOKS[name] = hook
+    return hook
+
+
+def hook_files(packages: dict, base_env_dir: str, site_pkg_dir: str, listing: DirListing = None) -> set:
+    """
+    对依赖图中出现的包求值钩子
+    :param packages: {依赖图中的顶层包名: 包目录, 单文件模块或命名空间包为None}
+    :param base_env_dir: python安装目录
+    :param site_pkg_dir: 默认的site-packages目录
+    :param listing: 共用的目录列表缓存
+    :return: 需要补充的文件集合
+    """
+    if listing is None:
+        listing = DirListing()
+    files = set()
+    names = set(packages) | set(ALWAYS_PACKAGES)
+    for name in sorted(names):
+        hook = HOOKS.get(name)
+        if hook is None:
+            continue
+        package_dir = packages.get(name)
+        context = {
+            'base': base_env_dir,
+            'dlls': os.path.join(base_env_dir, 'DLLs'),
+            'site': os.path.dirname(package_dir) if package_dir else site_pkg_dir,
+            'package': package_dir or os.path.join(site_pkg_dir, name),
+        }
+        files |= hook.files(context, listing)
+    return files
+
+
+def _tkinter_variables():
+    """
+    tcl/tk的库目录和版本号, 需要创建tcl解释器查询
+    """
+    import tkinter
+    import _tkinter
+    tcl_dir = tkinter.Tcl().eval("info library")
+    return {
+        'tcl_dir': tcl_dir,
+        'tk_dir': os.path.join(os.path.dirname(tcl_dir), f'tk{_tkinter.TK_VERSION}'),
+        'tcl_v': _tkinter.TCL_VERSION.replace('.', ''),
+        'tk_v': _tkinter.TK_VERSION.replace('.', ''),
+    }
+
+
+register_hook('tkinter', PackageHook(
+    data_dirs=['{tcl_dir}', '{tk_dir}'],
+    dlls=['tcl{tcl_v}t.dll', 'tk{tk_v}t.dll'],
+    skip_dirs=['__pycache__', 'demos'],
+    variables=_tkinter_variables,
+))
+
+register_hook('encodings', PackageHook(
+    data_files=['{base}/Lib/encodings/gbk.py', '{base}/Lib/encodings/latin_1.py', '{base}/Lib/encodings/utf_8.py',
+                '{base}/Lib/encodings/utf_16_be.py', '{base}/Lib/encodings/cp437.py'],
+))
+
+# # curl_cffi.libs和dist-info等目录
+register_hook('curl_cffi', PackageHook(data_dirs=['{site}/curl_cffi?*']))
+
+register_hook(['PySide2', 'PySide6'], PackageHook(plugin_dirs={
+    "QtQuick": ["scenegraph"],
+    "QtQml": ["qmltooling"],
+    "QtXml": ["scxmldatamodel"],
+    "QtDesigner": ["designer"],
+    "QtWidgets": ["styles"],
+    "QtSql": ["sqldrivers"],
+    "QtSensors": ["sensors"],
+    "QtDeclarative": ["qml1tooling"],
+    "QtPositioning": ["position"],
+    "QtLocation": ["geoservices"],
+    "QtPrintSupport": ["printsupport"],
+    "QtNetwork": ["networkinformation", "tls"],
+    "Qt3DRender": ["geometryloaders", "renderplugins", "renderers", "sceneparsers"],
+    "QtMultimedia": ["multimedia"],
+    "QtGui": ["accessiblebridge", "generic", "iconengines", "imageformats",
+              "platforms", "platforminputcontexts"]
+}))
+
+# # delvewheel把依赖的dll放在site-packages下的<包名>.libs目录
+register_hook('numpy', PackageHook(data_dirs=['{site}/numpy.libs']))
+register_hook('scipy', PackageHook(data_dirs=['{site}/scipy.libs']))
+# # 字体, 样式和matplotlibrc
+register_hook('matplotlib', PackageHook(data_dirs=['{package}/mpl-data', '{site}/matplotlib.libs']))
@@ -0,0 +1,159 @@
+"""
+多进程编译pyc
+作为独立脚本由py_to_pyc启动, 这样进程池的子进程只会导入本文件,
+不会重新执行调用to_pack的用户脚本(windows只能用spawn方式启动子进程)
+用法: python pyc_compiler.py 优化级别 进程数 < py文件列表json > 错误信息列表json
+Created on 2026-10-18
+"""
+import os
+import sys
+import json
+import shutil
+import hashlib
+import py_compile
+import importlib.util
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+
+
+def compile_pyc(py_file, optimize):
+    """
+    编译单个py文件, pyc保存在py文件旁边
+    :param py_file:
+    :param optimize:
+    :return: 出错时返回错误信息
+    """
+    try:
+        py_compile.compile(py_file, cfile=py_file + 'c', doraise=True, optimize=optimize)
+    except Exception as e:
+        return str(e)
+    return None
+
+
+def compile_all(py_files, optimize, workers: int = None):
+    """
+    使用进程池编译, 返回与py_files一一对应的错误信息
+    :param py_files:
+    :param optimize:
+    :param workers: 进程数, 默认为cpu核数, windows上最多61个
+    :return:
+    """
+    workers = min(workers or os.cpu_count() or 1, 61)
+    compile_func = partial(compile_pyc, optimize=optimize)
+    if workers == 1:
+        return [compile_func(py_file) for py_file in py_files]
+    chunksize = max(1, len(py_files) // (workers * 8))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(compile_func, py_files, chunksize=chunksize))
+
+
+def source_digest(py_file) -> str:
+    """
+    py文件内容的sha256
+    :param py_file:
+    :return:
+    """
+    with open(py_file, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def load_pyc_manifest(cache_dir, dest_dir) -> dict:
+    """
+    读取pyc缓存清单, 解释器版本或编译目录变化时清单作废
+    (pyc中的co_filename是编译时的绝对路径, 换目录后不能复用)
+    :param cache_dir: 缓存目录
+    :param dest_dir: 编译的目录
+    :return: {相对路径: [源码sha256, 优化级别]}
+    """
+    manifest_path = os.path.join(cache_dir, 'pyc_manifest.json')
+    try:
+        with open(manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if (manifest.get('magic') != importlib.util.MAGIC_NUMBER.hex()
+            or manifest.get('dest_dir') != os.path.abspath(dest_dir)):
+        return {}
+    return manifest.get('files', {})
+
+
+def save_pyc_manifest(cache_dir, dest_dir, files: dict):
+    """
+    保存pyc缓存清单
+    :param cache_dir:
+    :param dest_dir:
+    :param files: {相对路径: [源码sha256, 优化级别]}
+    :return:
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    manifest = {'magic': importlib.util.MAGIC_NUMBER.hex(), 'dest_dir': os.path.abspath(dest_dir), 'files': files}
+    temp_path = os.path.join(cache_dir, 'pyc_manifest.json.tmp')
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    os.replace(temp_path, os.path.join(cache_dir, 'pyc_manifest.json'))
+
+
+def reuse_cached_pyc(py_files, dest_dir, cache_dir, optimize):
+    """
+    源码和优化级别都没变的文件直接复制缓存的pyc
+    :param py_files:
+    :param dest_dir:
+    :param cache_dir:
+    :param optimize:
+    :return: (复用的py文件, 需要编译的py文件, 清单, {py文件: 源码sha256}),
+             返回的清单只包含复用的文件, 本次没有的文件不再保留
+    """
+    cached_files = load_pyc_manifest(cache_dir, dest_dir)
+    files = {}
+    reused, to_compile, digests = [], [], {}
+    for py_file in py_files:
+        rel_path = os.path.relpath(py_file, dest_dir)
+        digest = digests[py_file] = source_digest(py_file)
+        cached_pyc = os.path.join(cache_dir, 'pyc_cache', rel_path + 'c')
+        if cached_files.get(rel_path) == [digest, optimize] and os.path.exists(cached_pyc):
+            shutil.copyfile(cached_pyc, py_file + 'c')
+            files[rel_path] = cached_files[rel_path]
+            reused.append(py_file)
+        else:
+            to_compile.append(py_file)
+    return reused, to_compile, files, digests
+
+
+def update_pyc_cache(compiled, dest_dir, cache_dir, optimize, files: dict, digests: dict):
+    """
+    把新编译的pyc存入缓存并保存清单, 删除清单之外的缓存pyc
+    :param compiled: 编译成功的py文件
+    :param dest_dir:
+    :param cache_dir:
+    :param optimize:
+    :param files: reuse_cached_pyc返回的清单
+    :param digests: reuse_cached_pyc返回的源码sha256
+    :return:
+    """
+    for py_file in compiled:
+        rel_path = os.path.relpath(py_file, dest_dir)
+        cached_pyc = os.path.join(cache_dir, 'pyc_cache', rel_path + 'c')
+        os.makedirs(os.path.dirname(cached_pyc), exist_ok=True)
+        shutil.copyfile(py_file + 'c', cached_pyc)
+        files[rel_path] = [digests[py_file], optimize]
+    save_pyc_manifest(cache_dir, dest_dir, files)
+
+    pyc_cache_dir = os.path.join(cache_dir, 'pyc_cache')
+    for root, dirs, pyc_files in os.walk(pyc_cache_dir, topdown=False):
+        for pyc_file in pyc_files:
+            cached_pyc = os.path.join(root, pyc_file)
+            if os.path.relpath(cached_pyc, pyc_cache_dir)[:-1] not in files:
+                os.remove(cached_pyc)
+        if root != pyc_cache_dir and not os.listdir(root):
+            os.rmdir(root)
+
+
+def main():
+    optimize, workers = int(sys.argv[1]), int(sys.argv[2])
+    py_files = json.loads(sys.stdin.buffer.read())
+    errors = compile_all(py_files, optimize, workers)
+    sys.stdout.write(json.dumps(errors))
+
+
+if __name__ == '__main__':
+    main()
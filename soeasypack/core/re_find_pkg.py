@@ -7,6 +7,8 @@ import re
 import os
 import sys
 
+from soeasypack.core.tree_scan import SHARED_SCANNER
+
 CHECK_PKGS = ('PySide2', 'PySide6', 'PyQt5', 'PyQt6', 'PySimpleGUI', 'nicegui', 'flet', 'kivy',
               'matplotlib')
 EXCLUDE_DIRS = ['pip', 'IPython', 'PyInstaller', 'nuitka', 'cx_Freeze', 'py2exe', 'soeasypack']
@@ -15,26 +17,23 @@ EXCLUDE_DIRS = ['pip', 'IPython', 'PyInstaller', 'nuitka', 'cx_Freeze', 'py2exe'
 def find_imports(file_dir, search_compile, add_pkg_names):
     imports = set()
 
-    for root, dirs, files in os.walk(file_dir, topdown=True):
-        for dir_ in EXCLUDE_DIRS:
-            if dir_ in root:
-                continue
-        remove_dirs = [dir_ for dir_ in dirs if dir_.startswith('.')]
-        dirs[:] = [d for d in dirs if d not in remove_dirs]
-
-        for file in files:
-            if file.endswith('.py'):
-                try:
-                    with open(os.path.join(root, file), 'r', encoding='utf-8') as fp:
-                        for line in fp:
-                            # 匹配 import 包名 或 from 包名 import ...
-                            match = search_compile.match(line)
-                            if match:
-                                package = next(filter(None, match.groups()), None)
-                                if package and package not in add_pkg_names:
-                                    imports.add(package)
-                except Exception:
-                    pass
+    # # 遍历时跳过隐藏目录和其它打包工具等目录
+    def ignore(root, names):
+        return [name for name in names if name.startswith('.') or name in EXCLUDE_DIRS]
+
+    for entry in SHARED_SCANNER.walk_files(file_dir, ignore):
+        if entry.name.endswith('.py'):
+            try:
+                with open(entry.path, 'r', encoding='utf-8') as fp:
+                    for line in fp:
+                        # 匹配 import 包名 或 from 包名 import ...
+                        match = search_compile.match(line)
+                        if match:
+                            package = next(filter(None, match.groups()), None)
+                            if package and package not in add_pkg_names:
+                                imports.add(package)
+            except Exception:
+                pass
 
     return imports
 
@@ -62,6 +61,8 @@ def get_import_pkgs(pkg_names, site_pkg_dir, search_compile, add_pkg_names, remo
 
 
 def find_pkgs(file_path):
+    # # 每次分析都重新读取目录, 不使用之前调用留下的目录缓存
+    SHARED_SCANNER.clear()
     pkg_names = set()
     current_env_dir = sys.prefix
     search_compile = re.compile(r'^(?:\s*from\s+(\w+)|\s*import\s+(\w+))')
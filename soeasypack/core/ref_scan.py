@@ -0,0 +1,85 @@
+"""
+一次扫描查找文件中引用了哪些名称(dll/pyd文件名)
+所有名称合并成一个按前缀树组织的正则表达式, 每个文件只扫描一遍,
+二进制文件通过mmap交给正则引擎, 不用整个读入内存
+Created on 2026-10-18
+"""
+import os
+import re
+import mmap
+
+
+def _trie_source(trie: dict) -> str:
+    """
+    把前缀树转换成正则表达式, 同一位置优先匹配最长的名称
+    :param trie: {字符: 子树}, 键''表示名称在此结束
+    :return:
+    """
+    alternatives = [re.escape(char) + _trie_source(trie[char]) for char in sorted(trie) if char]
+    if not alternatives:
+        return ''
+    if len(alternatives) == 1 and '' not in trie:
+        return alternatives[0]
+    return '(?:' + '|'.join(alternatives) + (')?' if '' in trie else ')')
+
+
+def compile_names(names):
+    """
+    把所有名称编译成一个正则表达式
+    :param names: 名称都是str或都是bytes, bytes名称编译出的正则用于扫描二进制内容
+    :return: 没有名称时返回None
+    """
+    names = [name for name in names if name]
+    if not names:
+        return None
+    is_bytes = isinstance(names[0], bytes)
+    trie = {}
+    for name in names:
+        # # bytes按latin-1一一对应成字符, 生成正则后再编码回去
+        node = trie
+        for char in (name.decode('latin-1') if is_bytes else name):
+            node = node.setdefault(char, {})
+        node[''] = {}
+    source = _trie_source(trie)
+    return re.compile(source.encode('latin-1') if is_bytes else source, flags=re.DOTALL)
+
+
+def find_names(pattern, content) -> set:
+    """
+    查找content中出现的名称, 包括互相重叠和互为前缀的名称
+    :param pattern: compile_names的结果
+    :param content: str, bytes或mmap
+    :return: 出现的名称集合
+    """
+    if pattern is None:
+        return set()
+    # # 每个起始位置只匹配最长的名称, 从下一个字符继续查找, 这样不会漏掉重叠的名称
+    longest = set()
+    search = pattern.search
+    match = search(content)
+    while match is not None:
+        longest.add(match.group())
+        match = search(content, match.start() + 1)
+
+    # # 较短的名称是同一位置最长名称的前缀
+    found = set(longest)
+    for name in longest:
+        for end in range(1, len(name)):
+            prefix = name[:end]
+            if prefix not in found and pattern.fullmatch(prefix):
+                found.add(prefix)
+    return found
+
+
+def find_names_in_file(pattern, file_path) -> set:
+    """
+    通过mmap扫描二进制文件
+    :param pattern: compile_names(bytes名称)的结果
+    :param file_path:
+    :return: 出现的名称集合(bytes)
+    """
+    if pattern is None or os.path.getsize(file_path) == 0:
+        return set()
+    with open(file_path, 'rb') as fp:
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as content:
+            return find_names(pattern, content)
@@ -15,6 +15,10 @@ from pathlib import Path
 
 from .ast_find_depend import analyze_depends
 from .my_logger import my_logger
+from .tree_scan import SHARED_SCANNER
+
+# # 打包过程的缓存目录名, 在输出目录下
+CACHE_DIR_NAME = '.soeasypack_cache'
 
 
 def is_admin():
@@ -25,11 +29,34 @@ def is_admin():
         return False
 
 
+def get_cache_dir(project_dir):
+    """
+    获取打包过程的缓存目录(pyc缓存, 依赖分析结果等), 不在rundep中, 不会随程序发布;
+    windows上设为隐藏目录
+    :param project_dir: 输出目录
+    :return:
+    """
+    cache_dir = os.path.join(project_dir, CACHE_DIR_NAME)
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir, exist_ok=True)
+        try:
+            # # FILE_ATTRIBUTE_HIDDEN
+            ctypes.windll.kernel32.SetFileAttributesW(cache_dir, 0x02)
+        except AttributeError:
+            pass
+    return cache_dir
+
+
 def check_dependency_files(main_run_path, project_dir, check_dir=None, pack_mode=0,
-                           monitoring_time=18, except_packages=None, delay_time=3):
+                           monitoring_time=18, except_packages=None, delay_time=3, analyze_workers=None,
+                           static_analysis=False):
     """
     检查依赖文件
+    :param analyze_workers: ast模式分析依赖时解析源码的进程数
+    :param static_analysis: ast模式使用静态方式查找模块, 不导入任何依赖包
     """
+    # # 每次检查都重新读取目录, 不使用之前调用留下的目录缓存
+    SHARED_SCANNER.clear()
 
     current_dir = Path(__file__).parent.parent
     procmon_path = current_dir.joinpath('dep_exe/Procmon64.exe')
@@ -45,7 +72,8 @@ def check_dependency_files(main_run_path, project_dir, check_dir=None, pack_mode
         return dependency_files
     if pack_mode == 3:
         my_logger.info('分析依赖文件...')
-        dependency_files = analyze_depends(main_run_path, except_pkgs=except_packages)
+        dependency_files = analyze_depends(main_run_path, except_pkgs=except_packages, cache_dir=get_cache_dir(project_dir),
+                                           workers=analyze_workers, static=static_analysis)
         with open(dependency_file_csv, mode='w', newline='', encoding='utf-8') as fp:
             csv_writer = csv.writer(fp)
             for i in dependency_files:
@@ -200,11 +228,13 @@ def move_files(check_dir, project_dir, dependency_files):
     moved_file_num = 0
     removed_size = 0
 
-    for root, dirs, files in os.walk(check_dir):
+    # # rundep是本次打包复制的, 丢弃之前可能缓存的列表
+    SHARED_SCANNER.forget(check_dir)
+    for root, dirs, files in SHARED_SCANNER.walk(check_dir):
         if "rundep/AppData" in root:
             continue
-        for filename in files:
-            src_file = str(os.path.join(root, filename)).replace('\\', '/')
+        for entry in files:
+            src_file = entry.path.replace('\\', '/')
             if src_file in dependency_files:
                 continue
             else:
@@ -213,12 +243,15 @@ def move_files(check_dir, project_dir, dependency_files):
                     relative_path = str(os.path.relpath(root, check_dir))
                     dest_folder = os.path.join(removed_file_dir, relative_path)
                     os.makedirs(dest_folder, exist_ok=True)
-                    removed_size += os.path.getsize(src_file)
+                    # # 大小取自遍历时的DirEntry
+                    removed_size += entry.stat().st_size
                     # 移动文件
-                    shutil.move(src_file, os.path.join(dest_folder, filename))
+                    shutil.move(src_file, os.path.join(dest_folder, entry.name))
                     moved_file_num += 1
                 except Exception as e:
                     my_logger.error(f"无法移动文件: {src_file}: {e}")
+    # # 文件已移走, 缓存的列表已过期
+    SHARED_SCANNER.forget(check_dir)
 
     # 移除空文件夹
     for root, dirs, files in os.walk(project_dir, topdown=False):
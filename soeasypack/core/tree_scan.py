@@ -0,0 +1,105 @@
+"""
+并发目录扫描
+线程池中对每个目录调用os.scandir, 结果按目录缓存, 一次打包中各处遍历同一目录时只读取一次;
+遍历时就应用忽略规则, 被忽略的目录不会被读取; 返回的os.DirEntry可以直接取stat(windows上不需要额外的系统调用)
+Created on 2026-10-18
+"""
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class TreeScanner:
+    """
+    带缓存的并发目录扫描
+    :param workers: 线程数, 默认为cpu核数+4, 最多32
+    """
+
+    def __init__(self, workers: int = None):
+        self.workers = workers or min(32, (os.cpu_count() or 1) + 4)
+        self._listings = {}
+        self.scans = 0
+
+    def clear(self):
+        """
+        清空所有缓存
+        """
+        self._listings.clear()
+
+    def forget(self, top: str):
+        """
+        清空top及其子目录的缓存, 目录内容被修改后调用
+        """
+        top = os.fspath(top)
+        prefix = os.path.join(top, '')
+        for dir_path in list(self._listings):
+            if dir_path == top or dir_path.startswith(prefix):
+                self._listings.pop(dir_path, None)
+
+    def scandir(self, dir_path: str):
+        """
+        读取目录, 结果缓存
+        :param dir_path:
+        :return: (子目录DirEntry列表, 文件DirEntry列表), 目录不存在时都为空
+        """
+        listing = self._listings.get(dir_path)
+        if listing is not None:
+            return listing
+
+        dirs = []
+        files = []
+        try:
+            with os.scandir(dir_path) as it:
+                for entry in it:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    if is_dir:
+                        dirs.append(entry)
+                    else:
+                        files.append(entry)
+        except OSError:
+            pass
+        self.scans += 1
+        listing = (dirs, files)
+        self._listings[dir_path] = listing
+        return listing
+
+    def walk(self, top: str, ignore=None):
+        """
+        按层遍历目录树, 发现的子目录立即提交到线程池并发读取, 返回顺序固定(广度优先)
+        :param top:
+        :param ignore: 忽略规则, ignore(目录, 名称列表)返回要忽略的名称, 与shutil.copytree的ignore相同;
+                       被忽略的子目录不会被读取
+        :return: 生成(目录, 子目录DirEntry列表, 文件DirEntry列表); 和os.walk一样不进入指向目录的符号链接
+        """
+        top = os.fspath(top)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pending = deque([(top, executor.submit(self.scandir, top))])
+            while pending:
+                root, future = pending.popleft()
+                dirs, files = future.result()
+                if ignore is not None:
+                    ignored = set(ignore(root, [entry.name for entry in dirs + files]))
+                    if ignored:
+                        dirs = [entry for entry in dirs if entry.name not in ignored]
+                        files = [entry for entry in files if entry.name not in ignored]
+                for entry in dirs:
+                    if not entry.is_symlink():
+                        pending.append((entry.path, executor.submit(self.scandir, entry.path)))
+                yield root, dirs, files
+
+    def walk_files(self, top: str, ignore=None):
+        """
+        遍历目录树下的所有文件
+        :param top:
+        :param ignore: 同walk
+        :return: 生成文件的DirEntry
+        """
+        for _, _, files in self.walk(top, ignore):
+            yield from files
+
+
+# # 一次打包中共用的扫描器, to_pack以及analyze_depends, find_pkgs, check_dependency_files开始时清空
+SHARED_SCANNER = TreeScanner()
@@ -9,6 +9,7 @@ package main
 
 import (
 	"archive/zip"
+	"bufio"
 	"bytes"
 	"embed"
 	"fmt"
@@ -18,7 +19,10 @@ import (
 	"math/rand"
 	"path/filepath"
 	"runtime"
+	"strconv"
+	"strings"
 	"sync"
+	"time"
 	"unsafe"
 	"windows"
 )
@@ -29,7 +33,10 @@ var onefile bool = false
 var packmode int = 0
 var mainPyCode string = `main_pycode`
 var memoryName string = "memory_name"
+var memorySize int = 0
 var xorKey string = "xor_key"
+var rundepHash string = "rundep_hash"
+var cacheKeepDays int = 7
 func MessageBox(title, message string) {
 	user32, _ := windows.LoadDLL("user32.dll")
 
@@ -67,14 +74,21 @@ func generateRandomString(length int) (string, error) {
 	return string(b), nil
 }
 func createSharedMemory() (windows.Handle, uintptr) {
-	zipData, err := embedZip.ReadFile("soeasypack.sz")
+	zipFile, err := embedZip.Open("soeasypack.sz")
+	if err != nil {
+		MessageBox("错误", "找不到zipData:"+err.Error())
+		return 0, 0
+	}
+	defer zipFile.Close()
+	zipInfo, err := zipFile.Stat()
 	if err != nil {
 		MessageBox("错误", "找不到zipData:"+err.Error())
 		return 0, 0
 	}
 
-	memSize := len(zipData)
+	memSize := int(zipInfo.Size())
 	memoryName, _ = generateRandomString(8)
+	memorySize = memSize
 
 	securityAttrs := &windows.SecurityAttributes{
 		Length:        uint32(unsafe.Sizeof(windows.SecurityAttributes{})),
@@ -100,7 +114,16 @@ func createSharedMemory() (windows.Handle, uintptr) {
 		return 0, 0
 	}
 
-	copy((*[1 << 30]byte)(unsafe.Pointer(addr))[:memSize], zipData)
+	// 直接从嵌入数据读入共享内存，不再先复制一份到堆上
+	if _, err := io.ReadFull(zipFile, unsafe.Slice((*byte)(unsafe.Pointer(addr)), memSize)); err != nil {
+		windows.UnmapViewOfFile(addr)
+		windows.CloseHandle(handle)
+		MessageBox("错误", "写入共享内存失败:"+err.Error())
+		return 0, 0
+	}
+	// 单文件模式下子进程通过环境变量找到共享内存
+	os.Setenv("SEPMEMORY", memoryName)
+	os.Setenv("SEPMEMSIZE", strconv.Itoa(memSize))
 	return handle, addr
 }
 
@@ -172,6 +195,146 @@ func extractZip(zipReader io.ReaderAt, size int64, dest string) error {
 	return firstErr
 }
 
+// 检查缓存目录是否完整：清单中的每个文件都存在且大小一致
+// 清单不包含AppData(程序的工作目录)，程序修改其中的配置、数据库等文件不会导致重新解压
+func cacheValid(cacheDir string) bool {
+	manifest, err := os.Open(filepath.Join(cacheDir, "manifest.txt"))
+	if err != nil {
+		return false
+	}
+	defer manifest.Close()
+	scanner := bufio.NewScanner(manifest)
+	for scanner.Scan() {
+		size, name, found := strings.Cut(scanner.Text(), "\t")
+		if !found {
+			return false
+		}
+		info, err := os.Stat(filepath.Join(cacheDir, "rundep", name))
+		if err != nil || strconv.FormatInt(info.Size(), 10) != size {
+			return false
+		}
+	}
+	return scanner.Err() == nil
+}
+
+// 把rundep.zip解压到临时目录，写入清单后整体重命名为缓存目录，保证其它进程看不到解压了一半的目录
+// 返回本次运行使用的目录：正常为缓存目录，旧目录正被其它实例使用无法替换时为刚解压的临时目录
+func publishCache(cacheRoot string, cacheDir string) (string, error) {
+	zipData, err := embedZip.ReadFile("rundep.zip")
+	if err != nil {
+		return "", err
+	}
+	tempDir, err := os.MkdirTemp(cacheRoot, rundepHash+".tmp")
+	if err != nil {
+		return "", err
+	}
+	keepTempDir := false
+	defer func() {
+		if !keepTempDir {
+			os.RemoveAll(tempDir)
+		}
+	}()
+
+	zipReader := bytes.NewReader(zipData)
+	if err := extractZip(zipReader, int64(len(zipData)), filepath.Join(tempDir, "rundep")); err != nil {
+		return "", err
+	}
+	zipR, err := zip.NewReader(zipReader, int64(len(zipData)))
+	if err != nil {
+		return "", err
+	}
+	var manifest strings.Builder
+	for _, f := range zipR.File {
+		if !f.FileInfo().IsDir() && !strings.HasPrefix(f.Name, "AppData/") {
+			manifest.WriteString(strconv.FormatUint(f.UncompressedSize64, 10) + "\t" + f.Name + "\n")
+		}
+	}
+	if err := os.WriteFile(filepath.Join(tempDir, "manifest.txt"), []byte(manifest.String()), 0644); err != nil {
+		return "", err
+	}
+
+	// 其它进程可能在解压期间已发布了完整的缓存并正在使用，不能移走
+	if cacheValid(cacheDir) {
+		return cacheDir, nil
+	}
+	if fileExists(cacheDir) {
+		// 已存在但不完整的缓存目录，先移走再发布
+		staleDir := cacheDir + ".stale" + strconv.FormatInt(time.Now().UnixNano(), 36)
+		if err := os.Rename(cacheDir, staleDir); err != nil {
+			if cacheValid(cacheDir) {
+				return cacheDir, nil
+			}
+			// 旧目录中的文件正被其它实例使用(windows上无法移走)，本次从刚解压的临时目录运行
+			if fileExists(cacheDir) {
+				keepTempDir = true
+				return tempDir, nil
+			}
+		} else {
+			os.RemoveAll(staleDir)
+		}
+	}
+	if err := os.Rename(tempDir, cacheDir); err != nil {
+		// 其它进程已先一步发布了同一版本
+		if cacheValid(cacheDir) {
+			return cacheDir, nil
+		}
+		keepTempDir = true
+		return tempDir, nil
+	}
+	return cacheDir, nil
+}
+
+// 清理超过cacheKeepDays天未使用的其它版本缓存，以及残留的临时目录
+func cleanStaleCache(cacheRoot string) {
+	entries, err := os.ReadDir(cacheRoot)
+	if err != nil {
+		return
+	}
+	deadline := time.Now().AddDate(0, 0, -cacheKeepDays)
+	for _, entry := range entries {
+		if !entry.IsDir() || entry.Name() == rundepHash {
+			continue
+		}
+		dir := filepath.Join(cacheRoot, entry.Name())
+		info, err := os.Stat(filepath.Join(dir, "lastused"))
+		if err != nil {
+			info, err = entry.Info()
+			if err != nil {
+				continue
+			}
+		}
+		if info.ModTime().Before(deadline) {
+			os.RemoveAll(dir)
+		}
+	}
+}
+
+// 获取单文件模式的持久化解压目录，按rundep.zip的内容哈希区分版本，已解压过的直接复用
+func extractCacheDir() (string, error) {
+	cacheRoot, err := os.UserCacheDir()
+	if err != nil {
+		cacheRoot = os.TempDir()
+	}
+	cacheRoot = filepath.Join(cacheRoot, "soeasypack")
+	if err := os.MkdirAll(cacheRoot, os.ModePerm); err != nil {
+		return "", err
+	}
+	cacheDir := filepath.Join(cacheRoot, rundepHash)
+	if !cacheValid(cacheDir) {
+		cacheDir, err = publishCache(cacheRoot, cacheDir)
+		if err != nil {
+			return "", err
+		}
+	}
+	now := time.Now()
+	lastUsed := filepath.Join(cacheDir, "lastused")
+	if err := os.Chtimes(lastUsed, now, now); err != nil {
+		os.WriteFile(lastUsed, nil, 0644)
+	}
+	cleanStaleCache(cacheRoot)
+	return cacheDir, nil
+}
+
 type stderrCapturer struct {
 	buf *bytes.Buffer
 }
@@ -187,25 +350,10 @@ func main() {
 		originDir, _ := os.Getwd()
 		os.Setenv("originDir", originDir)
 		if onefile {
-			// 创建临时目录
-			var err error
-			currentDir, err := os.MkdirTemp("", "soeasypack")
-			if err != nil {
-				return
-			}
-			// 读取嵌入的zip文件内容
-			zipData, err := embedZip.ReadFile("rundep.zip")
+			// 解压到持久化缓存目录，同一版本只在第一次启动时解压
+			currentDir, err := extractCacheDir()
 			if err != nil {
-				MessageBox("错误", "读取压缩包数据失败: "+err.Error())
-				return
-			}
-
-			// 使用bytes.Reader包装zip数据，以提供io.ReaderAt接口
-			zipReader := bytes.NewReader(zipData)
-			rundepDir := currentDir + "\\rundep"
-			// 解压zip文件到临时目录
-			if err := extractZip(zipReader, int64(len(zipData)), rundepDir); err != nil {
-				MessageBox("错误", "解压数据到临时目录失败: "+err.Error())
+				MessageBox("错误", "解压数据到缓存目录失败: "+err.Error())
 				return
 			}
 			SEPHOME = currentDir
@@ -224,7 +372,6 @@ func main() {
 			if err := cmd.Run(); err != nil {
 				MessageBox("错误", "启动失败: "+err.Error())
 			}
-			os.RemoveAll(currentDir) // 程序退出时删除临时目录
 			return
 		} else {
 			currentDir, _ := os.Getwd()
@@ -277,27 +424,73 @@ func main() {
 	} else {
 		pyDllPath = os.Getenv("pyDllPath")
 		os.Setenv("isSubProcess", "1")
+		memoryName = os.Getenv("SEPMEMORY")
+		memorySize, _ = strconv.Atoi(os.Getenv("SEPMEMSIZE"))
 	}
 
 	pyCode := fmt.Sprintf(`
 import os
 import sys
+import atexit
 import marshal
+import struct
 import zipfile
+import zlib
 import importlib.abc
 import importlib.util
-from io import BytesIO, BufferedReader
+from io import RawIOBase
+from types import MappingProxyType
 from multiprocessing import shared_memory as shm
 from importlib.machinery import ExtensionFileLoader, EXTENSION_SUFFIXES, FileFinder
 
+class MemoryViewReader(RawIOBase):
+    """
+    直接读取内存(共享内存)的只读文件对象，不把整个归档复制一份
+    """
+
+    def __init__(self, view):
+        self.view = view
+        self.pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def seek(self, offset, whence=0):
+        if whence == 1:
+            offset += self.pos
+        elif whence == 2:
+            offset += len(self.view)
+        self.pos = offset
+        return offset
+
+    def tell(self):
+        return self.pos
+
+    def read(self, size=-1):
+        end = len(self.view) if size is None or size < 0 else self.pos + size
+        data = self.view[self.pos:end].tobytes()
+        self.pos += len(data)
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
 class ZipMemoryLoader(importlib.abc.MetaPathFinder, importlib.abc.Loader):
-    def __init__(self, zip_data):
-        self.zip_data = zip_data
-        self.zip_file = zipfile.ZipFile(BytesIO(zip_data), 'r')
+    def __init__(self, zip_data, key_bytes):
+        self.zip_data = memoryview(zip_data)
+        self.key_bytes = key_bytes
+        self.zip_file = zipfile.ZipFile(MemoryViewReader(self.zip_data), 'r')
+        # 文件名到ZipInfo的只读索引，只构建一次，避免每次导入都调用namelist()线性查找
+        self.zip_index = MappingProxyType({info.filename: info for info in self.zip_file.infolist()})
         self.module_cache = {}  # 缓存模块路径到模块名的映射
         self.rundep_dir = os.path.dirname(os.getcwd())
         # 构建模块路径缓存
-        for path in self.zip_file.namelist():
+        for path in self.zip_index:
             # 将路径转换为模块名
             module_name = path[:-4].replace('/', '.').replace('\\', '.')
             if module_name.endswith('.__init__'):
@@ -334,38 +527,65 @@ class ZipMemoryLoader(importlib.abc.MetaPathFinder, importlib.abc.Loader):
         """
         return None
 
+    def read_member(self, zip_info):
+        """
+        只解密并解压一个文件：文件数据按其在归档中的偏移单独混淆
+        """
+        header_offset = zip_info.header_offset
+        name_length, extra_length = struct.unpack('<HH', self.zip_data[header_offset + 26:header_offset + 30])
+        data_start = header_offset + 30 + name_length + extra_length
+        data = xor_decrypt(self.zip_data[data_start:data_start + zip_info.compress_size], self.key_bytes, data_start)
+        if zip_info.compress_type == zipfile.ZIP_DEFLATED:
+            data = zlib.decompress(data, -15)
+        return data
+
     def exec_module(self, module):
         """
         执行模块代码，将其加载到模块的命名空间中。
         """
         spec = module.__spec__
-        origin = spec.origin
-        if origin and origin in self.zip_file.namelist():
-            with self.zip_file.open(origin) as source_file:
-                # 跳过 pyc 文件头部并加载字节码
-                source_file.read(16)  # 跳过 16 字节头部
-                code = marshal.load(source_file)
-                # 如果是包，设置 __package__ 和 __path__
-                if spec.submodule_search_locations:
-                    module.__package__ = spec.name
-                    module.__path__ = spec.submodule_search_locations
-                else:
-                    module.__package__ = spec.parent
-
-                # 执行模块代码
-                exec(code, module.__dict__)
+        zip_info = self.zip_index.get(spec.origin)
+        if zip_info is not None:
+            # 跳过 16 字节 pyc 文件头部并加载字节码
+            code = marshal.loads(memoryview(self.read_member(zip_info))[16:])
+            # 如果是包，设置 __package__ 和 __path__
+            if spec.submodule_search_locations:
+                module.__package__ = spec.name
+                module.__path__ = spec.submodule_search_locations
+            else:
+                module.__package__ = spec.parent
+
+            # 执行模块代码
+            exec(code, module.__dict__)
+
+def xor_decrypt(data, key_bytes, offset=0):
+    """
+    整块异或解密：密钥按数据在归档中的偏移对齐，转成大整数后一次异或
+    """
+    size = len(data)
+    key_length = len(key_bytes)
+    shift = offset %% key_length
+    key_stream = (key_bytes[shift:] + key_bytes * (size // key_length + 1))[:size]
+    return (int.from_bytes(data, 'little') ^ int.from_bytes(key_stream, 'little')).to_bytes(size, 'little')
+
+def release_shared_memory():
+    # 先移除加载器，之后的导入(atexit、__del__、logging关闭等)交给其它查找器，不会读到已释放的内存
+    if loader in sys.meta_path:
+        sys.meta_path.remove(loader)
+    try:
+        loader.zip_data.release()
+        zip_view.release()
+        shared_mem.close()
+    except BufferError:
+        # 仍有对共享内存的引用时交给解释器退出时释放
+        pass
 
 shared_mem = shm.SharedMemory(name="%s")
-zip_data = bytearray(shared_mem.buf.tobytes())
-shared_mem.close()
-del shared_mem
-key_bytes = "%s".encode('utf-8')
-key_length = len(key_bytes)
-len_data = len(zip_data)
-for i in range(len_data):
-    zip_data[i] ^= key_bytes[i %% key_length]
-zip_data = bytes(zip_data)
-loader = ZipMemoryLoader(zip_data)
+# 共享内存会按页对齐，只取归档的实际长度
+zip_view = shared_mem.buf[:%d]
+# 共享内存保持混淆状态，导入模块时才解密对应的文件
+loader = ZipMemoryLoader(zip_view, "%s".encode('utf-8'))
+atexit.register(release_shared_memory)
 sys.meta_path.insert(0, loader)
 sys.frozen = True
 globals_ = {'__file__': 'main', '__name__': '__main__'}
@@ -382,7 +602,7 @@ except Exception:
     e = traceback.format_exc()
     print(e)
     ctypes.windll.user32.MessageBoxW(0, e, "错误", 0x10)
-`, memoryName, xorKey, mainPyCode)
+`, memoryName, memorySize, xorKey, mainPyCode)
 	// 切换工作目录
 	os.Chdir(SEPHOME + "\\rundep\\AppData")
 	// 加载 pythonxx.dll
@@ -0,0 +1,204 @@
+"""
+Persistent cache for the per-module analysis done by
+:func:`modulegraph2._graphbuilder.node_for_spec`.
+
+Parsing and compiling every stdlib and site-packages module dominates
+the time needed to build a graph, while those files almost never change
+between runs. The cache stores the extracted import information, the
+globals read and written and the node type for each source or bytecode
+file, keyed by the file's mtime and size. The cache file itself is
+specific to the interpreter version.
+"""
+import importlib.util
+import marshal
+import os
+import sys
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from ._importinfo import ImportInfo, create_importinfo
+
+# Bump when the layout of an entry changes.
+CACHE_FORMAT = 2
+
+ImportTuple = Tuple[
+    str,
+    Optional[str],
+    int,
+    Optional[Tuple[Tuple[str, Optional[str]], ...]],
+    bool,
+    bool,
+    bool,
+]
+
+
+class AnalysisEntry:
+    """
+    The cached analysis result for a single file
+
+    Attributes:
+      node_type (str): Name of the node class (``SourceModule``,
+                       ``BytecodeModule`` or ``InvalidModule``)
+
+      imports (List[ImportInfo]): Import statements in the module
+
+      globals_written (Set[str]): Global names written by the module
+
+      globals_read (Set[str]): Global names read by the module
+
+      namespace_hint (Optional[str]): ``"pkg_resources"`` or ``"pkgutil"``
+                       when the source mentions these names, used to
+                       detect explicit namespace packages.
+    """
+
+    __slots__ = (
+        "node_type",
+        "imports",
+        "globals_written",
+        "globals_read",
+        "namespace_hint",
+    )
+
+    def __init__(
+        self,
+        node_type: str,
+        imports: List[ImportInfo],
+        globals_written: Set[str],
+        globals_read: Set[str],
+        namespace_hint: Optional[str],
+    ):
+        self.node_type = node_type
+        self.imports = imports
+        self.globals_written = globals_written
+        self.globals_read = globals_read
+        self.namespace_hint = namespace_hint
+
+
+def _import_to_tuple(info: ImportInfo) -> ImportTuple:
+    names: Optional[Tuple[Tuple[str, Optional[str]], ...]]
+    if info.import_names or info.star_import:
+        names = tuple(sorted((str(nm), nm.asname) for nm in info.import_names))
+        if info.star_import:
+            names += (("*", None),)
+    else:
+        names = None
+
+    return (
+        str(info.import_module),
+        info.import_module.asname,
+        info.import_level,
+        names,
+        info.is_in_function,
+        info.is_in_conditional,
+        info.is_in_tryexcept,
+    )
+
+
+def _import_from_tuple(value: ImportTuple) -> ImportInfo:
+    name, asname, level, names, in_def, in_if, in_tryexcept = value
+    return create_importinfo((name, asname), names, level, in_def, in_if, in_tryexcept)
+
+
+class AnalysisCache:
+    """
+    On-disk cache of module analysis results
+
+    Args:
+      cache_dir: Directory for the cache file, created when needed.
+    """
+
+    def __init__(self, cache_dir: os.PathLike):
+        tag = importlib.util.MAGIC_NUMBER.hex()
+        self._path = os.path.join(
+            os.fspath(cache_dir),
+            f"modulegraph2-{sys.implementation.cache_tag}-{tag}.cache",
+        )
+        self._entries: Dict[str, tuple] = self._load()
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self) -> Dict[str, tuple]:
+        try:
+            with open(self._path, "rb") as fp:
+                data = marshal.load(fp)
+        except (OSError, EOFError, ValueError, TypeError):
+            return {}
+
+        if not isinstance(data, dict) or data.get("format") != CACHE_FORMAT:
+            return {}
+        return data["entries"]
+
+    def save(self) -> None:
+        """
+        Write the cache to disk when entries were added since the last save.
+        """
+        if not self._dirty:
+            return
+
+        os.makedirs(os.path.dirname(self._path), exist_ok=True)
+        tmp_path = f"{self._path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as fp:
+            marshal.dump({"format": CACHE_FORMAT, "entries": self._entries}, fp)
+        os.replace(tmp_path, self._path)
+        self._dirty = False
+
+    @staticmethod
+    def _stamp(filename: str) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(filename)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def is_current(self, filename: str) -> bool:
+        """
+        True when there is an entry for *filename* that is still valid.
+        """
+        value = self._entries.get(filename)
+        return value is not None and value[0] == self._stamp(filename)
+
+    def lookup(self, filename: str) -> Optional[AnalysisEntry]:
+        """
+        Return the cached analysis for *filename*, or None when there is
+        no entry or the file changed since the entry was stored.
+        """
+        value = self._entries.get(filename)
+        if value is None or value[0] != self._stamp(filename):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        _, node_type, imports, written, read, namespace_hint = value
+        return AnalysisEntry(
+            node_type,
+            [_import_from_tuple(item) for item in imports],
+            set(written),
+            set(read),
+            namespace_hint,
+        )
+
+    def store(
+        self,
+        filename: str,
+        node_type: str,
+        imports: Iterable[ImportInfo],
+        globals_written: Iterable[str],
+        globals_read: Iterable[str],
+        namespace_hint: Optional[str],
+    ) -> None:
+        """
+        Record the analysis for *filename*.
+        """
+        stamp = self._stamp(filename)
+        if stamp is None:
+            return
+
+        self._entries[filename] = (
+            stamp,
+            node_type,
+            tuple(_import_to_tuple(info) for info in imports),
+            tuple(globals_written),
+            tuple(globals_read),
+            namespace_hint,
+        )
+        self._dirty = True
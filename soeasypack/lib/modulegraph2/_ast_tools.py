@@ -1,73 +1,428 @@
 """
-Tools for working with the AST for a module. This currently just defines
-a function for extracting information about import statements from the AST.
+Tools for working with the AST for a module. This defines functions for
+extracting information about import statements and the use of global
+names from the AST.
 """
 import ast
 import collections
-from typing import Deque, Iterator, Tuple
+from typing import Deque, Iterator, List, Optional, Set, Tuple
 
 from ._importinfo import ImportInfo, create_importinfo
 
+_FUNCTION = 0
+_CLASS = 1
+_MODULE = 2
 
-def extract_ast_info(node: ast.AST) -> Iterator[ImportInfo]:
+_COMPREHENSIONS = (ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)
+
+# Pattern matching nodes (Python 3.10 or later) that bind a name
+_MATCH_NAME_BINDERS: tuple = tuple(
+    getattr(ast, cls_name) for cls_name in ("MatchAs", "MatchStar") if hasattr(ast, cls_name)
+)
+_MATCH_REST_BINDERS: tuple = (ast.MatchMapping,) if hasattr(ast, "MatchMapping") else ()
+
+# Node types that need more than a walk of their children. All other
+# nodes are handled by a generic (and much cheaper) code path.
+_SPECIAL_NODES = frozenset(
+    (
+        ast.Import,
+        ast.ImportFrom,
+        ast.If,
+        ast.FunctionDef,
+        ast.AsyncFunctionDef,
+        ast.ClassDef,
+        ast.Lambda,
+        ast.NamedExpr,
+        ast.AugAssign,
+        ast.AnnAssign,
+        ast.Global,
+        ast.Nonlocal,
+        ast.ExceptHandler,
+        ast.Try,
+    )
+    + _COMPREHENSIONS
+    + _MATCH_NAME_BINDERS
+    + _MATCH_REST_BINDERS
+)
+
+
+class _Scope:
     """
-    Scan the AST for a module to look for import statements.
+    Name binding information for a single scope (module, class or function).
 
-    The AST scanner gives the most detailed information about import statements,
-    and includes information about renames (``import ... as ...``), and the
-    location of imports (global, in a function, in a try/except statement, in a
-    conditional statement).
+    Lambdas and comprehensions are function scopes.
+    """
 
-    The scanner explicitly manages a work queue and will not recurse to avoid
-    exhausting the stack.
+    __slots__ = (
+        "kind",
+        "parent",
+        "is_comprehension",
+        "bound",
+        "stored",
+        "globals",
+        "nonlocals",
+        "loads",
+    )
+
+    def __init__(
+        self, kind: int, parent: "Optional[_Scope]", is_comprehension: bool = False
+    ):
+        self.kind = kind
+        self.parent = parent
+        self.is_comprehension = is_comprehension
+
+        # Names that are local to the scope
+        self.bound: Set[str] = set()
+
+        # Names that are actually assigned to (used for the module scope,
+        # ``del x`` and ``x: int`` make *x* local but do not assign)
+        self.stored: Set[str] = set()
+
+        self.globals: Set[str] = set()
+        self.nonlocals: Set[str] = set()
+        self.loads: Set[str] = set()
+
+    def store(self, name: str) -> None:
+        self.bound.add(name)
+        self.stored.add(name)
+
+    def is_global_read(self, name: str) -> bool:
+        """
+        True if reading *name* in this scope reads a global, that is
+        the name is not local to this scope or an enclosing function.
+        """
+        if self.kind == _MODULE:
+            return True
+
+        elif self.kind == _CLASS:
+            # Other names in a class body are looked up in the
+            # class namespace first and are not global reads.
+            return name in self.globals
+
+        scope: Optional[_Scope] = self
+        while scope is not None:
+            if scope.kind == _MODULE or name in scope.globals:
+                return True
+
+            elif scope.kind == _FUNCTION and (
+                name in scope.bound or name in scope.nonlocals
+            ):
+                return False
+
+            # Class scopes are not visible from nested functions
+            scope = scope.parent
+
+        return True  # pragma: no cover
+
+
+def _function_scope(scope: _Scope) -> _Scope:
+    """
+    Return the scope that binds an assignment expression in *scope*
+    """
+    while scope.is_comprehension:
+        assert scope.parent is not None
+        scope = scope.parent
+    return scope
+
+
+def _bind_arguments(args: ast.arguments, scope: _Scope) -> None:
+    for arg in args.posonlyargs + args.args + args.kwonlyargs:
+        scope.store(arg.arg)
+    if args.vararg is not None:
+        scope.store(args.vararg.arg)
+    if args.kwarg is not None:
+        scope.store(args.kwarg.arg)
+
+
+def _argument_expressions(args: ast.arguments, annotations: bool) -> List[ast.AST]:
+    """
+    Return the parts of *args* that are evaluated when the function is defined
+    """
+    result: List[ast.AST] = list(args.defaults)
+    result.extend(default for default in args.kw_defaults if default is not None)
+    if annotations:
+        for arg in args.posonlyargs + args.args + args.kwonlyargs:
+            if arg.annotation is not None:
+                result.append(arg.annotation)
+        for arg in (args.vararg, args.kwarg):
+            if arg is not None and arg.annotation is not None:
+                result.append(arg.annotation)
+    return result
+
+
+def extract_ast_module_info(
+    node: ast.AST,
+) -> Tuple[List[ImportInfo], Set[str], Set[str]]:
+    """
+    Scan the AST for a module to look for import statements and the use
+    of global names.
+
+    This is a single pass replacement for running both :func:`extract_ast_info`
+    and :func:`modulegraph2._bytecode_tools.extract_bytecode_info` on the
+    same module. "Global names written" are the names assigned at module
+    level or through a ``global`` statement, and the names in the "from" list
+    of module level "from" imports. "Global names read" are the names read
+    at module level or read as globals in a function.
 
     Args:
       node: The AST for a module
 
     Returns:
-      An iterator that yields information about all located import statements
+      A tuple of three items:
+      1) List of all imports, in the same order as :func:`extract_ast_info`
+      2) A set of global names written
+      3) A set of global names read
     """
     # The obvious way to walk the AST is to use a NodeVisitor, but
     # that can exhaust the stack. Therefore this function iteratively
     # works the ast keeping state on a manual work queue.
-    work_q: Deque[Tuple[ast.AST, bool, bool, bool]] = collections.deque()
-    work_q.append((node, False, False, False))
+    imports: List[ImportInfo] = []
+    module_scope = _Scope(_MODULE, None)
+    scopes: List[_Scope] = [module_scope]
+    from_names: Set[str] = set()
+    future_annotations = False
+
+    body = getattr(node, "body", None)
+    if body:
+        first = body[0]
+        if (
+            isinstance(first, ast.Expr)
+            and isinstance(first.value, ast.Constant)
+            and isinstance(first.value.value, str)
+        ):
+            module_scope.store("__doc__")
+
+        for stmt in body:
+            if isinstance(stmt, ast.ImportFrom) and stmt.module == "__future__":
+                if any(nm.name == "annotations" for nm in stmt.names):
+                    future_annotations = True
+            elif not (
+                isinstance(stmt, ast.Expr) and isinstance(stmt.value, ast.Constant)
+            ):
+                break
+
+    work_q: Deque[Tuple[ast.AST, bool, bool, bool, _Scope]] = collections.deque()
+    work_q.append((node, False, False, False, module_scope))
     while work_q:
-        node, in_def, in_if, in_tryexcept = work_q.popleft()
+        node, in_def, in_if, in_tryexcept, scope = work_q.popleft()
+        node_type = type(node)
+
+        if node_type is ast.Name:
+            ctx_type = type(node.ctx)  # type: ignore[attr-defined]
+            if ctx_type is ast.Load:
+                scope.loads.add(node.id)  # type: ignore[attr-defined]
+            elif ctx_type is ast.Store:
+                scope.store(node.id)  # type: ignore[attr-defined]
+            else:
+                scope.bound.add(node.id)  # type: ignore[attr-defined]
+
+        elif node_type not in _SPECIAL_NODES:
+            # Same order as ast.iter_child_nodes, but without nodes
+            # that have no fields (expression contexts and operators).
+            for field in node_type._fields:
+                value = getattr(node, field, None)
+                if isinstance(value, list):
+                    for item in value:
+                        if isinstance(item, ast.AST) and item._fields:
+                            work_q.append(
+                                (item, in_def, in_if, in_tryexcept, scope)
+                            )
+                elif isinstance(value, ast.AST) and value._fields:
+                    work_q.append((value, in_def, in_if, in_tryexcept, scope))
 
-        if isinstance(node, ast.Import):
+        elif node_type is ast.Import:
             for nm in node.names:
-                yield create_importinfo(
-                    (nm.name, nm.asname), None, 0, in_def, in_if, in_tryexcept
+                imports.append(
+                    create_importinfo(
+                        (nm.name, nm.asname), None, 0, in_def, in_if, in_tryexcept
+                    )
                 )
+                scope.store(nm.asname or nm.name.partition(".")[0])
 
         elif isinstance(node, ast.ImportFrom):
-            yield create_importinfo(
-                (node.module or "", None),
-                {(nm.name, nm.asname) for nm in node.names},
-                node.level,
-                in_def,
-                in_if,
-                in_tryexcept,
+            imports.append(
+                create_importinfo(
+                    (node.module or "", None),
+                    {(nm.name, nm.asname) for nm in node.names},
+                    node.level,
+                    in_def,
+                    in_if,
+                    in_tryexcept,
+                )
             )
+            for nm in node.names:
+                if nm.name != "*":
+                    scope.store(nm.asname or nm.name)
+                    if scope is module_scope:
+                        from_names.add(nm.name)
 
         elif isinstance(node, ast.If):
             for child in ast.iter_child_nodes(node):
-                work_q.append((child, in_def, True, in_tryexcept))
+                work_q.append((child, in_def, True, in_tryexcept, scope))
 
         elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            scope.store(node.name)
+            func_scope = _Scope(_FUNCTION, scope)
+            scopes.append(func_scope)
+            _bind_arguments(node.args, func_scope)
+
+            for child in _argument_expressions(node.args, not future_annotations):
+                work_q.append((child, True, in_if, in_tryexcept, scope))
+            for child in node.body:
+                work_q.append((child, True, in_if, in_tryexcept, func_scope))
+            for child in node.decorator_list:
+                work_q.append((child, True, in_if, in_tryexcept, scope))
+            if node.returns is not None and not future_annotations:
+                work_q.append((node.returns, True, in_if, in_tryexcept, scope))
+
+        elif isinstance(node, ast.ClassDef):
+            scope.store(node.name)
+            class_scope = _Scope(_CLASS, scope)
+            scopes.append(class_scope)
+
+            for child in node.bases:
+                work_q.append((child, in_def, in_if, in_tryexcept, scope))
+            for child in node.keywords:
+                work_q.append((child, in_def, in_if, in_tryexcept, scope))
+            for child in node.body:
+                work_q.append((child, in_def, in_if, in_tryexcept, class_scope))
+            for child in node.decorator_list:
+                work_q.append((child, in_def, in_if, in_tryexcept, scope))
+
+        elif isinstance(node, ast.Lambda):
+            func_scope = _Scope(_FUNCTION, scope)
+            scopes.append(func_scope)
+            _bind_arguments(node.args, func_scope)
+
+            for child in _argument_expressions(node.args, False):
+                work_q.append((child, in_def, in_if, in_tryexcept, scope))
+            work_q.append((node.body, in_def, in_if, in_tryexcept, func_scope))
+
+        elif isinstance(node, _COMPREHENSIONS):
+            comp_scope = _Scope(_FUNCTION, scope, is_comprehension=True)
+            scopes.append(comp_scope)
+
+            # The outermost iterable is evaluated in the enclosing scope
+            for idx, generator in enumerate(node.generators):
+                work_q.append(
+                    (
+                        generator.iter,
+                        in_def,
+                        in_if,
+                        in_tryexcept,
+                        scope if idx == 0 else comp_scope,
+                    )
+                )
+                work_q.append(
+                    (generator.target, in_def, in_if, in_tryexcept, comp_scope)
+                )
+                for child in generator.ifs:
+                    work_q.append((child, in_def, in_if, in_tryexcept, comp_scope))
+
+            if isinstance(node, ast.DictComp):
+                work_q.append((node.key, in_def, in_if, in_tryexcept, comp_scope))
+                work_q.append((node.value, in_def, in_if, in_tryexcept, comp_scope))
+            else:
+                work_q.append((node.elt, in_def, in_if, in_tryexcept, comp_scope))
+
+        elif isinstance(node, ast.NamedExpr):
+            target_scope = _function_scope(scope)
+            if isinstance(node.target, ast.Name):
+                if target_scope is scope:
+                    target_scope.store(node.target.id)
+                else:
+                    # Assigned from a comprehension: this is a local of the
+                    # enclosing function, or a (not stored) global name.
+                    target_scope.bound.add(node.target.id)
+            work_q.append((node.value, in_def, in_if, in_tryexcept, scope))
+
+        elif isinstance(node, ast.AugAssign):
+            if isinstance(node.target, ast.Name):
+                scope.loads.add(node.target.id)
             for child in ast.iter_child_nodes(node):
-                work_q.append((child, True, in_if, in_tryexcept))
+                work_q.append((child, in_def, in_if, in_tryexcept, scope))
+
+        elif isinstance(node, ast.AnnAssign):
+            if isinstance(node.target, ast.Name):
+                if node.value is not None:
+                    scope.store(node.target.id)
+                else:
+                    scope.bound.add(node.target.id)
+                if node.simple and scope.kind == _MODULE:
+                    scope.loads.add("__annotations__")
+            else:
+                work_q.append((node.target, in_def, in_if, in_tryexcept, scope))
+
+            if node.value is not None:
+                work_q.append((node.value, in_def, in_if, in_tryexcept, scope))
+            if scope.kind != _FUNCTION and not future_annotations:
+                work_q.append((node.annotation, in_def, in_if, in_tryexcept, scope))
+
+        elif isinstance(node, ast.Global):
+            scope.globals.update(node.names)
+
+        elif isinstance(node, ast.Nonlocal):
+            scope.nonlocals.update(node.names)
+
+        elif isinstance(node, ast.ExceptHandler):
+            if node.name is not None:
+                scope.store(node.name)
+            for child in ast.iter_child_nodes(node):
+                work_q.append((child, in_def, in_if, in_tryexcept, scope))
 
         elif isinstance(node, (ast.Try)):
             for name, children in ast.iter_fields(node):
                 if name == "finalbody":
                     for child in children:
-                        work_q.append((child, in_def, in_if, in_tryexcept))
+                        work_q.append((child, in_def, in_if, in_tryexcept, scope))
                 else:
                     for child in children:
-                        work_q.append((child, in_def, in_if, True))
+                        work_q.append((child, in_def, in_if, True, scope))
 
         else:
+            if node_type in _MATCH_NAME_BINDERS:
+                if node.name is not None:  # type: ignore[attr-defined]
+                    scope.store(node.name)  # type: ignore[attr-defined]
+            elif node_type in _MATCH_REST_BINDERS:
+                if node.rest is not None:  # type: ignore[attr-defined]
+                    scope.store(node.rest)  # type: ignore[attr-defined]
+
             for child in ast.iter_child_nodes(node):
-                work_q.append((child, in_def, in_if, in_tryexcept))
+                work_q.append((child, in_def, in_if, in_tryexcept, scope))
+
+    globals_written = module_scope.stored | from_names
+    globals_read: Set[str] = set()
+    for scope in scopes:
+        if scope is not module_scope:
+            # Assignments to names declared global in a function or class
+            globals_written.update(scope.stored & scope.globals)
+
+        for name in scope.loads:
+            if scope.is_global_read(name):
+                globals_read.add(name)
+
+    # Compiled away, not an actual name lookup
+    globals_read.discard("__debug__")
+
+    return imports, globals_written, globals_read
+
+
+def extract_ast_info(node: ast.AST) -> Iterator[ImportInfo]:
+    """
+    Scan the AST for a module to look for import statements.
+
+    The AST scanner gives the most detailed information about import statements,
+    and includes information about renames (``import ... as ...``), and the
+    location of imports (global, in a function, in a try/except statement, in a
+    conditional statement).
+
+    The scanner explicitly manages a work queue and will not recurse to avoid
+    exhausting the stack.
+
+    Args:
+      node: The AST for a module
+
+    Returns:
+      An iterator that yields information about all located import statements
+    """
+    yield from extract_ast_module_info(node)[0]
@@ -4,7 +4,7 @@ defines a function for extracting information about import statements
 and the use of global names.
 """
 import collections
-import dis
+import opcode
 import sys
 import types
 from typing import Deque, Dict, Iterator, List, Optional, Set, Tuple
@@ -43,6 +43,76 @@ def _all_code_objects(
                 parents[value] = parents.get(current, []) + [value]
 
 
+def _cache_entries() -> List[int]:
+    """
+    Return the number of inline cache entries that follow each opcode
+    (Python 3.11 or later), indexed by opcode.
+    """
+    entries = getattr(opcode, "_inline_cache_entries", None)
+    if entries is None:
+        return [0] * 256
+
+    elif isinstance(entries, dict):
+        # Python 3.13 or later: keyed by the name of the opcode
+        return [entries.get(name, 0) for name in opcode.opname]
+
+    return list(entries) + [0] * (256 - len(entries))
+
+
+_CACHE_ENTRIES = _cache_entries()
+
+_EXTENDED_ARG = opcode.opmap["EXTENDED_ARG"]
+_IMPORT_NAME = opcode.opmap["IMPORT_NAME"]
+_LOAD_CONST = opcode.opmap["LOAD_CONST"]
+_STORE_NAME = opcode.opmap["STORE_NAME"]
+_LOAD_NAME = opcode.opmap["LOAD_NAME"]
+_LOAD_GLOBAL = opcode.opmap["LOAD_GLOBAL"]
+_MAKE_FUNCTION = opcode.opmap["MAKE_FUNCTION"]
+_LOAD_BUILD_CLASS = opcode.opmap["LOAD_BUILD_CLASS"]
+
+_INTERESTING_OPS = frozenset(
+    (_IMPORT_NAME, _STORE_NAME, _LOAD_NAME, _LOAD_GLOBAL, _MAKE_FUNCTION)
+)
+
+if sys.version_info[:2] >= (3, 11):
+    _GLOBAL_ARG_SHIFT = 1
+    _MAKE_FUNCTION_CONST = 1
+    _BUILD_CLASS_DISTANCE = 2
+else:
+    _GLOBAL_ARG_SHIFT = 0
+    _MAKE_FUNCTION_CONST = 2
+    _BUILD_CLASS_DISTANCE = 3
+
+
+def _instructions(code: types.CodeType) -> Tuple[List[int], List[int]]:
+    """
+    Decode the bytecode for *code* into the list of opcodes and
+    the list of arguments.
+
+    This is a lean version of :func:`dis.get_instructions`: inline cache
+    entries are skipped, EXTENDED_ARG instructions are included and
+    extend the argument of the next instruction. The argument for
+    instructions without an argument is meaningless.
+    """
+    co_code = code.co_code
+    cache_entries = _CACHE_ENTRIES
+    ops: List[int] = []
+    args: List[int] = []
+    extended_arg = 0
+    idx = 0
+    end = len(co_code)
+
+    while idx < end:
+        op = co_code[idx]
+        arg = co_code[idx + 1] | extended_arg
+        extended_arg = (arg << 8) if op == _EXTENDED_ARG else 0
+        ops.append(op)
+        args.append(arg)
+        idx += 2 + 2 * cache_entries[op]
+
+    return ops, args
+
+
 def _extract_single(code: types.CodeType, is_function_code: bool, is_class_code: bool):
     """
     Extract import information from a single bytecode object (without recursing
@@ -56,7 +126,9 @@ def _extract_single(code: types.CodeType, is_function_code: bool, is_class_code:
 
       is_class_code: True if this is the code object for a class
     """
-    instructions = list(dis.get_instructions(code))
+    ops, args = _instructions(code)
+    co_names = code.co_names
+    co_consts = code.co_consts
 
     imports: List[ImportInfo] = []
     globals_written: Set[str] = set()
@@ -65,39 +137,33 @@ def _extract_single(code: types.CodeType, is_function_code: bool, is_class_code:
     class_codes: Set[types.CodeType] = set()
     fromvalues: Optional[List[Tuple[str, Optional[str]]]]
 
-    for offset, inst in enumerate(instructions):
-        if inst.opname == "IMPORT_NAME":
+    for offset, op in enumerate(ops):
+        if op not in _INTERESTING_OPS:
+            continue
+
+        if op == _IMPORT_NAME:
             from_inst_offset = 1
-            if instructions[offset - from_inst_offset].opname == "EXTENDED_ARG":
+            if ops[offset - from_inst_offset] == _EXTENDED_ARG:
                 from_inst_offset += 1
 
             level_inst_offset = from_inst_offset + 1
-            if instructions[offset - level_inst_offset].opname == "EXTENDED_ARG":
+            if ops[offset - level_inst_offset] == _EXTENDED_ARG:
                 level_inst_offset += 1
 
-            assert (
-                instructions[offset - from_inst_offset].opname == "LOAD_CONST"
-            ), instructions[offset - 1].opname
-            assert instructions[offset - level_inst_offset].opname == "LOAD_CONST", (
-                instructions[offset - 2].opname,
+            assert ops[offset - from_inst_offset] == _LOAD_CONST, opcode.opname[
+                ops[offset - 1]
+            ]
+            assert ops[offset - level_inst_offset] == _LOAD_CONST, (
+                opcode.opname[ops[offset - 2]],
                 code,
             )
 
-            from_offset = instructions[offset - from_inst_offset].arg
-            assert from_offset is not None
-
-            level_offset = instructions[offset - level_inst_offset].arg
-            assert level_offset is not None
-
-            fromlist = code.co_consts[from_offset]
-            level = code.co_consts[level_offset]
+            fromlist = co_consts[args[offset - from_inst_offset]]
+            level = co_consts[args[offset - level_inst_offset]]
 
             assert fromlist is None or isinstance(fromlist, tuple)
 
-            name_offset = inst.arg
-            assert name_offset is not None
-
-            import_module = code.co_names[name_offset]
+            import_module = co_names[args[offset]]
 
             if fromlist is not None:
                 fromvalues = [(nm, None) for nm in fromlist]
@@ -118,52 +184,30 @@ def _extract_single(code: types.CodeType, is_function_code: bool, is_class_code:
                 if fromlist is not None:
                     globals_written |= set(fromlist) - {"*"}
 
-        elif inst.opname in ("STORE_NAME", "STORE_NAME"):
-            if is_class_code and inst.opname == "STORE_NAME":
+        elif op == _STORE_NAME:
+            if is_class_code:
                 continue
 
-            const_offset = inst.arg
-            assert const_offset is not None
-            globals_written.add(code.co_names[const_offset])
+            globals_written.add(co_names[args[offset]])
 
-        elif inst.opname == "LOAD_NAME":
+        elif op == _LOAD_NAME:
             if is_class_code:
                 continue
 
-            const_offset = inst.arg
-            assert const_offset is not None
-            globals_read.add(code.co_names[const_offset])
+            globals_read.add(co_names[args[offset]])
 
-        elif inst.opname == "LOAD_GLOBAL":
-            const_offset = inst.arg
-            assert const_offset is not None
-            if sys.version_info[:2] >= (3, 11):
-                const_offset >>= 1
-            globals_read.add(code.co_names[const_offset])
+        elif op == _LOAD_GLOBAL:
+            globals_read.add(co_names[args[offset] >> _GLOBAL_ARG_SHIFT])
 
-        elif inst.opname == "MAKE_FUNCTION":
-            if sys.version_info[:2] >= (3, 11):
-                const_offset = instructions[offset - 1].arg
-            else:
-                const_offset = instructions[offset - 2].arg
-            assert const_offset is not None
-
-            if sys.version_info[:2] >= (3, 11):
-                if (
-                    offset >= 2
-                    and instructions[offset - 2].opname == "LOAD_BUILD_CLASS"
-                ):
-                    class_codes.add(code.co_consts[const_offset])
-                else:
-                    func_codes.add(code.co_consts[const_offset])
+        else:  # MAKE_FUNCTION
+            const_code = co_consts[args[offset - _MAKE_FUNCTION_CONST]]
+            if (
+                offset >= _BUILD_CLASS_DISTANCE
+                and ops[offset - _BUILD_CLASS_DISTANCE] == _LOAD_BUILD_CLASS
+            ):
+                class_codes.add(const_code)
             else:
-                if (
-                    offset >= 3
-                    and instructions[offset - 3].opname == "LOAD_BUILD_CLASS"
-                ):
-                    class_codes.add(code.co_consts[const_offset])
-                else:
-                    func_codes.add(code.co_consts[const_offset])
+                func_codes.add(const_code)
 
     return imports, globals_written, globals_read, func_codes, class_codes
 
@@ -4,11 +4,12 @@ to process information about package distributions (the
 stuff on PyPI).
 """
 import dataclasses
+import marshal
 import os
 import sys
 from email.parser import BytesParser
 from importlib.machinery import EXTENSION_SUFFIXES
-from typing import Dict, Iterable, Iterator, List, Optional, Set, Union
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
 
 
 @dataclasses.dataclass(frozen=True)
@@ -117,7 +118,168 @@ def create_distribution(distribution_file: str) -> PyPIDistribution:
     )
 
 
-_cached_distributions: Dict[str, PyPIDistribution] = {}
+# Bump when the layout of an entry in the DistributionCache changes.
+DISTRIBUTION_CACHE_FORMAT = 1
+
+DistributionStamp = Tuple[int, Optional[Tuple[int, int]], Optional[Tuple[int, int]]]
+
+
+class DistributionCache:
+    """
+    On-disk cache of parsed distributions
+
+    Parsing METADATA and RECORD for every installed distribution is
+    repeated by every process that builds a graph. The cache stores the
+    parsed information for each dist-info directory, keyed by the mtime
+    of the directory and the mtime and size of METADATA and RECORD.
+
+    Args:
+      cache_dir: Directory for the cache file, created when needed.
+
+    Attributes:
+      hits (int): Number of distributions loaded from the cache
+
+      misses (int): Number of distributions that had to be parsed
+    """
+
+    def __init__(self, cache_dir: os.PathLike):
+        self._path = os.path.join(
+            os.fspath(cache_dir),
+            f"modulegraph2-{sys.implementation.cache_tag}-distributions.cache",
+        )
+        self._entries: Optional[Dict[str, tuple]] = None
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self) -> Dict[str, tuple]:
+        try:
+            with open(self._path, "rb") as fp:
+                data = marshal.load(fp)
+        except (OSError, EOFError, ValueError, TypeError):
+            return {}
+
+        if (
+            not isinstance(data, dict)
+            or data.get("format") != DISTRIBUTION_CACHE_FORMAT
+        ):
+            return {}
+        return data["entries"]
+
+    @staticmethod
+    def _stamp(distribution_file: str, mtime: int) -> DistributionStamp:
+        def file_stamp(name: str) -> Optional[Tuple[int, int]]:
+            try:
+                st = os.stat(os.path.join(distribution_file, name))
+            except OSError:
+                return None
+            return (st.st_mtime_ns, st.st_size)
+
+        return (mtime, file_stamp("METADATA"), file_stamp("RECORD"))
+
+    def get(self, distribution_file: str, mtime: int) -> PyPIDistribution:
+        """
+        Return the distribution for *distribution_file*, parsing
+        it when there is no valid entry in the cache.
+
+        Args:
+          distribution_file: Filename for a dist-info directory
+
+          mtime: The mtime of *distribution_file* in nanoseconds
+        """
+        if self._entries is None:
+            self._entries = self._load()
+
+        stamp = self._stamp(distribution_file, mtime)
+        value = self._entries.get(distribution_file)
+        if value is not None and value[0] == stamp:
+            self.hits += 1
+            _, name, version, files, import_names = value
+            return PyPIDistribution(
+                distribution_file, name, version, set(files), set(import_names)
+            )
+
+        self.misses += 1
+        dist = create_distribution(distribution_file)
+        self._entries[distribution_file] = (
+            stamp,
+            dist.name,
+            dist.version,
+            tuple(dist.files),
+            tuple(dist.import_names),
+        )
+        self._dirty = True
+        return dist
+
+    def save(self) -> None:
+        """
+        Write the cache to disk when entries were added since the last save.
+        """
+        if not self._dirty or self._entries is None:
+            return
+
+        os.makedirs(os.path.dirname(self._path), exist_ok=True)
+        tmp_path = f"{self._path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as fp:
+            marshal.dump(
+                {"format": DISTRIBUTION_CACHE_FORMAT, "entries": self._entries}, fp
+            )
+        os.replace(tmp_path, self._path)
+        self._dirty = False
+
+
+# Persistent cache used when a distribution is not in _cached_distributions,
+# see :func:`use_distribution_cache`.
+_distribution_cache: Optional[DistributionCache] = None
+
+
+def use_distribution_cache(cache: Optional[DistributionCache]) -> None:
+    """
+    Use *cache* to load distributions that were not yet loaded in this
+    process, or stop using a persistent cache when *cache* is None.
+    """
+    global _distribution_cache
+    _distribution_cache = cache
+
+
+# Distributions by dist-info directory, together with the mtime of that
+# directory when the distribution was created.
+_cached_distributions: Dict[str, Tuple[int, PyPIDistribution]] = {}
+
+# Inverted index per search path: the mtimes of the path entries when
+# the index was built, and a mapping from normalized filename to the
+# distribution containing that file.
+_file_index: Dict[
+    Tuple[str, ...], Tuple[Tuple[Optional[int], ...], Dict[str, PyPIDistribution]]
+] = {}
+
+
+# Search paths and dist-info directories that were checked for changes
+# since the snapshot was started, see :func:`use_snapshot`.
+_snapshot: Optional[Set[Union[str, Tuple[str, ...]]]] = None
+
+
+def use_snapshot(enabled: bool) -> None:
+    """
+    Check search path entries and dist-info directories for changes
+    at most once while *enabled*, instead of on every lookup.
+
+    This is used while building a graph, the installed distributions
+    are not expected to change during that time.
+    """
+    global _snapshot
+    _snapshot = set() if enabled else None
+
+
+def _mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _normalize_path(filename: Union[str, os.PathLike]) -> str:
+    return os.path.normcase(os.path.normpath(os.fspath(filename)))
 
 
 def all_distributions(
@@ -134,23 +296,63 @@ def all_distributions(
 
     for entry in path:
         try:
-            for fname in os.listdir(entry):
-                if not fname.endswith(".dist-info"):
-                    continue
+            with os.scandir(entry) as it:
+                dist_entries = [
+                    dirent for dirent in it if dirent.name.endswith(".dist-info")
+                ]
+
+        except os.error:
+            continue
+
+        for dirent in dist_entries:
+            dist_name = os.path.join(entry, dirent.name)
+            try:
+                mtime = dirent.stat().st_mtime_ns
+            except os.error:
+                continue
 
-                dist_name = os.path.join(entry, fname)
+            cached = _cached_distributions.get(dist_name)
+            if cached is not None and cached[0] == mtime:
+                dist = cached[1]
 
+            else:
                 try:
-                    dist = _cached_distributions[dist_name]
+                    if _distribution_cache is not None:
+                        dist = _distribution_cache.get(dist_name, mtime)
+                    else:
+                        dist = create_distribution(dist_name)
+                except os.error:
+                    continue
+                _cached_distributions[dist_name] = (mtime, dist)
 
-                except KeyError:
-                    dist = create_distribution(dist_name)
-                    _cached_distributions[dist_name] = dist
+            yield dist
 
-                yield dist
 
-        except os.error:
-            continue
+def _distribution_index(path: Tuple[str, ...]) -> Dict[str, PyPIDistribution]:
+    """
+    Return the filename to distribution index for *path*
+
+    The index is rebuilt when the mtime of one of the path entries changes,
+    which happens when a distribution is installed or removed.
+    """
+    cached = _file_index.get(path)
+    if cached is not None and _snapshot is not None and path in _snapshot:
+        return cached[1]
+
+    stamp = tuple(_mtime(entry) for entry in path)
+    if _snapshot is not None:
+        _snapshot.add(path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    index: Dict[str, PyPIDistribution] = {}
+    for dist in all_distributions(path):
+        for filename in dist.files:
+            # The first distribution on the path wins, as with a linear scan.
+            index.setdefault(_normalize_path(filename), dist)
+
+    _file_index[path] = (stamp, index)
+    return index
 
 
 def distribution_for_file(
@@ -166,11 +368,21 @@ def distribution_for_file(
     Returns:
       The distribution that contains *filename*, or None
     """
-    for dist in all_distributions(path):
-        if dist.contains_file(filename):
-            return dist
-
-    return None
+    key = tuple(sys.path if path is None else path)
+    normalized = _normalize_path(filename)
+
+    dist = _distribution_index(key).get(normalized)
+    if dist is not None and (_snapshot is None or dist.identifier not in _snapshot):
+        if _snapshot is not None:
+            _snapshot.add(dist.identifier)
+        cached = _cached_distributions.get(dist.identifier)
+        if cached is None or cached[0] != _mtime(dist.identifier):
+            # The dist-info directory was updated in place (for example
+            # by reinstalling the same version), rebuild the index.
+            del _file_index[key]
+            dist = _distribution_index(key).get(normalized)
+
+    return dist
 
 
 def distribution_named(
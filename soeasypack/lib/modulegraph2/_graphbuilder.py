@@ -10,11 +10,12 @@ import re
 import sys
 import zipfile
 import zipimport
-from typing import Iterable, List, Optional, Tuple, Type, cast
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Type, cast
 
-from ._ast_tools import extract_ast_info
+from ._analysis_cache import AnalysisCache, _import_from_tuple, _import_to_tuple
+from ._ast_tools import extract_ast_module_info
 from ._bytecode_tools import extract_bytecode_info
-from ._distributions import distribution_for_file
+from ._distributions import PyPIDistribution, distribution_for_file
 from ._importinfo import ImportInfo
 from ._nodes import (
     BaseNode,
@@ -29,6 +30,7 @@ from ._nodes import (
     Package,
     SourceModule,
 )
+from ._prefetch import AnalysisPrefetcher
 from ._virtualenv_support import adjust_path
 
 SIX_MOVES_GLOBALS = {"filter", "input", "map", "range", "xrange", "zip"}
@@ -96,6 +98,10 @@ SIX_MOVES_TO = {
     "reload_module": "importlib",
     "zip_longest": "itertools",
 }
+_CACHED_NODE_TYPES: Dict[str, Type[Module]] = {
+    cls.__name__: cls for cls in (SourceModule, BytecodeModule, InvalidModule)
+}
+
 # # 加
 sub_compile = re.compile("if __name__ ==.*?__main__.*", flags=re.S)
 
@@ -157,15 +163,148 @@ def _contains_datafiles(directory: pathlib.Path):
     return False
 
 
+def _namespace_hint(source_code: str) -> Optional[str]:
+    """
+    Return the kind of explicit namespace package *source_code* might set up
+    """
+    if "pkg_resources" in source_code:
+        return "pkg_resources"
+    elif "pkgutil" in source_code:
+        return "pkgutil"
+    return None
+
+
+def _parse(source_code: str, filename: str) -> Optional[ast.Module]:
+    try:
+        return cast(
+            ast.Module,
+            compile(
+                source_code,
+                filename,
+                "exec",
+                flags=ast.PyCF_ONLY_AST,
+                dont_inherit=True,
+            ),
+        )
+    except (SyntaxError, ValueError):
+        return None
+
+
+def _analyse_source(
+        source_code: str, stripped_code: str, filename: str
+) -> Optional[Tuple[List[ImportInfo], Set[str], Set[str], bool]]:
+    """
+    Analyse a module using its source code only
+
+    Imports are collected from *stripped_code*, the source without
+    the ``if __name__ == "__main__":`` block, while the global names
+    read and written are collected from the full *source_code*.
+
+    Returns None when *stripped_code* cannot be parsed, otherwise
+    ``(imports, globals_written, globals_read, valid)``, where *valid*
+    is false when the full source cannot be parsed.
+    """
+    stripped_node = _parse(stripped_code, filename)
+    if stripped_node is None:
+        return None
+
+    imports, names_written, names_read = extract_ast_module_info(stripped_node)
+    if stripped_code == source_code:
+        return imports, names_written, names_read, True
+
+    full_node = _parse(source_code, filename)
+    if full_node is None:
+        return imports, set(), set(), False
+
+    _, names_written, names_read = extract_ast_module_info(full_node)
+    return imports, names_written, names_read, True
+
+
+def analyse_source_file(filename: str) -> Optional[tuple]:
+    """
+    Analyse a source file in the same way as :func:`node_for_spec`,
+    for use in a worker process of :class:`AnalysisPrefetcher`.
+
+    Returns ``(imports, globals_written, globals_read, valid,
+    namespace_hint)`` with the imports as tuples that can be pickled
+    cheaply, or None when the file must be analysed by the caller.
+    """
+    try:
+        with open(filename, "rb") as fp:
+            source_code = importlib.util.decode_source(fp.read())
+    except (OSError, SyntaxError, UnicodeError, LookupError):
+        return None
+
+    # # 加
+    stripped_code = sub_compile.sub("", source_code)
+    ast_info = _analyse_source(source_code, stripped_code, filename)
+    if ast_info is None:
+        return None
+
+    imports, names_written, names_read, valid = ast_info
+    return (
+        tuple(_import_to_tuple(info) for info in imports),
+        tuple(names_written),
+        tuple(names_read),
+        valid,
+        _namespace_hint(stripped_code),
+    )
+
+
+def six_moves_package(
+        name: str,
+        loader: Optional[importlib.abc.Loader],
+        distribution: Optional[PyPIDistribution],
+) -> Package:
+    """
+    Create the node for the virtual ``moves`` package of six.
+    """
+    return Package(
+        name=name,
+        loader=loader,
+        distribution=None,
+        extension_attributes={},
+        filename=None,
+        search_path=[],
+        has_data_files=False,
+        namespace_type=None,
+        init_module=FrozenModule(
+            name="@@SIX_MOVES@@",
+            loader=loader,
+            distribution=distribution,
+            extension_attributes={},
+            filename=None,
+            globals_written=set(SIX_MOVES_GLOBALS),
+            globals_read=set(),
+            code=None,
+        ),
+    )
+
+
 def node_for_spec(
-        spec: importlib.machinery.ModuleSpec, path: List[str]
+        spec: importlib.machinery.ModuleSpec,
+        path: List[str],
+        cache: Optional[AnalysisCache] = None,
+        prefetcher: Optional[AnalysisPrefetcher] = None,
+        static: bool = False,
 ) -> Tuple[BaseNode, Iterable[ImportInfo]]:
     """
     Create the node for a ModuleSpec and locate related imports
+
+    When *cache* is given the analysis of source and bytecode files is
+    looked up there, and files that did not change since the previous
+    run are not parsed again. Nodes created from the cache have no
+    code object.
+
+    When *prefetcher* is given the analysis of plain source files is
+    taken from the prefetcher when it was already submitted there.
+
+    With *static* explicit namespace packages are not imported to
+    find their search path, the caller has to extend the search path.
     """
     node: BaseNode
     imports: Iterable[ImportInfo]
-    source_code: Optional[str] = None
+    namespace_hint: Optional[str] = None
 
     loader: Optional[importlib.abc.Loader] = cast(
         Optional[importlib.abc.Loader], spec.loader
@@ -235,52 +374,100 @@ def node_for_spec(
         # Likewise for _frozen_importlib_external._NamespaceLoader
 
         inspect_loader = cast(importlib.abc.InspectLoader, loader)
-        source_code = inspect_loader.get_source(spec.name)
 
-        ast_imports: Optional[Iterable[ImportInfo]]
+        cache_file = (
+            spec.origin
+            if cache is not None
+               and spec.origin is not None
+               and loader != importlib.machinery.FrozenImporter
+            else None
+        )
+        cached = cache.lookup(cache_file) if cache_file is not None else None
+
         node_type: Optional[Type[Module]] = None
 
-        if source_code is not None:
-            # # 加
-            source_code = sub_compile.sub("", source_code)
-            filename = spec.origin
-            assert filename is not None
+        if cached is not None:
+            node_type = _CACHED_NODE_TYPES[cached.node_type]
+            imports = cached.imports
+            names_written = cached.globals_written
+            names_read = cached.globals_read
+            namespace_hint = cached.namespace_hint
+            code = None
 
-            try:
-                ast_node = compile(
-                    source_code,
-                    filename,
-                    "exec",
-                    flags=ast.PyCF_ONLY_AST,
-                    dont_inherit=True,
+        else:
+            prefetched = (
+                prefetcher.take(spec.origin)
+                if prefetcher is not None
+                   and spec.origin is not None
+                   and type(loader) is importlib.machinery.SourceFileLoader
+                else None
+            )
+            ast_info = None
+
+            if prefetched is not None:
+                has_source = True
+                import_tuples, written, read, valid, namespace_hint = prefetched
+                ast_info = (
+                    [_import_from_tuple(item) for item in import_tuples],
+                    set(written),
+                    set(read),
+                    valid,
                 )
-            except SyntaxError:
-                node_type = InvalidModule
-                ast_imports = None
 
             else:
-                ast_imports = extract_ast_info(ast_node)
-        else:
-            ast_imports = None
+                source_code = inspect_loader.get_source(spec.name)
+                has_source = source_code is not None
+
+                if source_code is not None:
+                    filename = spec.origin
+                    assert filename is not None
+                    # # 加
+                    stripped_code = sub_compile.sub("", source_code)
+                    namespace_hint = _namespace_hint(stripped_code)
+                    ast_info = _analyse_source(source_code, stripped_code, filename)
+
+            if ast_info is not None:
+                # Imports and globals both come from the AST, the module
+                # is not compiled to bytecode at all.
+                code = None
+                imports, names_written, names_read, valid = ast_info
+                if not valid:
+                    node_type = InvalidModule
 
-        try:
-            code = inspect_loader.get_code(spec.name)
-            assert code is not None
-            bytecode_imports, names_written, names_read = extract_bytecode_info(code)
-        except SyntaxError:
-            node_type = InvalidModule
-            bytecode_imports = []
-            names_written = set()
-            names_read = set()
-            code = None
-
-        if node_type is None:
-            if loader == importlib.machinery.FrozenImporter:
-                node_type = FrozenModule
-            elif source_code is not None:
-                node_type = SourceModule
             else:
-                node_type = BytecodeModule
+                # No source code, or source code that cannot be parsed:
+                # use the bytecode like the import system would.
+                try:
+                    code = inspect_loader.get_code(spec.name)
+                    assert code is not None
+                    imports, names_written, names_read = extract_bytecode_info(code)
+                except SyntaxError:
+                    node_type = InvalidModule
+                    imports = []
+                    names_written = set()
+                    names_read = set()
+                    code = None
+
+                if has_source:
+                    node_type = InvalidModule
+
+            if node_type is None:
+                if loader == importlib.machinery.FrozenImporter:
+                    node_type = FrozenModule
+                elif has_source:
+                    node_type = SourceModule
+                else:
+                    node_type = BytecodeModule
+
+            if cache_file is not None:
+                cache.store(
+                    cache_file,
+                    node_type.__name__,
+                    imports,
+                    names_written,
+                    names_read,
+                    namespace_hint,
+                )
 
         node = node_type(
             name=spec.name,
@@ -303,11 +490,6 @@ def node_for_spec(
             code=code,
         )
 
-        if ast_imports is not None:
-            imports = ast_imports
-        else:
-            imports = bytecode_imports
-
     elif type(loader).__name__ == "_SixMetaPathImporter":
         # This is the loader from the six project, which does not quite
         # conform to the importlib ABCs.
@@ -316,27 +498,12 @@ def node_for_spec(
 
         if spec.name.endswith(".moves"):
             # six.moves itself
-            node = Package(
-                name=spec.name,
-                loader=loader,
-                distribution=None,
-                extension_attributes={},
-                filename=None,
-                search_path=[],
-                has_data_files=False,
-                namespace_type=None,
-                init_module=FrozenModule(
-                    name="@@SIX_MOVES@@",
-                    loader=loader,
-                    distribution=distribution_for_file(spec.origin, path)
-                    if spec.origin is not None
-                    else None,
-                    extension_attributes={},
-                    filename=None,
-                    globals_written=set(SIX_MOVES_GLOBALS),
-                    globals_read=set(),
-                    code=None,
-                ),
+            node = six_moves_package(
+                spec.name,
+                loader,
+                distribution_for_file(spec.origin, path)
+                if spec.origin is not None
+                else None,
             )
             return node, ()
 
@@ -371,7 +538,7 @@ def node_for_spec(
                     spec.name != moved_spec.name
             ), f"Spec and moved_spec are the same ({spec.name})"
 
-            return node_for_spec(moved_spec, path)
+            return node_for_spec(moved_spec, path, cache)
 
     elif type(loader).__name__ == "VendorImporter" and type(loader).__module__ in (
             "setuptools.extern",
@@ -415,7 +582,7 @@ def node_for_spec(
         assert (
                 spec.name != moved_spec.name
         ), f"Spec and moved_spec are the same ({spec.name})"
-        return node_for_spec(moved_spec, path)
+        return node_for_spec(moved_spec, path, cache)
 
     elif type(loader).__name__ == "DistutilsLoader" and type(loader).__module__ in (
             "_distutils_hack",
@@ -431,7 +598,7 @@ def node_for_spec(
         assert (
                 spec.name != moved_spec.name
         ), f"Spec and moved_spec are the same ({spec.name})"
-        return node_for_spec(moved_spec, path)
+        return node_for_spec(moved_spec, path, cache)
 
     else:
         raise RuntimeError(
@@ -447,26 +614,19 @@ def node_for_spec(
         node_file = node_file.parent
 
         namespace_type = None
-        if (
-                source_code is not None
-                and "__import__" in node.globals_read
-                and any(nm in source_code for nm in ("pkg_resources", "pkgutil"))
-        ):
+        if namespace_hint is not None and "__import__" in node.globals_read:
             # This might be an explicit namespace package using
             # setuptools or pkgutil. Import the package to fetch
             # the correct submodule search path.
-            try:
-                m = importlib.import_module(node.name)
-            except ImportError:
-                pass
-            else:
-                spec.submodule_search_locations = getattr(m, "__path__", [])
-
-            if "pkg_resources" in source_code:
-                namespace_type = "pkg_resources"
-            else:
-                assert "pkgutil" in source_code
-                namespace_type = "pkgutil"
+            if not static:
+                try:
+                    m = importlib.import_module(node.name)
+                except ImportError:
+                    pass
+                else:
+                    spec.submodule_search_locations = getattr(m, "__path__", [])
+
+            namespace_type = namespace_hint
 
         assert spec.submodule_search_locations is not None
 
@@ -4,6 +4,7 @@ This module contains the definition of the ModuleGraph class.
 import ast
 import contextlib
 import importlib
+import importlib.machinery
 import operator
 import os
 import pathlib
@@ -25,17 +26,31 @@ from typing import (
 
 from objectgraph import ObjectGraph
 
+from ._analysis_cache import AnalysisCache
 from ._ast_tools import extract_ast_info
 from ._callback_list import CallbackList, FirstNotNone
 from ._depinfo import DependencyInfo, from_importinfo
-from ._distributions import PyPIDistribution, distribution_named
-from ._graphbuilder import SIX_MOVES_TO, node_for_spec, relative_package
+from ._distributions import (
+    DistributionCache,
+    PyPIDistribution,
+    distribution_named,
+    use_distribution_cache,
+    use_snapshot,
+)
+from ._graphbuilder import (
+    SIX_MOVES_TO,
+    analyse_source_file,
+    node_for_spec,
+    relative_package,
+    six_moves_package,
+)
 from ._implies import STDLIB_IMPLIES, Alias, ImpliesValueType, Virtual
 from ._importinfo import ImportInfo
 from ._mypyc_support import mypyc_post_processing_hook
 from ._nodes import (
     AliasNode,
     BaseNode,
+    BytecodeModule,
     ExcludedModule,
     InvalidRelativeImport,
     MissingModule,
@@ -43,8 +58,11 @@ from ._nodes import (
     NamespacePackage,
     Package,
     Script,
+    SourceModule,
     VirtualNode,
 )
+from ._prefetch import AnalysisPrefetcher
+from ._resolver import SpecResolver
 from ._swig_support import swig_missing_hook
 from ._utilities import FakePackage, split_package
 
@@ -68,6 +86,28 @@ class ModuleGraph(ObjectGraph[Union[BaseNode, PyPIDistribution], DependencyInfo]
       * use_stdlib_implies: Use the built-in implied actions for the stdlib.
 
       * use_builtin_hooks: Use the built-in extension hooks
+
+      * cache_dir: Directory for a persistent cache of module analysis
+        results, files that did not change since a previous run are
+        not parsed again. The parsed metadata of installed distributions
+        is cached in the same directory.
+
+      * workers: Number of worker processes used to read and parse
+        source files ahead of the graph builder. The default (None)
+        analyses all files in the current process. The graph does not
+        depend on this setting. The helpers are separate interpreters
+        that do not import the main script.
+
+      * keep_code: Keep the code objects of scripts and bytecode modules
+        in the graph. Code objects are not needed after the imports are
+        extracted and are most of the memory used by a graph.
+
+      * static: Locate modules in the filesystem and in zip files only,
+        without importing any package and without looking at
+        :data:`sys.modules`. Custom import hooks on :data:`sys.meta_path`
+        are not used, and changes to ``__path__`` at runtime are not
+        seen, except for ``pkgutil`` and ``pkg_resources`` namespace
+        packages. The virtual ``moves`` package of six is supported.
     """
 
     _post_processing: CallbackList[ProcessingCallback]
@@ -75,11 +115,39 @@ class ModuleGraph(ObjectGraph[Union[BaseNode, PyPIDistribution], DependencyInfo]
     _missing_hook: FirstNotNone[MissingCallback]
     _work_stack: List[Tuple[Callable, tuple]]
     _global_lazy_nodes: Dict[str, ImpliesValueType]
+    _analysis_cache: Optional[AnalysisCache]
+    _distribution_cache: Optional[DistributionCache]
+    _cache_dir: Optional[os.PathLike]
+    _prefetcher: Optional[AnalysisPrefetcher]
+    _prefetched_names: Set[str]
+    _resolver: SpecResolver
+    _run_depth: int
+    _keep_code: bool
+    _static: bool
 
     def __init__(
-        self, *, use_stdlib_implies: bool = True, use_builtin_hooks: bool = True
+        self,
+        *,
+        use_stdlib_implies: bool = True,
+        use_builtin_hooks: bool = True,
+        cache_dir: Optional[os.PathLike] = None,
+        workers: Optional[int] = None,
+        keep_code: bool = True,
+        static: bool = False,
     ):
         super().__init__()
+        self._keep_code = keep_code
+        self._static = static
+        self._cache_dir = cache_dir
+        self._setup_caches()
+        self._prefetcher = (
+            AnalysisPrefetcher(analyse_source_file, workers)
+            if workers is not None and workers > 1
+            else None
+        )
+        self._prefetched_names = set()
+        self._resolver = SpecResolver(self._static)
+        self._run_depth = 0
         self._post_processing = CallbackList()
         self._post_processing_seen = set()
         self._missing_hook = FirstNotNone()
@@ -98,6 +166,34 @@ class ModuleGraph(ObjectGraph[Union[BaseNode, PyPIDistribution], DependencyInfo]
             self.add_missing_hook(swig_missing_hook)
             self.add_post_processing_hook(mypyc_post_processing_hook)
 
+    def _setup_caches(self) -> None:
+        """
+        Create the persistent caches in *_cache_dir*, if any.
+        """
+        cache_dir = self._cache_dir
+        self._analysis_cache = (
+            AnalysisCache(cache_dir) if cache_dir is not None else None
+        )
+        self._distribution_cache = (
+            DistributionCache(cache_dir) if cache_dir is not None else None
+        )
+
+    def __getstate__(self) -> dict:
+        # A graph can be pickled and updated later on, see
+        # :meth:`update_nodes`. The caches are recreated when unpickling
+        # and an unpickled graph analyses files in the current process.
+        state = self.__dict__.copy()
+        state["_analysis_cache"] = None
+        state["_distribution_cache"] = None
+        state["_prefetcher"] = None
+        state["_prefetched_names"] = set()
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._setup_caches()
+        self._resolver = SpecResolver(self._static)
+
     #
     # Querying
     #
@@ -248,6 +344,119 @@ class ModuleGraph(ObjectGraph[Union[BaseNode, PyPIDistribution], DependencyInfo]
         self._run_stack()
         return distribution
 
+    def update_nodes(self, identifiers: Iterable[str]) -> None:
+        """
+        Analyse scripts and modules again after their source code
+        changed, and update the graph.
+
+        Nodes importing an updated node are analysed again as well,
+        names imported from the updated node might refer to other
+        modules now. Nodes that are no longer used stay in the graph,
+        use :meth:`remove_unreachable` to remove them.
+
+        Args:
+          identifiers: Identifiers for :class:`Script`, :class:`Module`
+            and :class:`Package` nodes in the graph.
+
+        Raises:
+          KeyError: If one of the nodes is not part of the graph
+
+          OSError: If a script cannot be opened.
+
+          SyntaxError: If a script is invalid
+        """
+        todo = set(identifiers)
+        changed = set(todo)
+        done: Set[str] = set()
+
+        while todo:
+            old_nodes: Dict[str, BaseNode] = {}
+            old_targets: Dict[str, Set[str]] = {}
+            kept_edges: List[Tuple[str, str, Set[DependencyInfo]]] = []
+            roots = {node.identifier for node in self.roots()}
+
+            for identifier in todo:
+                node = self._find_module(identifier)
+                if node is None:
+                    raise KeyError(identifier)
+                old_nodes[identifier] = node
+                old_targets[identifier] = {
+                    target.identifier for _, target in self.outgoing(node)
+                }
+
+            for identifier, node in old_nodes.items():
+                # Edges from nodes that are analysed again are recreated
+                # by that analysis.
+                for edge_set, source in self.incoming(node):
+                    if source.identifier not in old_nodes:
+                        kept_edges.append((source.identifier, identifier, edge_set))
+
+            for identifier in old_nodes:
+                self.remove_node(identifier)
+                self._post_processing_seen.discard(identifier)
+
+            for identifier, node in old_nodes.items():
+                if isinstance(node, Script):
+                    new_node: BaseNode = self._load_script(node.filename)
+                else:
+                    new_node = self._find_or_load_module(None, identifier)
+
+                if identifier in roots:
+                    self.add_root(new_node)
+
+            self._run_stack()
+
+            for source_id, target_id, edge_set in kept_edges:
+                if (
+                    self.find_node(source_id) is None
+                    or self.find_node(target_id) is None
+                ):
+                    continue
+                for edge in edge_set:
+                    self.add_edge(source_id, target_id, edge)
+
+            done.update(old_nodes)
+            todo = set()
+            for identifier, old_node in old_nodes.items():
+                node = self._find_module(identifier)
+                if (
+                    identifier not in changed
+                    and getattr(node, "globals_written", None)
+                    == getattr(old_node, "globals_written", None)
+                    and {target.identifier for _, target in self.outgoing(node)}
+                    == old_targets[identifier]
+                ):
+                    continue
+
+                for _, source in self.incoming(node):
+                    if source.identifier not in done and isinstance(
+                        source, (Script, Module, Package)
+                    ):
+                        todo.add(source.identifier)
+
+    def remove_unreachable(self) -> None:
+        """
+        Remove all nodes that cannot be reached from one of the graph roots.
+        """
+        # Same result as :meth:`iter_graph`, but with a single pass
+        # over the edges instead of one pass per node.
+        targets: Dict[str, List[str]] = {}
+        for source, target, _ in self.edges():
+            targets.setdefault(source.identifier, []).append(target.identifier)
+
+        reachable = {node.identifier for node in self.roots()}
+        work = list(reachable)
+        while work:
+            for identifier in targets.get(work.pop(), ()):
+                if identifier not in reachable:
+                    reachable.add(identifier)
+                    work.append(identifier)
+
+        for node in list(self.nodes()):
+            if node.identifier not in reachable:
+                self.remove_node(node)
+                self._post_processing_seen.discard(node.identifier)
+
     #
     # Hooks
     #
@@ -315,9 +524,13 @@ class ModuleGraph(ObjectGraph[Union[BaseNode, PyPIDistribution], DependencyInfo]
         # importlib, because of this the function tries
         # to find submodules by looking in the filesystem.
         #
-        spec = importlib.util.find_spec(package_name)
-        if spec is not None:
-            for path_name in spec.submodule_search_locations or []:
+        if self._static:
+            search_path = self._static_search_path(package_name)
+        else:
+            spec = importlib.util.find_spec(package_name)
+            search_path = spec.submodule_search_locations if spec is not None else None
+        if search_path is not None:
+            for path_name in search_path:
                 path = pathlib.Path(path_name)
                 for fn in path.glob("*.py"):
                     module = fn.stem
@@ -448,9 +661,35 @@ class ModuleGraph(ObjectGraph[Union[BaseNode, PyPIDistribution], DependencyInfo]
         Process all items in the delayed work queue, until there
         is no more work.
         """
-        while self._work_stack:
-            func, args = self._work_stack.pop()
-            func(*args)
+        if self._run_depth:
+            # Called from a post processing hook while processing
+            # the stack, the outer call takes care of the caches.
+            while self._work_stack:
+                func, args = self._work_stack.pop()
+                func(*args)
+            return
+
+        self._run_depth += 1
+        use_distribution_cache(self._distribution_cache)
+        use_snapshot(True)
+        try:
+            while self._work_stack:
+                func, args = self._work_stack.pop()
+                func(*args)
+
+        finally:
+            self._run_depth -= 1
+            use_distribution_cache(None)
+            use_snapshot(False)
+            self._resolver.clear()
+            if self._prefetcher is not None:
+                self._prefetcher.close()
+                self._prefetched_names.clear()
+
+        if self._analysis_cache is not None:
+            self._analysis_cache.save()
+        if self._distribution_cache is not None:
+            self._distribution_cache.save()
 
     def _implied_references(
         self, importing_module: Optional[BaseNode], module_name: str
@@ -471,7 +710,9 @@ class ModuleGraph(ObjectGraph[Union[BaseNode, PyPIDistribution], DependencyInfo]
         node: BaseNode
 
         if module_name in self._global_lazy_nodes:
-            implied = self._global_lazy_nodes.pop(module_name)
+            # The entry is kept to handle the name in the same way when
+            # the node is loaded again after being removed from the graph.
+            implied = self._global_lazy_nodes[module_name]
 
             if implied is None:
                 node = ExcludedModule(module_name)
@@ -502,7 +743,7 @@ class ModuleGraph(ObjectGraph[Union[BaseNode, PyPIDistribution], DependencyInfo]
                 return node
 
             else:
-                node = self._find_or_load_module(importing_module, module_name)
+                node = self._load_module(importing_module, module_name)
                 for ref in implied:
                     other = self._find_or_load_module(node, ref)
                     self.add_edge(node, other, DEFAULT_DEPENDENCY)
@@ -540,9 +781,14 @@ class ModuleGraph(ObjectGraph[Union[BaseNode, PyPIDistribution], DependencyInfo]
         assert not module_name.startswith(".")
         assert self.find_node(module_name) is None
 
+        if self._static:
+            six_node = self._load_six_moves(importing_module, module_name)
+            if six_node is not None:
+                return six_node
+
         try:
             try:
-                spec = importlib.util.find_spec(module_name)
+                spec = self._find_spec(module_name)
 
             except ValueError as exc:
                 assert "__spec__" in exc.args[0]
@@ -616,7 +862,14 @@ class ModuleGraph(ObjectGraph[Union[BaseNode, PyPIDistribution], DependencyInfo]
                 node = self._create_missing_module(importing_module, module_name)
                 return node
 
-        node, imports = node_for_spec(spec, sys.path)
+        node, imports = node_for_spec(
+            spec, sys.path, self._analysis_cache, self._prefetcher, self._static
+        )
+        if not self._keep_code:
+            if isinstance(node, Module):
+                node.code = None
+            elif isinstance(node, Package) and isinstance(node.init_module, Module):
+                node.init_module.code = None
 
         if node.name != module_name:
             # Module is aliased in sys.modules. One example of
@@ -653,6 +906,130 @@ class ModuleGraph(ObjectGraph[Union[BaseNode, PyPIDistribution], DependencyInfo]
 
         return node
 
+    def _find_spec(self, module_name: str) -> Optional[importlib.machinery.ModuleSpec]:
+        """
+        Find the spec for *module_name*, like :func:`importlib.util.find_spec`.
+
+        Modules that are not imported yet are resolved by the
+        :class:`SpecResolver`, using the search path of the parent
+        node instead of importing the parent package. The parent is
+        still imported when its ``__init__`` uses ``__path__``,
+        because that can change the search path at runtime.
+
+        In static mode the search path for submodules is always taken
+        from the parent node, see :meth:`_static_search_path`.
+
+        Args:
+          module_name: Absolute name of the module
+        """
+        parent_name = module_name.rpartition(".")[0]
+        if self._static:
+            if not parent_name:
+                return self._resolver.find_spec(module_name)
+
+            search_path = self._static_search_path(parent_name)
+            if search_path is None:
+                return None
+            return self._resolver.find_spec(module_name, search_path)
+
+        if module_name in sys.modules:
+            return importlib.util.find_spec(module_name)
+
+        if not parent_name:
+            return self._resolver.find_spec(module_name)
+
+        parent_module = sys.modules.get(parent_name)
+        if parent_module is not None:
+            parent_path = getattr(parent_module, "__path__", None)
+            if parent_path is not None:
+                return self._resolver.find_spec(module_name, list(parent_path))
+
+        else:
+            parent = self._find_module(parent_name)
+            if isinstance(parent, NamespacePackage) or (
+                isinstance(parent, Package)
+                and isinstance(parent.init_module, (SourceModule, BytecodeModule))
+                and "__path__" not in parent.init_module.globals_read
+                and "__path__" not in parent.init_module.globals_written
+            ):
+                return self._resolver.find_spec(
+                    module_name, [os.fspath(p) for p in parent.search_path]
+                )
+
+        return importlib.util.find_spec(module_name)
+
+    def _static_search_path(self, package_name: str) -> Optional[List[str]]:
+        """
+        Return the search path for submodules of *package_name* based on
+        the node for that package, or None when it is not a package.
+
+        The search path for ``pkgutil`` and ``pkg_resources`` namespace
+        packages is extended with the matching directories on
+        :data:`sys.path`, as their ``__init__`` would do.
+        """
+        node = self._find_module(package_name)
+        if isinstance(node, AliasNode):
+            node = self._find_module(node.actual_module)
+
+        if not isinstance(node, (Package, NamespacePackage)):
+            return None
+
+        search_path = [os.fspath(path) for path in node.search_path]
+        if isinstance(node, Package) and node.namespace_type is not None:
+            for directory in self._resolver.package_directories(node.identifier):
+                if directory not in search_path:
+                    search_path.append(directory)
+
+        return search_path
+
+    def _load_six_moves(
+        self, importing_module: Optional[BaseNode], module_name: str
+    ) -> Optional[BaseNode]:
+        """
+        Add the node for *module_name* when it is the ``moves`` package
+        of six or a name in that package. Used in static mode, where
+        the import hook installed by six is not available.
+
+        Returns:
+          The new node, or None when *module_name* is not part of six.moves
+        """
+        parts = module_name.split(".")
+        for idx in range(1, len(parts)):
+            if parts[idx] != "moves":
+                continue
+
+            six_node = self._find_module(".".join(parts[:idx]))
+            if (
+                isinstance(six_node, Module)
+                and "_SixMetaPathImporter" in six_node.globals_written
+            ):
+                break
+
+        else:
+            return None
+
+        node: BaseNode
+        if idx == len(parts) - 1:
+            node = six_moves_package(module_name, None, None)
+            self.add_node(node)
+            self._process_import_list(node, ())
+            return node
+
+        actual_name = SIX_MOVES_TO.get(".".join(parts[idx + 1 :]))
+        if actual_name is None:
+            node = MissingModule(module_name)
+            self.add_node(node)
+            self._process_import_list(node, ())
+            return node
+
+        node = AliasNode(module_name, actual_name)
+        self.add_node(node)
+        self._process_import_list(node, ())
+
+        other = self._find_or_load_module(None, actual_name)
+        self.add_edge(node, other, DEFAULT_DEPENDENCY)
+        return node
+
     def _load_script(self, script_path: os.PathLike) -> Script:
         """
         Add a :class:`Script` node to the graph.
@@ -685,11 +1062,15 @@ class ModuleGraph(ObjectGraph[Union[BaseNode, PyPIDistribution], DependencyInfo]
             dont_inherit=True,
         )
         imports = extract_ast_info(ast_node)
-        code = compile(
-            source_code,
-            os.fspath(script_path),
-            "exec",
-            dont_inherit=True,
+        code = (
+            compile(
+                source_code,
+                os.fspath(script_path),
+                "exec",
+                dont_inherit=True,
+            )
+            if self._keep_code
+            else None
         )
 
         node = Script(os.fspath(script_path), code)
@@ -717,10 +1098,97 @@ class ModuleGraph(ObjectGraph[Union[BaseNode, PyPIDistribution], DependencyInfo]
             self._post_processing_seen.add(node.identifier)
             self._work_stack.append((self._post_processing, (self, node)))
 
+        if self._prefetcher is not None:
+            # *imports* can be an iterator
+            imports = list(imports)
+            self._prefetch_imports(node, imports)
+
         # Schedule work to process import statements.
         for info in imports:
             self._work_stack.append((self._process_import, (node, info)))
 
+    def _prefetch_imports(self, node: BaseNode, imports: Iterable[ImportInfo]) -> None:
+        """
+        Submit the source files for the modules in *imports* to the
+        prefetcher.
+
+        Args:
+          node: The node for which the import list is processed
+
+          imports: The imports of *node*
+        """
+        for info in imports:
+            if info.import_level == 0:
+                base_name = str(info.import_module)
+
+            else:
+                importing_package = relative_package(node, info.import_level)
+                if importing_package is None:
+                    continue
+
+                if info.import_module:
+                    base_name = f"{importing_package}.{info.import_module}"
+                else:
+                    base_name = importing_package
+
+            self._prefetch_module(base_name)
+            for name in info.import_names:
+                self._prefetch_module(f"{base_name}.{name}")
+
+    def _prefetch_module(self, module_name: str) -> None:
+        """
+        Submit the source file for *module_name* to the prefetcher.
+
+        This is a best effort guess that mirrors the path based finder
+        without importing anything. A wrong guess costs some work in a
+        worker process, but does not affect the graph.
+        """
+        assert self._prefetcher is not None
+
+        if module_name in self._prefetched_names:
+            return
+        self._prefetched_names.add(module_name)
+
+        parts = module_name.split(".")
+        search_path: Optional[List[str]] = None
+        spec = None
+
+        for idx in range(len(parts)):
+            name = ".".join(parts[: idx + 1])
+            node = self._find_module(name)
+            if node is not None:
+                if idx == len(parts) - 1 or not isinstance(
+                    node, (Package, NamespacePackage)
+                ):
+                    return
+                search_path = [os.fspath(p) for p in node.search_path]
+                continue
+
+            if idx == 0 and (
+                name in sys.builtin_module_names
+                or importlib.machinery.FrozenImporter.find_spec(name) is not None
+            ):
+                return
+
+            spec = self._resolver.find_path_spec(name, search_path)
+            if spec is None:
+                return
+
+            search_path = spec.submodule_search_locations
+            if search_path is None and idx < len(parts) - 1:
+                return
+
+        if (
+            spec is not None
+            and spec.origin is not None
+            and type(spec.loader) is importlib.machinery.SourceFileLoader
+            and (
+                self._analysis_cache is None
+                or not self._analysis_cache.is_current(spec.origin)
+            )
+        ):
+            self._prefetcher.submit(spec.origin)
+
     def _find_module(self, module_name: Union[BaseNode, str]) -> Optional[BaseNode]:
         """
         Find a module in the graph. This is an alias for :meth:`find_node`
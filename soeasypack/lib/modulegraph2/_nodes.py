@@ -1,3 +1,12 @@
+"""
+The node classes for the module graph.
+
+All node classes define ``__slots__``: a graph for a large environment
+contains tens of thousands of nodes, and the per-instance ``__dict__``
+was a significant part of the memory used by a graph. The dataclass
+fields of a class are its slots, subclasses without additional fields
+have empty slots.
+"""
 import dataclasses
 import importlib.abc
 import os
@@ -33,6 +42,8 @@ class BaseNode:
         library, not used by modulegraph2 itself.
     """
 
+    __slots__ = ("name", "loader", "distribution", "filename", "extension_attributes")
+
     name: str
     loader: Optional[importlib.abc.Loader]
     distribution: Optional[PyPIDistribution]
@@ -66,9 +77,12 @@ class Script(BaseNode):
         Global variables read from
 
       code
-        Code object for the script
+        Code object for the script, None when the graph
+        does not keep code objects.
     """
 
+    __slots__ = ("globals_written", "globals_read", "code")
+
     globals_written: Set[str]
     globals_read: Set[str]
     code: Optional[CodeType]
@@ -102,9 +116,12 @@ class Module(BaseNode):
         Set of global names read by the module
 
       code
-        Code for the module
+        Code for the module, only available for bytecode modules
+        (and only when the graph keeps code objects).
     """
 
+    __slots__ = ("globals_written", "globals_read", "code")
+
     globals_written: Set[str]
     globals_read: Set[str]
     code: Optional[CodeType]
@@ -132,7 +149,7 @@ class SourceModule(Module):
     the source code is available.
     """
 
-    pass
+    __slots__ = ()
 
 
 class FrozenModule(Module):
@@ -142,7 +159,7 @@ class FrozenModule(Module):
     code available, but not on the filesystem.
     """
 
-    pass
+    __slots__ = ()
 
 
 class BytecodeModule(Module):
@@ -151,7 +168,7 @@ class BytecodeModule(Module):
     only byte code is available.
     """
 
-    pass
+    __slots__ = ()
 
 
 class ExtensionModule(Module):
@@ -159,7 +176,7 @@ class ExtensionModule(Module):
     Node representing a native extension module.
     """
 
-    pass
+    __slots__ = ()
 
 
 class BuiltinModule(Module):
@@ -167,7 +184,7 @@ class BuiltinModule(Module):
     Node representing a built-in extension module.
     """
 
-    pass
+    __slots__ = ()
 
 
 class InvalidModule(Module):
@@ -176,7 +193,7 @@ class InvalidModule(Module):
     loaded due to having invalid syntax.
     """
 
-    pass
+    __slots__ = ()
 
 
 @dataclasses.dataclass
@@ -191,6 +208,8 @@ class NamespacePackage(BaseNode):
         package.
     """
 
+    __slots__ = ("search_path", "has_data_files")
+
     search_path: List[pathlib.Path]
 
     has_data_files: bool
@@ -232,6 +251,8 @@ class Package(BaseNode):
         pkgutil and namespace packages using pkg_resources.
     """
 
+    __slots__ = ("init_module", "search_path", "has_data_files", "namespace_type")
+
     init_module: BaseNode
     search_path: List[pathlib.Path]
     has_data_files: bool
@@ -254,6 +275,8 @@ class ExcludedModule(BaseNode):
     excluded by the user.
     """
 
+    __slots__ = ()
+
     def __init__(self, module_name):
         return super().__init__(
             name=module_name,
@@ -270,6 +293,8 @@ class MissingModule(BaseNode):
     could not be located.
     """
 
+    __slots__ = ()
+
     def __init__(self, module_name):
         return super().__init__(
             name=module_name,
@@ -289,6 +314,8 @@ class InvalidRelativeImport(BaseNode):
     dots.
     """
 
+    __slots__ = ()
+
     def __init__(self, module_name):
         return super().__init__(
             name=module_name,
@@ -312,6 +339,8 @@ class VirtualNode(BaseNode):
         :data:`sys.modules`.
     """
 
+    __slots__ = ("providing_module",)
+
     providing_module: BaseNode
 
     def __init__(self, module_name, providing_module):
@@ -336,6 +365,8 @@ class AliasNode(BaseNode):
         The module that this name aliases to.
     """
 
+    __slots__ = ("actual_module",)
+
     actual_module: BaseNode
 
     def __init__(self, module_name, actual_module):
@@ -0,0 +1,244 @@
+"""
+Speculative analysis of source files in helper processes.
+
+Building the graph is inherently serial: the import system state and the
+order in which the work stack is processed determine the graph. Reading
+and parsing source files does not depend on that state though, and
+dominates the time needed to build a graph.
+
+The graph builder submits the files it expects to need soon to an
+:class:`AnalysisPrefetcher` and asks for the result when it actually
+loads a module. The result for a file is a pure function of the file
+contents, which means the graph does not depend on whether or not a
+result came from a helper, nor on the order in which the helpers finish
+their work.
+
+The helpers are started as ``python _prefetch.py`` instead of through
+:mod:`multiprocessing`. With the spawn start method (the only one on
+Windows) multiprocessing workers import the ``__main__`` module of the
+parent, which re-runs a build script that calls ``to_pack`` without a
+``if __name__ == "__main__":`` guard. The helpers only import this file
+and the module containing the analysis function.
+"""
+import collections
+import importlib
+import json
+import os
+import pickle
+import subprocess
+import sys
+import threading
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+
+class _Helper:
+    """
+    A helper process that analyses one file at a time
+    """
+
+    def __init__(self, config: str):
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        assert self.process.stdin is not None
+        self.process.stdin.write(config.encode("utf-8") + b"\n")
+        self.process.stdin.flush()
+        self.current: Optional[str] = None
+        self.thread: Optional[threading.Thread] = None
+
+    def send(self, filename: str) -> None:
+        assert self.process.stdin is not None
+        self.current = filename
+        self.process.stdin.write(json.dumps(filename).encode("utf-8") + b"\n")
+        self.process.stdin.flush()
+
+
+class AnalysisPrefetcher:
+    """
+    Run a file analysis function in helper processes
+
+    Args:
+      function: Function called with a filename in the helper
+                processes, must be a module level function that can be
+                imported by name in a fresh interpreter, and return None
+                when the caller should analyse the file itself.
+
+      workers: Number of helper processes, defaults to the number of CPUs.
+
+    Attributes:
+      used (int): Number of results taken from the helpers
+
+      wasted (int): Number of submitted files that were not needed,
+                    or were needed before a helper started on them.
+    """
+
+    def __init__(
+        self, function: Callable[[str], Any], workers: Optional[int] = None
+    ):
+        self._config = json.dumps(
+            {
+                "function": f"{function.__module__}:{function.__qualname__}",
+                "sys_path": sys.path,
+            }
+        )
+        self._workers = min(workers or os.cpu_count() or 1, 61)
+        self._helpers: List[_Helper] = []
+        self._queue: Deque[str] = collections.deque()
+        self._results: Dict[str, Any] = {}
+        self._seen: set = set()
+        self._broken = False
+        self._lock = threading.Condition()
+        self.used = 0
+        self.wasted = 0
+
+    def _start(self) -> None:
+        try:
+            for _ in range(self._workers):
+                helper = _Helper(self._config)
+                helper.thread = threading.Thread(
+                    target=self._read_results, args=(helper,), daemon=True
+                )
+                helper.thread.start()
+                self._helpers.append(helper)
+        except OSError:
+            self._broken = True
+
+    def _read_results(self, helper: _Helper) -> None:
+        """
+        Collect the results of *helper*, and hand it the next file.
+        """
+        assert helper.process.stdout is not None
+        while True:
+            try:
+                filename, result = pickle.load(helper.process.stdout)
+            except Exception:
+                with self._lock:
+                    # The helper died or was closed, files that were
+                    # submitted to it are analysed by the caller.
+                    self._broken = True
+                    helper.current = None
+                    self._lock.notify_all()
+                return
+
+            with self._lock:
+                self._results[filename] = result
+                helper.current = None
+                self._dispatch()
+                self._lock.notify_all()
+
+    def _dispatch(self) -> None:
+        """
+        Send queued files to idle helpers, the lock must be held.
+        """
+        for helper in self._helpers:
+            if not self._queue:
+                return
+            if helper.current is None and helper.process.poll() is None:
+                try:
+                    helper.send(self._queue.popleft())
+                except OSError:
+                    self._broken = True
+
+    def submit(self, filename: str) -> None:
+        """
+        Start analysing *filename* in the background, unless it was
+        submitted before.
+        """
+        with self._lock:
+            if self._broken or filename in self._seen:
+                return
+
+            self._seen.add(filename)
+            if not self._helpers:
+                self._start()
+                if self._broken:
+                    return
+
+            self._queue.append(filename)
+            self._dispatch()
+
+    def take(self, filename: str) -> Optional[Any]:
+        """
+        Return the result for *filename*, or None when the caller
+        should analyse the file itself.
+
+        A submitted file that no helper has started on yet is
+        removed from the queue instead of waited for.
+        """
+        with self._lock:
+            try:
+                self._queue.remove(filename)
+            except ValueError:
+                pass
+            else:
+                self.wasted += 1
+                return None
+
+            while filename not in self._results and any(
+                helper.current == filename for helper in self._helpers
+            ):
+                self._lock.wait()
+
+            result = self._results.pop(filename, None)
+
+        if result is not None:
+            self.used += 1
+        return result
+
+    def close(self) -> None:
+        """
+        Stop the helper processes, results that were not taken are dropped.
+        """
+        with self._lock:
+            self.wasted += len(self._queue) + len(self._results)
+            self._queue.clear()
+            self._results.clear()
+            self._seen.clear()
+            helpers = self._helpers
+            self._helpers = []
+
+        for helper in helpers:
+            try:
+                assert helper.process.stdin is not None
+                helper.process.stdin.close()
+            except OSError:
+                pass
+        for helper in helpers:
+            helper.process.wait()
+            if helper.thread is not None:
+                helper.thread.join()
+            assert helper.process.stdout is not None
+            helper.process.stdout.close()
+        self._broken = False
+
+
+def _main() -> None:
+    """
+    Helper process: the first line of stdin configures the analysis
+    function, every following line is a JSON encoded filename. The
+    results are written to stdout as pickled ``(filename, result)``
+    tuples.
+    """
+    config = json.loads(sys.stdin.buffer.readline())
+    sys.path[:] = config["sys_path"]
+    module_name, _, qualname = config["function"].partition(":")
+    function: Any = importlib.import_module(module_name)
+    for name in qualname.split("."):
+        function = getattr(function, name)
+
+    out = sys.stdout.buffer
+    for line in sys.stdin.buffer:
+        filename = json.loads(line)
+        try:
+            result = function(filename)
+        except Exception:
+            result = None
+        pickle.dump((filename, result), out, pickle.HIGHEST_PROTOCOL)
+        out.flush()
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,273 @@
+"""
+A replacement for :func:`importlib.util.find_spec` that resolves
+modules from cached directory listings.
+
+The path based finder in the standard library checks the modification
+time of every directory on the search path for every lookup, and
+checks candidate files with additional ``stat`` calls. The
+:class:`SpecResolver` reads every directory once and answers all
+lookups from that snapshot.
+"""
+import importlib.machinery
+import importlib.util
+import os
+import sys
+import zipimport
+from typing import Dict, FrozenSet, List, Optional, Sequence, Tuple, Type
+
+Listing = Tuple[FrozenSet[str], FrozenSet[str]]
+
+# Finders that do not import modules while looking for a module
+_STATIC_FINDERS = (
+    importlib.machinery.BuiltinImporter,
+    importlib.machinery.FrozenImporter,
+    importlib.machinery.PathFinder,
+)
+
+
+def _file_loaders() -> List[Tuple[str, Type[importlib.abc.Loader]]]:
+    """
+    Return (suffix, loader class) pairs in the order used by
+    :class:`importlib.machinery.FileFinder`.
+    """
+    loaders: List[Tuple[str, Type[importlib.abc.Loader]]] = []
+    machinery = importlib.machinery
+    for loader, suffixes in (
+        (machinery.ExtensionFileLoader, machinery.EXTENSION_SUFFIXES),
+        (machinery.SourceFileLoader, machinery.SOURCE_SUFFIXES),
+        (machinery.SourcelessFileLoader, machinery.BYTECODE_SUFFIXES),
+    ):
+        loaders.extend((suffix, loader) for suffix in suffixes)
+    return loaders
+
+
+def _standard_path_hooks() -> bool:
+    """
+    Check that directories on the search path are handled by
+    :class:`importlib.machinery.FileFinder` with case sensitive lookups.
+    """
+    if os.environ.get("PYTHONCASEOK") and not sys.flags.ignore_environment:
+        return False
+
+    return all(
+        hook is zipimport.zipimporter
+        or getattr(hook, "__name__", None) == "path_hook_for_FileFinder"
+        for hook in sys.path_hooks
+    )
+
+
+class SpecResolver:
+    """
+    Find module specs from a snapshot of directory listings
+
+    The resolver mirrors :func:`importlib.util.find_spec` for modules
+    that are not in :data:`sys.modules`: the finders on
+    :data:`sys.meta_path` are tried in order, and the lookup for
+    :class:`importlib.machinery.PathFinder` uses the cached listings.
+    Unlike :func:`importlib.util.find_spec` the caller passes the
+    search path for submodules, parent packages are not imported.
+
+    Search path entries that are not directories, such as zip files,
+    are passed on to :class:`importlib.machinery.PathFinder`.
+
+    With *static* only the builtin, frozen and path based finders on
+    :data:`sys.meta_path` are used, other finders can import modules.
+
+    Changes to the filesystem after a directory was read are not
+    seen until :meth:`clear` is called.
+
+    Attributes:
+      listings (int): Number of directories read
+    """
+
+    def __init__(self, static: bool = False) -> None:
+        self._static = static
+        self._listings: Dict[str, Optional[Listing]] = {}
+        self._loaders = _file_loaders()
+        self._standard = _standard_path_hooks()
+        self.listings = 0
+
+    def clear(self) -> None:
+        """
+        Forget all directory listings.
+        """
+        self._listings.clear()
+
+    def _listing(self, directory: str) -> Optional[Listing]:
+        """
+        Return the files and subdirectories in *directory*, or None
+        when *directory* is not a directory.
+        """
+        try:
+            return self._listings[directory]
+        except KeyError:
+            pass
+
+        files = []
+        dirs = []
+        listing: Optional[Listing]
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir():
+                            dirs.append(entry.name)
+                        elif entry.is_file():
+                            files.append(entry.name)
+                    except OSError:
+                        continue
+        except OSError:
+            listing = None
+        else:
+            listing = (frozenset(files), frozenset(dirs))
+            self.listings += 1
+
+        self._listings[directory] = listing
+        return listing
+
+    def _find_in_directory(
+        self, fullname: str, directory: str, listing: Listing
+    ) -> Tuple[Optional[importlib.machinery.ModuleSpec], Optional[str]]:
+        """
+        Look for *fullname* in *directory*, like
+        :meth:`importlib.machinery.FileFinder.find_spec`.
+
+        Returns:
+          A tuple *(spec, portion)*, *portion* is a namespace package
+          portion for *fullname* when there is no *spec*.
+        """
+        files, dirs = listing
+        tail = fullname.rpartition(".")[2]
+
+        portion = None
+        if tail in dirs:
+            base_path = os.path.join(directory, tail)
+            package_listing = self._listing(base_path)
+            if package_listing is not None:
+                for suffix, loader in self._loaders:
+                    init_name = "__init__" + suffix
+                    if init_name in package_listing[0]:
+                        full_path = os.path.join(base_path, init_name)
+                        return (
+                            importlib.util.spec_from_file_location(
+                                fullname,
+                                full_path,
+                                loader=loader(fullname, full_path),  # type: ignore
+                                submodule_search_locations=[base_path],
+                            ),
+                            None,
+                        )
+                portion = base_path
+
+        for suffix, loader in self._loaders:
+            if tail + suffix in files:
+                full_path = os.path.join(directory, tail + suffix)
+                return (
+                    importlib.util.spec_from_file_location(
+                        fullname,
+                        full_path,
+                        loader=loader(fullname, full_path),  # type: ignore
+                    ),
+                    None,
+                )
+
+        return None, portion
+
+    def package_directories(self, name: str) -> List[str]:
+        """
+        Return the directories for package *name* in all entries
+        of :data:`sys.path`, like :func:`pkgutil.extend_path` does
+        for ``pkgutil`` and ``pkg_resources`` namespace packages.
+        """
+        parts = name.split(".")
+        directories = []
+        for entry in sys.path:
+            if not isinstance(entry, str):
+                continue
+
+            directory = entry
+            for part in parts:
+                listing = self._listing(directory or os.curdir)
+                if listing is None or part not in listing[1]:
+                    break
+                directory = os.path.join(directory, part)
+            else:
+                directories.append(directory)
+
+        return directories
+
+    def find_path_spec(
+        self, fullname: str, path: Optional[Sequence[str]] = None
+    ) -> Optional[importlib.machinery.ModuleSpec]:
+        """
+        Find *fullname* on *path* (default :data:`sys.path`), like
+        :meth:`importlib.machinery.PathFinder.find_spec`.
+        """
+        if not self._standard:
+            return importlib.machinery.PathFinder.find_spec(fullname, path)
+
+        if path is None:
+            path = sys.path
+
+        namespace_path: List[str] = []
+        for entry in path:
+            if not isinstance(entry, str):
+                continue
+            if not entry or entry == ".":
+                entry = os.getcwd()
+
+            listing = None
+            finder = sys.path_importer_cache.get(entry)
+            if finder is None or isinstance(finder, importlib.machinery.FileFinder):
+                listing = self._listing(entry)
+
+            if listing is not None:
+                spec, portion = self._find_in_directory(fullname, entry, listing)
+                if spec is not None:
+                    return spec
+                if portion is not None:
+                    namespace_path.append(portion)
+                continue
+
+            spec = importlib.machinery.PathFinder.find_spec(fullname, [entry])
+            if spec is None:
+                continue
+            if spec.loader is not None:
+                return spec
+            namespace_path.extend(spec.submodule_search_locations or ())
+
+        if namespace_path:
+            spec = importlib.machinery.ModuleSpec(fullname, None, is_package=True)
+            spec.submodule_search_locations = namespace_path
+            return spec
+
+        return None
+
+    def find_spec(
+        self, fullname: str, path: Optional[Sequence[str]] = None
+    ) -> Optional[importlib.machinery.ModuleSpec]:
+        """
+        Find the spec for *fullname* using the finders on :data:`sys.meta_path`.
+
+        Args:
+          fullname: Absolute name of the module
+
+          path: The search path of the parent package for submodules,
+            None for toplevel modules.
+        """
+        for finder in sys.meta_path:
+            if self._static and finder not in _STATIC_FINDERS:
+                continue
+
+            if finder is importlib.machinery.PathFinder:
+                spec = self.find_path_spec(fullname, path)
+            else:
+                find_spec = getattr(finder, "find_spec", None)
+                if find_spec is None:
+                    continue
+                spec = find_spec(fullname, path, None)
+
+            if spec is not None:
+                return spec
+
+        return None
@@ -1,6 +1,7 @@
 """
 Support code that deals with SWIG.
 """
+import importlib.machinery
 import importlib.util
 import os
 import sys
@@ -27,6 +28,45 @@ from ._utilities import FakePackage
 #   package __init__.
 
 
+def _find_spec_importing(
+    missing_name: str, to_import: str
+) -> Optional[importlib.machinery.ModuleSpec]:
+    """
+    Find the spec for *missing_name* in package *to_import*, importing
+    the package.
+    """
+    try:
+        return importlib.util.find_spec("." + missing_name, to_import)
+    except ImportError:
+        # Loading the package may fail if there's and error. This
+        # code assumes that's due to the invalid import by swig and
+        # adjusts sys.modules for that before retrying.
+        #
+        # The fake entry in sys.modules is removed as soon as possible
+        # because the assumption is not generally true and leaving the
+        # fake module might cause problems in the generic code dealing
+        # with simular problems.
+        sp = importlib.util.find_spec(to_import)
+
+        # By this time it must be possible to locate the spec,
+        # as we were already passed as proper module node.
+        #
+        # The origin should be set as well, the ImportError shouldn't
+        # happen for implicit namespace packages (which don't have
+        # an __init__.py and no origin)
+        assert sp is not None
+        assert sp.origin is not None
+
+        sys.modules[to_import] = cast(
+            ModuleType, FakePackage([sp.origin.rpartition(os.sep)[0]])
+        )
+
+        spec = importlib.util.find_spec("." + missing_name, to_import)
+
+        del sys.modules[to_import]
+        return spec
+
+
 def swig_missing_hook(
     graph: "modulegraph2.ModuleGraph",
     importing_module: Optional[BaseNode],
@@ -65,35 +105,12 @@ def swig_missing_hook(
     else:
         to_import = importing_module.name.rpartition(".")[0]
 
-    try:
-        spec = importlib.util.find_spec("." + missing_name, to_import)
-    except ImportError:
-        # Loading the package may fail if there's and error. This
-        # code assumes that's due to the invalid import by swig and
-        # adjusts sys.modules for that before retrying.
-        #
-        # The fake entry in sys.modules is removed as soon as possible
-        # because the assumption is not generally true and leaving the
-        # fake module might cause problems in the generic code dealing
-        # with simular problems.
-        sp = importlib.util.find_spec(to_import)
-
-        # By this time it must be possible to locate the spec,
-        # as we were already passed as proper module node.
-        #
-        # The origin should be set as well, the ImportError shouldn't
-        # happen for implicit namespace packages (which don't have
-        # an __init__.py and no origin)
-        assert sp is not None
-        assert sp.origin is not None
-
-        sys.modules[to_import] = cast(
-            ModuleType, FakePackage([sp.origin.rpartition(os.sep)[0]])
-        )
+    if graph._static:
+        # Static mode: locate the extension without importing the package
+        spec = graph._find_spec(f"{to_import}.{missing_name}")
 
-        spec = importlib.util.find_spec("." + missing_name, to_import)
-
-        del sys.modules[to_import]
+    else:
+        spec = _find_spec_importing(missing_name, to_import)
 
     if spec is not None:
         node, imports = node_for_spec(spec, sys.path)
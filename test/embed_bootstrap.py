@@ -0,0 +1,31 @@
+"""
+从go_py_embed.go中取出嵌入exe启动时执行的python引导代码, 供测试和性能测试在非windows环境下使用
+Created on 2026-10-18
+"""
+
+import ast
+import os
+import re
+
+GO_EMBED_PATH = os.path.join(os.path.dirname(__file__), '..', 'soeasypack', 'dep_exe', 'go_env', 'go_py_embed.go')
+
+
+def bootstrap_source():
+    """返回引导代码(已还原fmt.Sprintf的%%转义, %d占位符替换为0, %s占位符都在字符串中, 保持原样)"""
+    with open(GO_EMBED_PATH, encoding='utf-8') as fp:
+        go_code = fp.read()
+    match = re.search(r'pyCode := fmt\.Sprintf\(`(.*?)`,', go_code, flags=re.S)
+    return re.sub(r'%([%d])', lambda m: '%' if m.group(1) == '%' else '0', match.group(1))
+
+
+def load_bootstrap():
+    """
+    只执行引导代码中的import、函数和类定义, 跳过读取共享内存等模块级语句
+    :return: 引导代码的命名空间
+    """
+    tree = ast.parse(bootstrap_source())
+    tree.body = [node for node in tree.body
+                 if isinstance(node, (ast.Import, ast.ImportFrom, ast.FunctionDef, ast.ClassDef))]
+    namespace = {'__name__': 'soeasypack_bootstrap'}
+    exec(compile(tree, GO_EMBED_PATH, 'exec'), namespace)
+    return namespace
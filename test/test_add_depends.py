@@ -0,0 +1,86 @@
+"""
+测试add_depends按包补充依赖文件和最后统一应用的排除规则
+使用构造的PySide6目录和最小PE文件, 不依赖windows
+Created on 2026-10-18
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from soeasypack.core import ast_find_depend
+from test_pe_imports import make_pe
+
+
+def make_pyside_tree(site_dir):
+    """
+    构造PySide6目录, 返回{相对路径: 绝对路径}
+    """
+    files = {
+        '__init__.py': b'',
+        'QtCore.cp311-win_amd64.pyd': make_pe(['Qt6Core.dll', 'python3.dll']),
+        'QtGui.cp311-win_amd64.pyd': make_pe(['Qt6Gui.dll']) + b'PySide6.QtCore\x00',
+        'QtWebEngineWidgets.cp311-win_amd64.pyd': make_pe(['Qt6WebEngineWidgets.dll']),
+        'Qt6Core.dll': make_pe(['KERNEL32.dll']),
+        'Qt6Gui.dll': make_pe(['Qt6Core.dll'], ['Qt6OpenGL.dll']),
+        'Qt6OpenGL.dll': make_pe(),
+        'Qt6WebEngineWidgets.dll': make_pe(['Qt6Gui.dll']),
+        'Qt6Unused.dll': make_pe(),
+        'qt.json': b'{}',
+        'loader.py': b'# Qt6Unused\nimport ctypes\nctypes.CDLL("Qt6OpenGL")\n',
+        'plugins/platforms/qwindows.dll': make_pe(),
+        'plugins/styles/qmodernwindowsstyle.dll': make_pe(),
+        '__pycache__/loader.cpython-311.pyc': b'',
+    }
+    paths = {}
+    for name, content in files.items():
+        path = os.path.join(site_dir, 'PySide6', *name.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as fp:
+            fp.write(content)
+        paths[name] = path
+    return paths
+
+
+class TestAddDepends(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.site_dir = os.path.join(self.temp_dir, 'Lib', 'site-packages')
+        self.paths = make_pyside_tree(self.site_dir)
+        self.package_path = os.path.join(self.site_dir, 'PySide6')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_site_package_path(self):
+        self.assertEqual(ast_find_depend.site_package_path(self.paths['plugins/platforms/qwindows.dll']),
+                         self.package_path)
+        self.assertEqual(ast_find_depend.site_package_path('C:\\py\\Lib\\site-packages\\six.py'),
+                         os.path.join('C:\\py\\Lib\\site-packages', 'six.py'))
+        self.assertIsNone(ast_find_depend.site_package_path('C:\\py\\Lib\\os.py'))
+
+    def test_package_depends(self):
+        depends = {self.paths['__init__.py'], self.paths['loader.py'], self.paths['QtGui.cp311-win_amd64.pyd']}
+        found = ast_find_depend.package_depends(self.package_path, depends)
+        expected = {'QtCore.cp311-win_amd64.pyd', 'Qt6Core.dll', 'Qt6Gui.dll', 'Qt6OpenGL.dll',
+                    'Qt6WebEngineWidgets.dll', 'qt.json'}
+        self.assertEqual(found, {self.paths[name] for name in expected})
+
+        # # 没有使用QtWebEngine时去除Web相关的文件
+        self.assertEqual(ast_find_depend.exclude_depends(found, depends),
+                         found - {self.paths['Qt6WebEngineWidgets.dll']})
+        depends.add(self.paths['QtWebEngineWidgets.cp311-win_amd64.pyd'])
+        self.assertEqual(ast_find_depend.exclude_depends(found, depends), found)
+
+    def test_exclude_only_pyside(self):
+        other = os.path.join(self.site_dir, 'WebHelper', 'data.json')
+        self.assertEqual(ast_find_depend.exclude_depends({other}, set()), {other})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+"""
+测试modulegraph2模块分析结果缓存
+Created on 2026-10-18
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from soeasypack.lib.modulegraph2 import ModuleGraph, saved_sys_path
+
+SOURCES = {
+    'sep_cache_pkg/__init__.py': 'from . import helper\nVERSION = 1\n',
+    'sep_cache_pkg/helper.py': 'import sep_cache_mod as m\ntry:\n    from sep_cache_pkg.extra import *\nexcept ImportError:\n    pass\n',
+    'sep_cache_pkg/extra.py': 'def f():\n    import sep_cache_lazy\n    return NAME\n',
+    'sep_cache_mod.py': 'VALUE = 1\n',
+    'sep_cache_lazy.py': '',
+    'main.py': 'import sep_cache_pkg\nfrom sep_cache_mod import VALUE\n',
+}
+
+
+def graph_summary(mg):
+    nodes = sorted((type(n).__name__, n.identifier, tuple(sorted(getattr(n, 'globals_written', ()))),
+                    tuple(sorted(getattr(n, 'globals_read', ())))) for n in mg.iter_graph())
+    edges = sorted((a.identifier, b.identifier, str(info))
+                   for a in mg.iter_graph() for info, b in mg.outgoing(a))
+    return nodes, edges
+
+
+class TestAnalysisCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.temp_dir, 'cache')
+        for name, code in SOURCES.items():
+            self.write(name, code)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+        # # 构建依赖图时会导入部分包
+        for name in list(sys.modules):
+            if name.startswith('sep_cache_'):
+                del sys.modules[name]
+
+    def write(self, name, code):
+        path = os.path.join(self.temp_dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as fp:
+            fp.write(code)
+
+    def build(self, cache_dir):
+        with saved_sys_path():
+            sys.path.insert(0, self.temp_dir)
+            mg = ModuleGraph(cache_dir=cache_dir)
+            mg.add_script(os.path.join(self.temp_dir, 'main.py'))
+        return mg
+
+    def test_same_graph(self):
+        expected = graph_summary(self.build(None))
+        first = self.build(self.cache_dir)
+        self.assertEqual(first._analysis_cache.hits, 0)
+        second = self.build(self.cache_dir)
+        self.assertEqual(second._analysis_cache.misses, 0)
+        self.assertGreater(second._analysis_cache.hits, 0)
+        self.assertEqual(graph_summary(first), expected)
+        self.assertEqual(graph_summary(second), expected)
+
+    def test_changed_file(self):
+        self.build(self.cache_dir)
+        self.write('sep_cache_mod.py', 'import sep_cache_lazy\nVALUE = 2\n')
+        path = os.path.join(self.temp_dir, 'sep_cache_mod.py')
+        stamp = time.time_ns() + 10 ** 9
+        os.utime(path, ns=(stamp, stamp))
+        mg = self.build(self.cache_dir)
+        self.assertEqual(mg._analysis_cache.misses, 1)
+        self.assertIsNotNone(mg.find_node('sep_cache_lazy'))
+        self.assertIn(mg.find_node('sep_cache_lazy'), [b for _, b in mg.outgoing(mg.find_node('sep_cache_mod'))])
+
+
+if __name__ == '__main__':
+    unittest.main()
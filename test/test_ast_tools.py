@@ -0,0 +1,98 @@
+"""
+测试modulegraph2单次AST遍历的导入与全局名称分析
+Created on 2026-10-18
+"""
+
+import os
+import ast
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from soeasypack.lib.modulegraph2._ast_tools import extract_ast_module_info
+from soeasypack.lib.modulegraph2._bytecode_tools import extract_bytecode_info
+
+SOURCE = '''
+"""doc"""
+import os.path
+import json as _json
+from collections import OrderedDict as OD, deque
+from . import sibling
+CONST: int = 1
+counter = 0
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+if os.name == 'nt':
+    from ctypes import windll
+
+def func(arg, *args, default=OD, **kw):
+    global counter
+    counter += 1
+    import lazy
+    local = [x for x in args if x > counter]
+    if (n := len(local)) > 1:
+        return __import__(arg)
+    return lambda y: y + default + n
+
+class Klass(Base):
+    attr = 1
+    def method(self):
+        return attr
+
+for item in range(3):
+    del item
+
+with open(__file__) as fp:
+    data = fp.read()
+'''
+
+
+class TestAstModuleInfo(unittest.TestCase):
+
+    def analyse(self, source):
+        ast_node = compile(source, 'mod.py', 'exec', flags=ast.PyCF_ONLY_AST, dont_inherit=True)
+        code = compile(source, 'mod.py', 'exec', dont_inherit=True)
+        return extract_ast_module_info(ast_node), extract_bytecode_info(code)
+
+    def test_same_as_bytecode(self):
+        (imports, written, read), (_, bc_written, bc_read) = self.analyse(SOURCE)
+        self.assertEqual(written, bc_written | {'counter'})
+        self.assertEqual(read, bc_read)
+        for name in ('__import__', '__file__', 'attr', 'Base', 'OD', 'range'):
+            self.assertIn(name, read)
+        self.assertNotIn('local', read)
+        self.assertNotIn('n', read)
+
+    def test_imports(self):
+        (imports, _, _), _ = self.analyse(SOURCE)
+        summary = [(str(info.import_module), info.import_level, sorted(map(str, info.import_names)),
+                    info.is_in_function, info.is_in_conditional, info.is_in_tryexcept) for info in imports]
+        self.assertEqual(summary, [
+            ('os.path', 0, [], False, False, False),
+            ('json', 0, [], False, False, False),
+            ('collections', 0, ['OrderedDict', 'deque'], False, False, False),
+            ('', 1, ['sibling'], False, False, False),
+            ('ujson', 0, [], False, False, True),
+            ('ctypes', 0, ['windll'], False, True, False),
+            ('lazy', 0, [], True, False, False),
+        ])
+
+    def test_stdlib_modules(self):
+        """标准库模块的导入读写信息与字节码分析一致"""
+        import json.decoder
+        import email.parser
+        for module in (json.decoder, email.parser, os):
+            with open(module.__file__, 'rb') as fp:
+                source = fp.read()
+            (_, written, read), (_, bc_written, bc_read) = self.analyse(source)
+            self.assertEqual(read, bc_read, module.__name__)
+            self.assertTrue(bc_written <= written, module.__name__)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+"""
+测试modulegraph2字节码扫描直接解码co_code的结果与dis一致
+Created on 2026-10-18
+"""
+
+import os
+import dis
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from soeasypack.lib.modulegraph2._bytecode_tools import _instructions, extract_bytecode_info
+
+# # 超过256个名称和常量时会出现EXTENDED_ARG
+MANY_NAMES = ''.join(f'name{i} = {i}.5\n' for i in range(400)) + 'from os import path as p, sep\nimport json\n' \
+             'def func():\n    import email.parser\n    return name399\n'
+CLASS_BODY = 'class Klass:\n    import xml\n    attr = name1\n'
+
+
+def all_codes(code):
+    yield code
+    for const in code.co_consts:
+        if hasattr(const, 'co_code'):
+            yield from all_codes(const)
+
+
+class TestBytecodeTools(unittest.TestCase):
+
+    def assert_same_as_dis(self, code):
+        for current in all_codes(code):
+            ops, args = _instructions(current)
+            expected = [(inst.opcode, inst.arg) for inst in dis.get_instructions(current)]
+            self.assertEqual(ops, [op for op, _ in expected])
+            self.assertEqual([arg for arg, (_, exp) in zip(args, expected) if exp is not None],
+                             [exp for _, exp in expected if exp is not None])
+
+    def test_instructions(self):
+        self.assert_same_as_dis(compile(MANY_NAMES, 'many.py', 'exec'))
+        for module in (os, dis, unittest.case):
+            with open(module.__file__, 'rb') as fp:
+                self.assert_same_as_dis(compile(fp.read(), module.__file__, 'exec'))
+
+    def test_extended_arg(self):
+        imports, written, read = extract_bytecode_info(compile(MANY_NAMES, 'many.py', 'exec'))
+        names = [(str(info.import_module), sorted(map(str, info.import_names)), info.is_in_function)
+                 for info in imports]
+        self.assertEqual(names, [('os', ['path', 'sep'], False), ('json', [], False),
+                                 ('email.parser', [], True)])
+        self.assertTrue({'name0', 'name399', 'p', 'sep', 'json', 'func', 'path'} <= written)
+        self.assertIn('name399', read)
+
+    def test_class_body(self):
+        imports, written, read = extract_bytecode_info(compile(CLASS_BODY, 'klass.py', 'exec'))
+        self.assertEqual([(str(info.import_module), info.is_in_function) for info in imports], [('xml', False)])
+        self.assertIn('Klass', written)
+        self.assertNotIn('attr', written)
+        self.assertNotIn('name1', read)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+"""
+测试modulegraph2按文件查找发行包
+Created on 2026-10-18
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from soeasypack.lib.modulegraph2 import _distributions
+
+
+def write_dist(site_dir, name, files):
+    dist_info = os.path.join(site_dir, f'{name}-1.0.dist-info')
+    os.makedirs(dist_info, exist_ok=True)
+    with open(os.path.join(dist_info, 'METADATA'), 'w') as fp:
+        fp.write(f'Metadata-Version: 2.1\nName: {name}\nVersion: 1.0\n\n')
+    with open(os.path.join(dist_info, 'RECORD'), 'w') as fp:
+        for fn in files:
+            fp.write(f'{fn},,\n')
+    return dist_info
+
+
+class TestDistributionForFile(unittest.TestCase):
+
+    def setUp(self):
+        self.site_dir = tempfile.mkdtemp()
+        self.path = [self.site_dir]
+        write_dist(self.site_dir, 'alpha', ['alpha/__init__.py', 'alpha/_speedups.pyd'])
+
+    def tearDown(self):
+        shutil.rmtree(self.site_dir, ignore_errors=True)
+
+    def lookup(self, *parts):
+        return _distributions.distribution_for_file(os.path.join(self.site_dir, *parts), self.path)
+
+    def test_lookup(self):
+        self.assertEqual(self.lookup('alpha', '__init__.py').name, 'alpha')
+        self.assertEqual(self.lookup('alpha', '..', 'alpha', '_speedups.pyd').name, 'alpha')
+        self.assertIsNone(self.lookup('beta', '__init__.py'))
+
+    def test_index_built_once(self):
+        self.lookup('alpha', '__init__.py')
+        calls = []
+        all_distributions = _distributions.all_distributions
+        _distributions.all_distributions = lambda path: calls.append(path) or all_distributions(path)
+        try:
+            for _ in range(10):
+                self.assertIsNotNone(self.lookup('alpha', '__init__.py'))
+                self.assertIsNone(self.lookup('other.py'))
+        finally:
+            _distributions.all_distributions = all_distributions
+        self.assertEqual(calls, [])
+
+    def test_invalidation(self):
+        self.assertIsNone(self.lookup('beta', '__init__.py'))
+        # # 新安装的发行包
+        os.utime(self.site_dir, ns=(0, 0))
+        write_dist(self.site_dir, 'beta', ['beta/__init__.py'])
+        self.assertEqual(self.lookup('beta', '__init__.py').name, 'beta')
+
+        # # 原地重装, 只有dist-info目录的mtime变化
+        dist_info = write_dist(self.site_dir, 'beta', ['beta/__init__.py', 'beta/extra.py'])
+        stamp = time.time_ns() + 10 ** 9
+        os.utime(dist_info, ns=(stamp, stamp))
+        self.assertIsNotNone(self.lookup('beta', '__init__.py'))
+        self.assertEqual(self.lookup('beta', 'extra.py').name, 'beta')
+
+
+class TestDistributionCache(unittest.TestCase):
+
+    def setUp(self):
+        self.site_dir = tempfile.mkdtemp()
+        self.cache_dir = tempfile.mkdtemp()
+        self.path = [self.site_dir]
+        write_dist(self.site_dir, 'alpha', ['alpha/__init__.py', 'alpha/_speedups.pyd'])
+
+    def tearDown(self):
+        _distributions.use_distribution_cache(None)
+        shutil.rmtree(self.site_dir, ignore_errors=True)
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    lookup = TestDistributionForFile.lookup
+
+    def new_process(self):
+        """模拟新进程: 清空内存缓存, 重新读取磁盘缓存"""
+        _distributions._cached_distributions.clear()
+        _distributions._file_index.clear()
+        cache = _distributions.DistributionCache(self.cache_dir)
+        _distributions.use_distribution_cache(cache)
+        return cache
+
+    def test_persistent(self):
+        cache = self.new_process()
+        self.assertEqual(self.lookup('alpha', '__init__.py').name, 'alpha')
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+        cache.save()
+
+        cache = self.new_process()
+        create_distribution = _distributions.create_distribution
+        _distributions.create_distribution = None
+        try:
+            dist = self.lookup('alpha', '_speedups.pyd')
+        finally:
+            _distributions.create_distribution = create_distribution
+        self.assertEqual((dist.name, dist.version), ('alpha', '1.0'))
+        self.assertIn('alpha', dist.import_names)
+        self.assertIn(os.path.join(self.site_dir, 'alpha', '_speedups.pyd'), dist.files)
+        self.assertEqual((cache.hits, cache.misses), (1, 0))
+
+    def test_record_changed(self):
+        cache = self.new_process()
+        self.lookup('alpha', '__init__.py')
+        cache.save()
+
+        # # 只修改RECORD, dist-info目录的mtime不变
+        dist_info = os.path.join(self.site_dir, 'alpha-1.0.dist-info')
+        stamp = os.stat(dist_info).st_mtime_ns
+        with open(os.path.join(dist_info, 'RECORD'), 'a') as fp:
+            fp.write('alpha/extra.py,,\n')
+        os.utime(dist_info, ns=(stamp, stamp))
+
+        cache = self.new_process()
+        self.assertEqual(self.lookup('alpha', 'extra.py').name, 'alpha')
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+"""
+测试嵌入exe引导代码中的ZipMemoryLoader
+Created on 2026-10-18
+"""
+
+import importlib
+import io
+import os
+import py_compile
+import shutil
+import sys
+import tempfile
+import unittest
+import zipfile
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from embed_bootstrap import load_bootstrap
+from soeasypack.core.easy_pack import xor_zip_members
+
+KEY = 'aB3dE5fG7hJ9kL1m'
+
+MODULES = {
+    'sep_demo/__init__.py': 'NAME = "sep_demo"\n',
+    'sep_demo/tools.py': 'from . import NAME\n\ndef hello():\n    return "hello " + NAME\n',
+    'sep_single.py': 'VALUE = 42\n',
+}
+
+
+def build_pyc_zip():
+    """把MODULES编译成pyc并按soeasypack.sz的结构写入zip, 再逐个文件混淆"""
+    temp_dir = tempfile.mkdtemp()
+    zip_path = os.path.join(temp_dir, 'soeasypack.sz')
+    try:
+        with zipfile.ZipFile(zip_path, 'w', compression=zipfile.ZIP_DEFLATED) as zip_fp:
+            for i, (arcname, source) in enumerate(MODULES.items()):
+                py_file = os.path.join(temp_dir, 'src', arcname)
+                os.makedirs(os.path.dirname(py_file), exist_ok=True)
+                with open(py_file, 'w', encoding='utf-8') as fp:
+                    fp.write(source)
+                py_compile.compile(py_file, cfile=py_file + 'c', doraise=True)
+                # # 混合使用存储和压缩两种方式
+                compress_type = zipfile.ZIP_STORED if i % 2 else zipfile.ZIP_DEFLATED
+                zip_fp.write(py_file + 'c', arcname=arcname + 'c', compress_type=compress_type)
+        xor_zip_members(zip_path, KEY)
+        with open(zip_path, 'rb') as fp:
+            return fp.read()
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+class TestZipMemoryLoader(unittest.TestCase):
+
+    def setUp(self):
+        self.bootstrap = load_bootstrap()
+        self.loader = self.bootstrap['ZipMemoryLoader'](build_pyc_zip(), KEY.encode('utf-8'))
+        sys.meta_path.insert(0, self.loader)
+
+    def tearDown(self):
+        sys.meta_path.remove(self.loader)
+        for name in ('sep_demo', 'sep_demo.tools', 'sep_single'):
+            sys.modules.pop(name, None)
+
+    def test_import_package_and_module(self):
+        tools = importlib.import_module('sep_demo.tools')
+        self.assertEqual(tools.hello(), 'hello sep_demo')
+        self.assertEqual(importlib.import_module('sep_single').VALUE, 42)
+        self.assertIs(sys.modules['sep_demo'].__spec__.loader, self.loader)
+
+    def test_exec_module_uses_index(self):
+        """导入时不再调用namelist()"""
+        with patch.object(self.loader.zip_file, 'namelist', side_effect=AssertionError('namelist called')):
+            self.assertEqual(importlib.import_module('sep_single').VALUE, 42)
+        self.assertIn('sep_demo/tools.pyc', self.loader.zip_index)
+        with self.assertRaises(TypeError):
+            self.loader.zip_index['other.pyc'] = None
+
+    def test_reads_from_shared_buffer(self):
+        """加载器直接读取传入的内存, 不复制归档"""
+        zip_data = build_pyc_zip()
+        shared_buffer = bytearray(zip_data)
+        loader = self.bootstrap['ZipMemoryLoader'](memoryview(shared_buffer), KEY.encode('utf-8'))
+        self.assertIs(loader.zip_data.obj, shared_buffer)
+        zip_info = loader.zip_index['sep_single.pyc']
+        self.assertEqual(len(loader.read_member(zip_info)), zip_info.file_size)
+        # # 共享内存中的数据保持混淆状态
+        self.assertEqual(shared_buffer, zip_data)
+
+    def test_members_obfuscated(self):
+        """目录结构是明文, 文件数据是混淆的"""
+        zip_data = build_pyc_zip()
+        with zipfile.ZipFile(io.BytesIO(zip_data)) as zip_fp:
+            self.assertEqual(sorted(zip_fp.namelist()), sorted(name + 'c' for name in MODULES))
+            with self.assertRaises(Exception):
+                for name in zip_fp.namelist():
+                    zip_fp.read(name)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+测试modulegraph2多进程预解析源码
+Created on 2026-10-18
+"""
+
+import os
+import sys
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from soeasypack.lib.modulegraph2 import ModuleGraph, saved_sys_path
+
+SOURCES = {
+    'sep_workers_pkg/__init__.py': 'from . import sub\nfrom .sub import helper\n',
+    'sep_workers_pkg/sub/__init__.py': 'import sep_workers_mod\n',
+    'sep_workers_pkg/sub/helper.py': 'from .. import shared\ndef f():\n    import sep_workers_lazy\n',
+    'sep_workers_pkg/shared.py': 'VALUE = 1\n',
+    'sep_workers_mod.py': 'try:\n    import sep_workers_missing\nexcept ImportError:\n    pass\n',
+    'sep_workers_lazy.py': 'from sep_workers_pkg import shared\n',
+    'main.py': 'import sep_workers_pkg\nfrom sep_workers_pkg.shared import VALUE\n',
+}
+
+
+def graph_summary(mg):
+    nodes = sorted((type(n).__name__, n.identifier, str(n.filename), tuple(sorted(n.globals_written)),
+                    tuple(sorted(n.globals_read))) for n in mg.iter_graph() if hasattr(n, 'globals_read'))
+    edges = sorted((a.identifier, b.identifier, tuple(sorted(map(repr, info))))
+                   for a in mg.iter_graph() for info, b in mg.outgoing(a))
+    return nodes, edges
+
+
+class TestGraphWorkers(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        for name, code in SOURCES.items():
+            path = os.path.join(self.temp_dir, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as fp:
+                fp.write(code)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+        for name in list(sys.modules):
+            if name.startswith('sep_workers_'):
+                del sys.modules[name]
+
+    def build(self, workers):
+        with saved_sys_path():
+            sys.path.insert(0, self.temp_dir)
+            mg = ModuleGraph(workers=workers)
+            mg.add_script(os.path.join(self.temp_dir, 'main.py'))
+        return mg
+
+    def test_same_graph(self):
+        expected = graph_summary(self.build(None))
+        mg = self.build(2)
+        self.assertEqual(graph_summary(mg), expected)
+        self.assertGreater(mg._prefetcher.used, 0)
+        self.assertIsNotNone(mg.find_node('sep_workers_lazy'))
+
+    def test_unguarded_build_script(self):
+        """没有__main__保护的打包脚本不会被解析进程重新执行"""
+        marker = os.path.join(self.temp_dir, 'runs.txt')
+        build_script = os.path.join(self.temp_dir, 'build.py')
+        with open(build_script, 'w', encoding='utf-8') as fp:
+            # # 与windows一样使用spawn方式启动子进程
+            fp.write(f'''import sys
+import multiprocessing
+multiprocessing.set_start_method('spawn')
+sys.path.insert(0, {os.path.join(os.path.dirname(__file__), '..')!r})
+sys.path.insert(0, {self.temp_dir!r})
+with open({marker!r}, 'a') as fp:
+    fp.write('run\\n')
+from soeasypack.lib.modulegraph2 import ModuleGraph
+mg = ModuleGraph(workers=2)
+mg.add_script({os.path.join(self.temp_dir, 'main.py')!r})
+print(mg._prefetcher.used)
+''')
+        result = subprocess.run([sys.executable, build_script], capture_output=True, text=True, timeout=120)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertGreater(int(result.stdout), 0)
+        with open(marker) as fp:
+            self.assertEqual(fp.read(), 'run\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+"""
+测试只修改项目文件时增量更新依赖图
+Created on 2026-10-18
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from soeasypack.core import ast_find_depend, slimfile
+from soeasypack.lib.modulegraph2 import saved_sys_path
+
+SOURCES = {
+    'main.py': 'import inc_helper\nfrom inc_pkg import sub\nfrom inc_helper import tool\n',
+    'inc_helper.py': 'import inc_old\ntool = None\n',
+    'inc_old.py': 'import inc_old_dep\n',
+    'inc_old_dep.py': '',
+    'inc_new.py': 'import inc_missing\n',
+    'inc_tool.py': '',
+    'inc_pkg/__init__.py': 'from . import sub\n',
+    'inc_pkg/sub.py': 'VALUE = 1\n',
+}
+
+
+def graph_summary(mg):
+    nodes = sorted((type(n).__name__, n.identifier) for n in mg.nodes())
+    edges = sorted((a.identifier, b.identifier, tuple(sorted(map(repr, info)))) for a, b, info in mg.edges())
+    return nodes, edges
+
+
+class TestIncrementalGraph(unittest.TestCase):
+
+    def setUp(self):
+        self.project_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.project_dir, 'cache')
+        self.main_path = os.path.join(self.project_dir, 'main.py')
+        for name, code in SOURCES.items():
+            self.write(name, code)
+
+        self.builds = 0
+        module_graph = ast_find_depend.ModuleGraph
+
+        def counting_graph(*args, **kwargs):
+            self.builds += 1
+            return module_graph(*args, **kwargs)
+
+        ast_find_depend.ModuleGraph = counting_graph
+        self.addCleanup(setattr, ast_find_depend, 'ModuleGraph', module_graph)
+
+    def tearDown(self):
+        shutil.rmtree(self.project_dir, ignore_errors=True)
+        for name in list(sys.modules):
+            if name.startswith('inc_'):
+                del sys.modules[name]
+
+    def write(self, name, code):
+        path = os.path.join(self.project_dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        stamp = os.stat(path).st_mtime_ns + 10 ** 9 if os.path.exists(path) else None
+        with open(path, 'w', encoding='utf-8') as fp:
+            fp.write(code)
+        if stamp is not None:
+            os.utime(path, ns=(stamp, stamp))
+
+    def build(self, cache_dir=None, excludes=('inc_excluded',)):
+        with saved_sys_path():
+            sys.path.insert(0, self.project_dir)
+            return ast_find_depend.build_graph(self.main_path, list(excludes), cache_dir=cache_dir)
+
+    def assert_same_as_full_build(self, mg):
+        for name in list(sys.modules):
+            if name.startswith('inc_'):
+                del sys.modules[name]
+        self.assertEqual(graph_summary(mg), graph_summary(self.build()))
+
+    def test_unchanged(self):
+        self.build(self.cache_dir)
+        mg = self.build(self.cache_dir)
+        self.assertEqual(self.builds, 1)
+        self.assert_same_as_full_build(mg)
+
+    def test_changed_module(self):
+        self.build(self.cache_dir)
+        self.write('inc_helper.py', 'import inc_new\ntool = None\n')
+        mg = self.build(self.cache_dir)
+        self.assertEqual(self.builds, 1)
+        self.assertIsNotNone(mg.find_node('inc_new'))
+        self.assertIsNotNone(mg.find_node('inc_missing'))
+        self.assertIsNone(mg.find_node('inc_old'))
+        self.assertIsNone(mg.find_node('inc_old_dep'))
+        self.assert_same_as_full_build(mg)
+
+        # # 再次打包时使用更新后的依赖图
+        mg = self.build(self.cache_dir)
+        self.assertEqual(self.builds, 2)
+        self.assertIsNone(mg.find_node('inc_old'))
+
+    def test_imported_name_becomes_module(self):
+        self.build(self.cache_dir)
+        self.write('inc_helper.py', 'import inc_old\nimport inc_tool as tool\n')
+        mg = self.build(self.cache_dir)
+        self.assertEqual(self.builds, 1)
+        self.assertIsNotNone(mg.find_node('inc_tool'))
+        self.assert_same_as_full_build(mg)
+
+    def test_changed_package_and_script(self):
+        self.build(self.cache_dir)
+        self.write('inc_pkg/__init__.py', 'import inc_tool\n')
+        self.write('main.py', 'import inc_pkg.sub\n')
+        mg = self.build(self.cache_dir)
+        self.assertEqual(self.builds, 1)
+        self.assertIsNone(mg.find_node('inc_helper'))
+        self.assert_same_as_full_build(mg)
+
+    def test_rebuild(self):
+        self.build(self.cache_dir)
+        # # 新增模块
+        self.write('inc_added.py', '')
+        self.build(self.cache_dir)
+        self.assertEqual(self.builds, 2)
+        # # 排除的包变化
+        self.build(self.cache_dir, excludes=())
+        self.assertEqual(self.builds, 3)
+        # # 非模块文件不影响依赖图
+        self.write('data.txt', '')
+        self.build(self.cache_dir, excludes=())
+        self.assertEqual(self.builds, 3)
+
+    def test_check_dependency_files_cache_dir(self):
+        # # 依赖图和分析缓存保存在专用的缓存目录中, 不在输出目录根目录
+        with mock.patch.object(slimfile, 'analyze_depends', return_value=set()) as analyze_depends:
+            slimfile.check_dependency_files(self.main_path, self.project_dir, pack_mode=3)
+        self.assertEqual(analyze_depends.call_args.kwargs['cache_dir'],
+                         os.path.join(self.project_dir, slimfile.CACHE_DIR_NAME))
+
+
+if __name__ == '__main__':
+    unittest.main()
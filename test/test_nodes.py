@@ -0,0 +1,69 @@
+"""
+测试modulegraph2节点类使用__slots__, 以及不保留code对象的依赖图
+Created on 2026-10-18
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import py_compile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from soeasypack.lib.modulegraph2 import BytecodeModule, ModuleGraph, Script, SourceModule, saved_sys_path
+from soeasypack.lib.modulegraph2 import _nodes
+
+
+class TestNodes(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        with open(os.path.join(self.temp_dir, 'sep_nodes_src.py'), 'w') as fp:
+            fp.write('import sep_nodes_pyc\n')
+        source = os.path.join(self.temp_dir, 'sep_nodes_build.py')
+        with open(source, 'w') as fp:
+            fp.write('VALUE = 1\n')
+        # # 只有pyc的模块
+        py_compile.compile(source, cfile=os.path.join(self.temp_dir, 'sep_nodes_pyc.pyc'), doraise=True)
+        os.remove(source)
+        self.script = os.path.join(self.temp_dir, 'main.py')
+        with open(self.script, 'w') as fp:
+            fp.write('import sep_nodes_src\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+        for name in list(sys.modules):
+            if name.startswith('sep_nodes_'):
+                del sys.modules[name]
+
+    def build(self, keep_code):
+        with saved_sys_path():
+            sys.path.insert(0, self.temp_dir)
+            mg = ModuleGraph(keep_code=keep_code)
+            mg.add_script(self.script)
+        return mg
+
+    def test_no_instance_dict(self):
+        for cls in vars(_nodes).values():
+            if isinstance(cls, type) and issubclass(cls, _nodes.BaseNode):
+                self.assertFalse(hasattr(object.__new__(cls), '__dict__'), cls)
+
+    def test_keep_code(self):
+        mg = self.build(True)
+        self.assertIsInstance(mg.find_node('sep_nodes_pyc'), BytecodeModule)
+        self.assertIsNotNone(mg.find_node('sep_nodes_pyc').code)
+        self.assertIsNotNone(mg.find_node(self.script).code)
+
+        mg = self.build(False)
+        node = mg.find_node('sep_nodes_pyc')
+        self.assertIsNone(node.code)
+        self.assertIn('VALUE', node.globals_written)
+        self.assertIsInstance(mg.find_node(self.script), Script)
+        self.assertIsNone(mg.find_node(self.script).code)
+        self.assertIsInstance(mg.find_node('sep_nodes_src'), SourceModule)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+"""
+测试按文件类型选择压缩方式的zip归档
+Created on 2026-10-18
+"""
+
+import os
+import sys
+import shutil
+import importlib
+import py_compile
+import tempfile
+import unittest
+import zipfile
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from embed_bootstrap import load_bootstrap
+from soeasypack.core import pack_zip
+from soeasypack.core.easy_pack import xor_zip_members
+from soeasypack.core.pack_zip import DEFAULT_COMPRESS_POLICY, STORED_POLICY, merge_policy, write_zip
+
+FILES = {
+    'Lib/site-packages/demo/__init__.pyc': b'print("demo")\n' * 200,
+    'Lib/site-packages/demo/_core.pyd': os.urandom(2048) + b'\0' * 4096,
+    'Lib/site-packages/demo/icon.PNG': os.urandom(3000),
+    'Lib/site-packages/demo/data.bin': b'0123456789' * 500,
+}
+
+
+class TestPackZip(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.members = []
+        for name, data in FILES.items():
+            full_path = os.path.join(self.temp_dir, 'src', name)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            with open(full_path, 'wb') as fp:
+                fp.write(data)
+            self.members.append((full_path, name))
+        self.zip_path = os.path.join(self.temp_dir, 'rundep.zip')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_merge_policy(self):
+        policy = merge_policy({'PYC': 9, '.png': 6, '*': None})
+        self.assertEqual(policy['.pyc'], 9)
+        self.assertEqual(policy['.png'], 6)
+        self.assertIsNone(policy['*'])
+        self.assertEqual(policy['.dll'], DEFAULT_COMPRESS_POLICY['.dll'])
+        with self.assertRaises(ValueError):
+            merge_policy({'.pyc': 10})
+
+    def test_default_policy(self):
+        stats = write_zip(self.zip_path, self.members)
+        with zipfile.ZipFile(self.zip_path) as zip_fp:
+            types = {info.filename: info.compress_type for info in zip_fp.infolist()}
+            for name, data in FILES.items():
+                self.assertEqual(zip_fp.read(name), data)
+        self.assertEqual(types['Lib/site-packages/demo/icon.PNG'], zipfile.ZIP_STORED)
+        self.assertEqual(types['Lib/site-packages/demo/_core.pyd'], zipfile.ZIP_DEFLATED)
+        self.assertEqual(types['Lib/site-packages/demo/__init__.pyc'], zipfile.ZIP_DEFLATED)
+        self.assertEqual(set(stats), {'.png', '.pyd', '*'})
+        self.assertEqual(stats['*'][0], 2)
+        count, raw, packed, _ = stats['.png']
+        self.assertEqual((count, raw, packed), (1, 3000, 3000))
+
+    def test_parallel_deterministic(self):
+        """线程数不同, 生成的zip字节完全一致, 且按members顺序排列"""
+        members = list(self.members)
+        for i in range(40):
+            name = f'Lib/site-packages/demo/mod{i}.pyc'
+            full_path = os.path.join(self.temp_dir, 'src', name)
+            with open(full_path, 'wb') as fp:
+                fp.write(os.urandom(100) + b'x' * (i * 1000))
+            members.append((full_path, name))
+        outputs = []
+        for workers in (1, 4):
+            zip_path = os.path.join(self.temp_dir, f'w{workers}.zip')
+            write_zip(zip_path, members, workers=workers)
+            with zipfile.ZipFile(zip_path) as zip_fp:
+                self.assertIsNone(zip_fp.testzip())
+                self.assertEqual(zip_fp.namelist(), [name for _, name in members])
+            with open(zip_path, 'rb') as fp:
+                outputs.append(fp.read())
+        self.assertEqual(outputs[0], outputs[1])
+
+    def test_stored_policy(self):
+        write_zip(self.zip_path, self.members, STORED_POLICY)
+        with zipfile.ZipFile(self.zip_path) as zip_fp:
+            self.assertTrue(all(info.compress_type == zipfile.ZIP_STORED for info in zip_fp.infolist()))
+
+    def test_large_files_and_pending_bytes(self):
+        """大文件不进入线程池, 线程池中未写入的字节数不超过上限"""
+        members = []
+        for i in range(30):
+            name = f'Lib/site-packages/demo/part{i}.dll'
+            full_path = os.path.join(self.temp_dir, 'src', name)
+            with open(full_path, 'wb') as fp:
+                fp.write(os.urandom(100) + b'x' * (i * 200))
+            members.append((full_path, name))
+        in_flight = [0, 0]
+        read_member = pack_zip.read_member
+        append_member = pack_zip.append_member
+
+        def counting_read(full_path, zinfo, level):
+            in_flight[0] += zinfo.file_size
+            in_flight[1] = max(in_flight)
+            return read_member(full_path, zinfo, level)
+
+        def counting_append(zip_fp, zinfo, data):
+            in_flight[0] -= zinfo.file_size
+            return append_member(zip_fp, zinfo, data)
+
+        with mock.patch.object(pack_zip, 'LARGE_FILE_SIZE', 4000), \
+                mock.patch.object(pack_zip, 'MAX_PENDING_BYTES', 8000), \
+                mock.patch.object(pack_zip, 'read_member', counting_read), \
+                mock.patch.object(pack_zip, 'append_member', counting_append), \
+                mock.patch.object(pack_zip, 'write_member', wraps=pack_zip.write_member) as write_member:
+            write_zip(self.zip_path, members, workers=4)
+        self.assertEqual(write_member.call_count, sum(os.path.getsize(path) > 4000 for path, _ in members))
+        self.assertLessEqual(in_flight[1], 8000)
+        with zipfile.ZipFile(self.zip_path) as zip_fp:
+            self.assertIsNone(zip_fp.testzip())
+            self.assertEqual(zip_fp.namelist(), [name for _, name in members])
+
+    def test_fallback_without_zipfile_internals(self):
+        with mock.patch.object(pack_zip, 'can_append', return_value=False):
+            write_zip(self.zip_path, self.members)
+        with zipfile.ZipFile(self.zip_path) as zip_fp:
+            for name, data in FILES.items():
+                self.assertEqual(zip_fp.read(name), data)
+
+    def test_non_ascii_names(self):
+        """非ascii文件名设置utf-8标志, zipfile和引导代码中的加载器都能按原名读取"""
+        module_file = os.path.join(self.temp_dir, 'src', '中文模块.py')
+        with open(module_file, 'w', encoding='utf-8') as fp:
+            fp.write('VALUE = "你好"\n')
+        py_compile.compile(module_file, cfile=module_file + 'c', doraise=True)
+        members = [(module_file + 'c', '中文模块.pyc'), (self.members[0][0], '演示/数据.pyc')]
+        write_zip(self.zip_path, members)
+        with zipfile.ZipFile(self.zip_path) as zip_fp:
+            self.assertEqual(zip_fp.namelist(), ['中文模块.pyc', '演示/数据.pyc'])
+            self.assertTrue(all(info.flag_bits & 0x800 for info in zip_fp.infolist()))
+            self.assertIsNone(zip_fp.testzip())
+
+        key = 'aB3dE5fG7hJ9kL1m'
+        xor_zip_members(self.zip_path, key)
+        with open(self.zip_path, 'rb') as fp:
+            loader = load_bootstrap()['ZipMemoryLoader'](fp.read(), key.encode('utf-8'))
+        sys.meta_path.insert(0, loader)
+        try:
+            self.assertEqual(importlib.import_module('中文模块').VALUE, '你好')
+        finally:
+            sys.meta_path.remove(loader)
+            sys.modules.pop('中文模块', None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+"""
+测试读取PE文件的导入表和延迟导入表
+使用构造的最小PE文件, 不依赖windows
+Created on 2026-10-18
+"""
+
+import os
+import sys
+import struct
+import shutil
+import tempfile
+import sysconfig
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from soeasypack.core import pe_imports
+
+SECTION_RVA = 0x1000
+SECTION_OFFSET = 0x200
+IMAGE_BASE = 0x180000000
+
+
+def make_pe(imports=(), delay_imports=(), pe32=False, old_delay=False):
+    """
+    构造只有一个节的PE文件, 节中依次是导入描述符, 延迟导入描述符和dll名称
+    """
+    image_base = 0x10000000 if pe32 else IMAGE_BASE
+    import_rva = SECTION_RVA
+    delay_rva = import_rva + (len(imports) + 1) * 20
+    names_rva = delay_rva + (len(delay_imports) + 1) * 32
+    names = b''
+    name_rvas = []
+    for name in list(imports) + list(delay_imports):
+        name_rvas.append(names_rva + len(names))
+        names += name.encode('ascii') + b'\x00'
+
+    section = b''
+    for name_rva in name_rvas[:len(imports)]:
+        section += struct.pack('<5I', 0, 0, 0, name_rva, 0)
+    section += b'\x00' * 20
+    for name_rva in name_rvas[len(imports):]:
+        if old_delay:
+            section += struct.pack('<8I', 0, image_base + name_rva, 0, 0, 0, 0, 0, 0)
+        else:
+            section += struct.pack('<8I', 1, name_rva, 0, 0, 0, 0, 0, 0)
+    section += b'\x00' * 32 + names
+
+    directories = [(0, 0)] * 16
+    if imports:
+        directories[pe_imports.IMPORT_DIRECTORY] = (import_rva, (len(imports) + 1) * 20)
+    if delay_imports:
+        directories[pe_imports.DELAY_IMPORT_DIRECTORY] = (delay_rva, (len(delay_imports) + 1) * 32)
+    if pe32:
+        optional = struct.pack('<H26xI60xI', 0x10b, image_base, 16)
+    else:
+        optional = struct.pack('<H22xQ76xI', 0x20b, image_base, 16)
+    optional += b''.join(struct.pack('<2I', rva, size) for rva, size in directories)
+
+    coff = struct.pack('<2H3I2H', 0x14c if pe32 else 0x8664, 1, 0, 0, 0, len(optional), 0x2022)
+    section_header = struct.pack('<8s6I2HI', b'.idata', len(section), SECTION_RVA, len(section), SECTION_OFFSET,
+                                 0, 0, 0, 0, 0xC0000040)
+    headers = b'MZ' + b'\x00' * 0x3A + struct.pack('<I', 0x40) + b'PE\x00\x00' + coff + optional + section_header
+    return headers.ljust(SECTION_OFFSET, b'\x00') + section
+
+
+class TestPeImports(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def write(self, name, content):
+        path = os.path.join(self.temp_dir, name)
+        with open(path, 'wb') as fp:
+            fp.write(content)
+        return path
+
+    def test_read_imports(self):
+        path = self.write('QtWidgets.pyd', make_pe(['Qt6Core.dll', 'python3.dll', 'KERNEL32.dll'], ['Qt6Gui.dll']))
+        self.assertEqual(pe_imports.read_imports(path),
+                         (['Qt6Core.dll', 'python3.dll', 'KERNEL32.dll'], ['Qt6Gui.dll']))
+
+    def test_pe32_old_delay_format(self):
+        path = self.write('old.dll', make_pe(['a.dll'], ['b.dll', 'c.dll'], pe32=True, old_delay=True))
+        self.assertEqual(pe_imports.read_imports(path), (['a.dll'], ['b.dll', 'c.dll']))
+        path = self.write('none.dll', make_pe())
+        self.assertEqual(pe_imports.read_imports(path), ([], []))
+
+    def test_not_pe(self):
+        content = make_pe(['a.dll'])
+        for name, data in (('empty.pyd', b''), ('text.pyd', b'not a pe file'), ('short.pyd', content[:0x100]),
+                           ('truncated.pyd', content[:SECTION_OFFSET + 10])):
+            with self.subTest(name=name):
+                self.assertIsNone(pe_imports.read_imports(self.write(name, data)))
+        self.assertIsNone(pe_imports.read_imports(os.path.join(self.temp_dir, 'missing.pyd')))
+
+    def test_real_launcher(self):
+        # # pip自带的distlib启动器是真实的windows exe
+        launcher = os.path.join(sysconfig.get_paths()['purelib'], 'pip', '_vendor', 'distlib', 'w64.exe')
+        if not os.path.isfile(launcher):
+            self.skipTest('没有distlib启动器')
+        imports, delay_imports = pe_imports.read_imports(launcher)
+        self.assertIn('KERNEL32.dll', imports)
+
+    def test_dll_closure(self):
+        pyd = self.write('QtGui.pyd', make_pe(['QT6GUI.dll', 'python3.dll', 'KERNEL32.dll']))
+        paths = {
+            'qt6gui.dll': self.write('Qt6Gui.dll', make_pe(['Qt6Core.dll'], ['opengl32sw.dll'])),
+            'qt6core.dll': self.write('Qt6Core.dll', make_pe(['Qt6Gui.dll', 'MSVCP140.dll'])),
+            'opengl32sw.dll': self.write('opengl32sw.dll', make_pe()),
+            'qt6network.dll': self.write('Qt6Network.dll', make_pe(['Qt6Core.dll'])),
+            'msvcp140.dll': self.write('MSVCP140.dll', b'not a pe file'),
+        }
+        self.assertEqual(pe_imports.dll_closure([pyd], paths),
+                         {paths['qt6gui.dll'], paths['qt6core.dll'], paths['opengl32sw.dll'], paths['msvcp140.dll']})
+
+    def test_cache(self):
+        path = self.write('a.pyd', make_pe(['b.dll'], ['c.dll']))
+        cache = {}
+        with mock.patch.object(pe_imports, 'read_imports', wraps=pe_imports.read_imports) as read_imports:
+            self.assertEqual(pe_imports.cached_imports(path, cache), ['b.dll', 'c.dll'])
+            self.assertEqual(pe_imports.cached_imports(path, cache), ['b.dll', 'c.dll'])
+            self.assertEqual(read_imports.call_count, 1)
+
+            cache_dir = os.path.join(self.temp_dir, 'cache')
+            pe_imports.save_import_cache(cache_dir, cache)
+            cache = pe_imports.load_import_cache(cache_dir)
+            self.assertEqual(pe_imports.cached_imports(path, cache), ['b.dll', 'c.dll'])
+            self.assertEqual(read_imports.call_count, 1)
+
+            # # 文件修改后重新读取
+            stamp = os.stat(path).st_mtime_ns + 10 ** 9
+            self.write('a.pyd', make_pe(['d.dll']))
+            os.utime(path, ns=(stamp, stamp))
+            self.assertEqual(pe_imports.cached_imports(path, cache), ['d.dll'])
+            self.assertEqual(read_imports.call_count, 2)
+        self.assertEqual(pe_imports.load_import_cache(None), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+"""
+测试按顶层包名注册的打包钩子
+Created on 2026-10-18
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from soeasypack.core import pkg_hooks
+
+FILES = [
+    'base/Lib/encodings/gbk.py',
+    'base/Lib/encodings/cp437.py',
+    'base/Lib/encodings/cp1252.py',
+    'base/DLLs/tcl86t.dll',
+    'base/tcl/tcl8.6/init.tcl',
+    'base/tcl/tcl8.6/encoding/gbk.enc',
+    'base/tcl/tk8.6/tk.tcl',
+    'base/tcl/tk8.6/demos/widget',
+    'site/PySide6/__init__.py',
+    'site/PySide6/QtGui.cp311-win_amd64.pyd',
+    'site/PySide6/plugins/platforms/qwindows.dll',
+    'site/PySide6/plugins/imageformats/qjpeg.dll',
+    'site/PySide6/plugins/styles/qmodernwindowsstyle.dll',
+    'site/curl_cffi/__init__.py',
+    'site/curl_cffi.libs/libcurl.dll',
+    'site/curl_cffi-0.7.dist-info/METADATA',
+    'site/numpy/__init__.py',
+    'site/numpy.libs/libopenblas.dll',
+    'site/matplotlib/__init__.py',
+    'site/matplotlib/mpl-data/matplotlibrc',
+    'site/matplotlib/mpl-data/fonts/ttf/DejaVuSans.ttf',
+    'site/matplotlib/mpl-data/__pycache__/x.pyc',
+]
+
+
+class TestPkgHooks(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        for name in FILES:
+            path = self.path(name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            open(path, 'w').close()
+        self.base_dir = self.path('base')
+        self.site_dir = self.path('site')
+        self.variables = mock.Mock(return_value={
+            'tcl_dir': self.path('base/tcl/tcl8.6'), 'tk_dir': self.path('base/tcl/tk8.6'), 'tcl_v': '86', 'tk_v': '86'})
+        hook = pkg_hooks.PackageHook(**{key: getattr(pkg_hooks.HOOKS['tkinter'], key)
+                                        for key in ('data_dirs', 'data_files', 'dlls', 'skip_dirs')},
+                                     variables=self.variables)
+        patcher = mock.patch.dict(pkg_hooks.HOOKS, {'tkinter': hook})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def path(self, name):
+        return os.path.join(self.temp_dir, *name.split('/'))
+
+    def hook_files(self, names):
+        packages = {name: self.path(f'site/{name}') if os.path.isdir(self.path(f'site/{name}')) else None
+                    for name in names}
+        return pkg_hooks.hook_files(packages, self.base_dir, self.site_dir)
+
+    def test_hooks(self):
+        found = self.hook_files(['tkinter', 'PySide6', 'curl_cffi', 'numpy', 'matplotlib', 'json'])
+        expected = [
+            'base/Lib/encodings/gbk.py', 'base/Lib/encodings/cp437.py', 'base/DLLs/tcl86t.dll',
+            'base/tcl/tcl8.6/init.tcl', 'base/tcl/tcl8.6/encoding/gbk.enc', 'base/tcl/tk8.6/tk.tcl',
+            'site/PySide6/plugins/platforms/qwindows.dll', 'site/PySide6/plugins/imageformats/qjpeg.dll',
+            'site/curl_cffi.libs/libcurl.dll', 'site/curl_cffi-0.7.dist-info/METADATA',
+            'site/numpy.libs/libopenblas.dll',
+            'site/matplotlib/mpl-data/matplotlibrc', 'site/matplotlib/mpl-data/fonts/ttf/DejaVuSans.ttf',
+        ]
+        self.assertEqual(found, {self.path(name) for name in expected})
+
+    def test_only_present_packages(self):
+        # # 只有encodings总是求值, 其它钩子不在依赖图中时不求值
+        found = self.hook_files(['json'])
+        self.assertEqual(found, {self.path('base/Lib/encodings/gbk.py'), self.path('base/Lib/encodings/cp437.py')})
+        self.variables.assert_not_called()
+
+    def test_shared_listing(self):
+        listing = pkg_hooks.DirListing()
+        with mock.patch.object(pkg_hooks.os, 'scandir', wraps=os.scandir) as scandir:
+            packages = {'PySide6': self.path('site/PySide6'), 'curl_cffi': self.path('site/curl_cffi'),
+                        'numpy': self.path('site/numpy'), 'tkinter': None}
+            first = pkg_hooks.hook_files(packages, self.base_dir, self.site_dir, listing)
+            calls = scandir.call_count
+            self.assertEqual(len({call.args[0] for call in scandir.call_args_list}), calls)
+            self.assertEqual(pkg_hooks.hook_files(packages, self.base_dir, self.site_dir, listing), first)
+            self.assertEqual(scandir.call_count, calls)
+
+
+if __name__ == '__main__':
+    unittest.main()
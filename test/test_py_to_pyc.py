@@ -0,0 +1,110 @@
+"""
+测试py转pyc
+Created on 2026-10-18
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import marshal
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from soeasypack.core import easy_pack
+from soeasypack.core.slimfile import get_cache_dir
+
+
+class TestPyToPyc(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.site_dir = os.path.join(self.temp_dir, 'Lib', 'site-packages', 'demo')
+        os.makedirs(os.path.join(self.site_dir, '__pycache__'))
+        self.py_files = []
+        for i in range(easy_pack.PYC_PARALLEL_MIN_FILES + 10):
+            self.py_files.append(self.write(f'mod{i}.py', f'VALUE = {i}\n'))
+        self.config_py = self.write('config.py', 'PATH = 1\n')
+        self.broken_py = self.write('broken.py', 'def f(:\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def write(self, name, code):
+        path = os.path.join(self.site_dir, name)
+        with open(path, 'w', encoding='utf-8') as fp:
+            fp.write(code)
+        return path
+
+    def check(self):
+        for py_file in self.py_files:
+            self.assertFalse(os.path.exists(py_file))
+            self.assertTrue(os.path.exists(py_file + 'c'))
+        # # 跳过的文件和编译失败的文件保留py
+        self.assertTrue(os.path.exists(self.config_py))
+        self.assertFalse(os.path.exists(self.config_py + 'c'))
+        self.assertTrue(os.path.exists(self.broken_py))
+        self.assertFalse(os.path.exists(os.path.join(self.site_dir, '__pycache__')))
+
+    def test_process_pool(self):
+        with self.assertLogs('soeasypack', level='ERROR') as logs:
+            easy_pack.py_to_pyc(self.temp_dir, 1, workers=2)
+        self.assertTrue(any('broken.py' in line for line in logs.output))
+        self.check()
+
+    def rebuild(self, optimize, cache_dir, changed=()):
+        """模拟重新复制环境后再次编译, 返回实际编译的py文件"""
+        for i, py_file in enumerate(self.py_files):
+            self.write(os.path.basename(py_file), f'VALUE = {-i if i in changed else i}\n')
+        with mock.patch.object(easy_pack, 'compile_all', wraps=easy_pack.compile_all) as compile_all:
+            easy_pack.py_to_pyc(self.site_dir, optimize, workers=1, cache_dir=cache_dir)
+        return sorted(compile_all.call_args[0][0])
+
+    def test_incremental_cache(self):
+        cache_dir = os.path.join(self.temp_dir, 'cache')
+        easy_pack.py_to_pyc(self.site_dir, 1, workers=1, cache_dir=cache_dir)
+        self.assertTrue(os.path.exists(os.path.join(cache_dir, 'pyc_manifest.json')))
+
+        # # 只有修改过的文件和上次编译失败的文件需要编译
+        compiled = self.rebuild(1, cache_dir, changed=(3,))
+        self.assertEqual(compiled, sorted([self.py_files[3], self.broken_py]))
+        self.check()
+        for i in (2, 3):
+            values = {}
+            with open(self.py_files[i] + 'c', 'rb') as fp:
+                exec(marshal.loads(fp.read()[16:]), values)
+            self.assertEqual(values['VALUE'], -i if i == 3 else i)
+
+        # # 优化级别变化时全部重新编译
+        compiled = self.rebuild(2, cache_dir)
+        self.assertEqual(len(compiled), len(self.py_files) + 1)
+
+    def test_prune_cache(self):
+        cache_dir = os.path.join(self.temp_dir, 'cache')
+        easy_pack.py_to_pyc(self.site_dir, 1, workers=1, cache_dir=cache_dir)
+        # # 删除了的文件不再保留在清单和缓存中
+        removed = self.py_files.pop()
+        os.remove(removed + 'c')
+        self.rebuild(1, cache_dir)
+        with open(os.path.join(cache_dir, 'pyc_manifest.json'), encoding='utf-8') as fp:
+            files = json.load(fp)['files']
+        self.assertEqual(set(files), {os.path.basename(py_file) for py_file in self.py_files})
+        self.assertEqual(set(os.listdir(os.path.join(cache_dir, 'pyc_cache'))),
+                         {os.path.basename(py_file) + 'c' for py_file in self.py_files})
+
+    def test_cache_dir_outside_rundep(self):
+        cache_dir = get_cache_dir(self.temp_dir)
+        self.assertEqual(os.path.dirname(cache_dir), self.temp_dir)
+        self.assertTrue(os.path.basename(cache_dir).startswith('.'))
+        self.assertTrue(os.path.isdir(cache_dir))
+
+    def test_single_process(self):
+        easy_pack.py_to_pyc(self.temp_dir, 1, workers=1)
+        self.check()
+
+
+if __name__ == '__main__':
+    unittest.main()
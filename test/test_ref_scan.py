@@ -0,0 +1,64 @@
+"""
+测试一次扫描查找dll/pyd名称引用
+Created on 2026-10-18
+"""
+
+import os
+import sys
+import random
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from soeasypack.core.ref_scan import compile_names, find_names, find_names_in_file
+
+NAMES = [b'Qt6Core.dll', b'Qt6Core5Compat.dll', b'.QtCore', b'.QtCore5Compat', b'.QtGui', b'e.dll',
+         b'lib(x)+.dll', b'.Qt', b'\x00\xff.dll']
+
+
+class TestRefScan(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_same_as_substring_search(self):
+        pattern = compile_names(NAMES)
+        rng = random.Random(0)
+        for _ in range(200):
+            parts = [rng.choice(NAMES)[:rng.randint(1, 20)] if rng.random() < 0.5 else bytes([rng.randrange(256)])
+                     for _ in range(rng.randint(0, 12))]
+            content = b''.join(parts)
+            with self.subTest(content=content):
+                self.assertEqual(find_names(pattern, content), {name for name in NAMES if name in content})
+
+    def test_overlapping_names(self):
+        pattern = compile_names(NAMES)
+        # # 重叠: Qt6Core.dll结尾的e.dll; 前缀: .Qt和.QtCore是.QtCore5Compat的前缀
+        self.assertEqual(find_names(pattern, b'xQt6Core.dll .QtCore5Compat'),
+                         {b'Qt6Core.dll', b'e.dll', b'.QtCore5Compat', b'.QtCore', b'.Qt'})
+
+    def test_text_names(self):
+        pattern = compile_names(['Qt6Core', 'QtCore', 'libssl'])
+        self.assertEqual(find_names(pattern, 'load("Qt6Core")'), {'Qt6Core'})
+        self.assertEqual(find_names(compile_names([]), 'Qt6Core'), set())
+
+    def test_file(self):
+        file_path = os.path.join(self.temp_dir, 'QtWidgets.pyd')
+        content = os.urandom(1 << 16) + b'Qt6Core.dll\x00PySide6.QtGui\x00' + os.urandom(1 << 16)
+        with open(file_path, 'wb') as fp:
+            fp.write(content)
+        found = find_names_in_file(compile_names(NAMES), file_path)
+        self.assertTrue({b'Qt6Core.dll', b'e.dll', b'.QtGui', b'.Qt'} <= found)
+        self.assertEqual(found, {name for name in NAMES if name in content})
+        empty_path = os.path.join(self.temp_dir, 'empty.pyd')
+        open(empty_path, 'wb').close()
+        self.assertEqual(find_names_in_file(compile_names(NAMES), empty_path), set())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+"""
+测试按目录快照查找模块的SpecResolver与importlib.util.find_spec结果一致
+Created on 2026-10-18
+"""
+
+import os
+import sys
+import shutil
+import zipfile
+import tempfile
+import unittest
+import importlib.util
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from soeasypack.lib.modulegraph2 import ModuleGraph, SourceModule, saved_sys_path
+from soeasypack.lib.modulegraph2._resolver import SpecResolver
+
+SOURCES = {
+    'first/res_mod.py': '',
+    'first/res_pkg/__init__.py': '',
+    'first/res_pkg/sub.py': '',
+    'first/res_pkg/data.txt': '',
+    'first/res_ns/part_a.py': '',
+    'first/res_shadow.py': '',
+    'first/res_notpkg.py/readme.txt': '',
+    'second/res_ns/part_b.py': '',
+    'second/res_shadow/__init__.py': '',
+    'second/res_second.py': '',
+    'first/res_boom/__init__.py': 'raise RuntimeError("imported")\n',
+    'first/res_boom/sub.py': '',
+    'first/res_ext/__init__.py': '__path__.append(__path__[0] + "_extra")\n',
+    'first/res_ext_extra/extra.py': '',
+}
+
+
+def spec_summary(spec):
+    if spec is None:
+        return None
+    locations = spec.submodule_search_locations
+    return (spec.name, spec.origin, type(spec.loader).__name__ if spec.loader is not None else None,
+            None if locations is None else list(locations))
+
+
+class TestSpecResolver(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        for name, code in SOURCES.items():
+            path = os.path.join(self.temp_dir, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as fp:
+                fp.write(code)
+        self.zip_path = os.path.join(self.temp_dir, 'archive.zip')
+        with zipfile.ZipFile(self.zip_path, 'w') as zf:
+            zf.writestr('res_zipped.py', '')
+        self.path = [os.path.join(self.temp_dir, 'first'), os.path.join(self.temp_dir, 'second'),
+                     self.zip_path, os.path.join(self.temp_dir, 'missing')]
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+        for name in list(sys.modules):
+            if name.startswith('res_'):
+                del sys.modules[name]
+        for entry in self.path:
+            sys.path_importer_cache.pop(entry, None)
+
+    def test_same_as_importlib(self):
+        names = ['res_mod', 'res_pkg', 'res_ns', 'res_shadow', 'res_second', 'res_zipped',
+                 'res_notpkg', 'res_missing', 'sys', 'zipimport', 'json']
+        resolver = SpecResolver()
+        with saved_sys_path():
+            sys.path[:0] = self.path
+            for name in names:
+                with self.subTest(name=name):
+                    self.assertEqual(spec_summary(resolver.find_spec(name)),
+                                     spec_summary(importlib.util.find_spec(name)))
+
+            pkg_path = [os.path.join(self.temp_dir, 'first', 'res_pkg')]
+            for name in ('res_pkg.sub', 'res_pkg.data', 'res_pkg.missing'):
+                with self.subTest(name=name):
+                    self.assertEqual(spec_summary(resolver.find_spec(name, pkg_path)),
+                                     spec_summary(importlib.util.find_spec(name)))
+
+    def test_listing_snapshot(self):
+        resolver = SpecResolver()
+        for _ in range(3):
+            self.assertIsNotNone(resolver.find_spec('res_second', self.path))
+            self.assertIsNone(resolver.find_spec('res_added', self.path))
+        # # 每个目录只读取一次: first和second
+        self.assertEqual(resolver.listings, 2)
+
+        with open(os.path.join(self.temp_dir, 'first', 'res_added.py'), 'w'):
+            pass
+        self.assertIsNone(resolver.find_spec('res_added', self.path))
+        resolver.clear()
+        self.assertIsNotNone(resolver.find_spec('res_added', self.path))
+
+    def test_graph_without_importing_parents(self):
+        with saved_sys_path():
+            sys.path[:0] = self.path
+            mg = ModuleGraph()
+            mg.add_module('res_boom.sub')
+            # # __init__使用了__path__的包仍然导入后查找
+            mg.add_module('res_ext.extra')
+        self.assertIsInstance(mg.find_node('res_boom.sub'), SourceModule)
+        self.assertNotIn('res_boom', sys.modules)
+        self.assertIsInstance(mg.find_node('res_ext.extra'), SourceModule)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+"""
+测试static模式下构建依赖图时不导入任何包
+Created on 2026-10-18
+"""
+
+import os
+import sys
+import shutil
+import zipfile
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from soeasypack.lib.modulegraph2 import (AliasNode, BuiltinModule, MissingModule, ModuleGraph, Package,
+                                         SourceModule, saved_sys_path)
+
+BOOM = 'import sys\nsys.modules["st_marker"] = sys\nraise RuntimeError("imported")\n'
+EXTEND_PATH = '__path__ = __import__("pkgutil").extend_path(__path__, __name__)\n'
+
+SOURCES = {
+    'first/st_boom/__init__.py': BOOM,
+    'first/st_boom/sub.py': 'from . import other\n',
+    'first/st_boom/other.py': '',
+    'first/st_ns/__init__.py': EXTEND_PATH + BOOM,
+    'first/st_ns/part_a.py': '',
+    'second/st_ns/__init__.py': EXTEND_PATH,
+    'second/st_ns/part_b.py': '',
+    'first/st_six.py': 'class _SixMetaPathImporter:\n    pass\n\nmoves = None\n',
+    'first/st_user.py': 'from st_six.moves import builtins\nimport st_six.moves.st_unknown\n',
+}
+
+
+class TestStaticResolver(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        for name, code in SOURCES.items():
+            path = os.path.join(self.temp_dir, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as fp:
+                fp.write(code)
+        self.zip_path = os.path.join(self.temp_dir, 'archive.zip')
+        with zipfile.ZipFile(self.zip_path, 'w') as zf:
+            zf.writestr('st_zipped/__init__.py', BOOM)
+            zf.writestr('st_zipped/mod.py', '')
+        self.path = [os.path.join(self.temp_dir, 'first'), os.path.join(self.temp_dir, 'second'), self.zip_path]
+        self.modules = set(sys.modules)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+        for name in list(sys.modules):
+            if name.startswith('st_'):
+                del sys.modules[name]
+        for entry in self.path:
+            sys.path_importer_cache.pop(entry, None)
+
+    def build(self, *names):
+        with saved_sys_path():
+            sys.path[:0] = self.path
+            mg = ModuleGraph(static=True)
+            # # 命名空间包的__init__导入的pkgutil与测试无关
+            mg.add_excludes(['pkgutil'])
+            for name in names:
+                mg.add_module(name)
+        # # 构建依赖图时没有导入新的模块
+        self.assertEqual({name for name in sys.modules if name.startswith('st_')}, set())
+        return mg
+
+    def test_package_not_imported(self):
+        mg = self.build('st_boom.sub', 'st_zipped.mod')
+        self.assertIsInstance(mg.find_node('st_boom'), Package)
+        self.assertIsInstance(mg.find_node('st_boom.other'), SourceModule)
+        self.assertIsInstance(mg.find_node('st_zipped'), Package)
+        self.assertIsNotNone(mg.find_node('st_zipped.mod'))
+        self.assertNotIsInstance(mg.find_node('st_zipped.mod'), MissingModule)
+
+    def test_pkgutil_namespace_package(self):
+        mg = self.build('st_ns.part_a', 'st_ns.part_b')
+        self.assertEqual(mg.find_node('st_ns').namespace_type, 'pkgutil')
+        self.assertIsInstance(mg.find_node('st_ns.part_a'), SourceModule)
+        self.assertIsInstance(mg.find_node('st_ns.part_b'), SourceModule)
+
+    def test_six_moves(self):
+        mg = self.build('st_user')
+        self.assertIsInstance(mg.find_node('st_six.moves'), Package)
+        node = mg.find_node('st_six.moves.builtins')
+        self.assertIsInstance(node, AliasNode)
+        self.assertEqual(node.actual_module, 'builtins')
+        self.assertIsInstance(mg.find_node('builtins'), BuiltinModule)
+        self.assertIsInstance(mg.find_node('st_six.moves.st_unknown'), MissingModule)
+
+
+if __name__ == '__main__':
+    unittest.main()
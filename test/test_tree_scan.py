@@ -0,0 +1,139 @@
+"""
+测试并发目录扫描及使用它的复制和瘦身
+Created on 2026-10-18
+"""
+
+import os
+import sys
+import shutil
+import fnmatch
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from soeasypack.core import tree_scan
+from soeasypack.core.tree_scan import TreeScanner, SHARED_SCANNER
+from soeasypack.core.easy_pack import copytree_parallel
+from soeasypack.core.re_find_pkg import find_pkgs
+from soeasypack.core.slimfile import move_files, check_dependency_files
+
+FILES = [
+    'main.py',
+    'README.md',
+    'pkg/__init__.py',
+    'pkg/core.pyd',
+    'pkg/__pycache__/core.cpython-311.pyc',
+    'pkg/sub/data.json',
+    'pkg/sub/deep/a.dll',
+    'pkg/sub/deep/deeper/b.txt',
+    '.git/config',
+    'Doc/index.html',
+]
+
+
+def walk_files(top, skip=()):
+    """os.walk列出的文件, 用于对比"""
+    result = set()
+    for root, dirs, files in os.walk(top):
+        dirs[:] = [d for d in dirs if d not in skip]
+        result.update(os.path.join(root, f) for f in files if f not in skip)
+    return result
+
+
+class TestTreeScan(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.src = os.path.join(self.temp_dir, 'src')
+        for name in FILES:
+            path = os.path.join(self.src, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as fp:
+                fp.write(name)
+        os.makedirs(os.path.join(self.src, 'empty'))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_walk_matches_os_walk(self):
+        scanner = TreeScanner(workers=4)
+        self.assertEqual({entry.path for entry in scanner.walk_files(self.src)}, walk_files(self.src))
+        roots = [root for root, _, _ in scanner.walk(self.src)]
+        self.assertEqual(roots[0], self.src)
+        self.assertEqual(set(roots), {root for root, _, _ in os.walk(self.src)})
+        # # 每次遍历的顺序相同
+        self.assertEqual(roots, [root for root, _, _ in TreeScanner(workers=4).walk(self.src)])
+
+    def test_ignore_during_traversal(self):
+        skip = {'__pycache__', '.git', 'deep', 'README.md'}
+        scanner = TreeScanner()
+        files = {entry.path for entry in scanner.walk_files(self.src, lambda root, names: skip.intersection(names))}
+        self.assertEqual(files, walk_files(self.src, skip))
+        # # 被忽略的目录没有读取
+        self.assertNotIn(os.path.join(self.src, 'pkg', 'sub', 'deep'), scanner._listings)
+        self.assertNotIn(os.path.join(self.src, '.git'), scanner._listings)
+
+    def test_cache_and_forget(self):
+        scanner = TreeScanner()
+        list(scanner.walk(self.src))
+        scans = scanner.scans
+        expected = walk_files(self.src)
+        with mock.patch.object(tree_scan.os, 'scandir', side_effect=AssertionError('不应该重新读取')):
+            self.assertEqual({entry.path for entry in scanner.walk_files(self.src)}, expected)
+        self.assertEqual(scanner.scans, scans)
+
+        new_file = os.path.join(self.src, 'pkg', 'sub', 'new.py')
+        with open(new_file, 'w'):
+            pass
+        self.assertNotIn(new_file, {entry.path for entry in scanner.walk_files(self.src)})
+        scanner.forget(os.path.join(self.src, 'pkg'))
+        self.assertIn(new_file, {entry.path for entry in scanner.walk_files(self.src)})
+        self.assertEqual(scanner.scans, scans + 5)
+
+    def test_missing_dir(self):
+        scanner = TreeScanner()
+        self.assertEqual(list(scanner.walk(os.path.join(self.temp_dir, 'missing'))),
+                         [(os.path.join(self.temp_dir, 'missing'), [], [])])
+
+    def test_entry_points_clear_shared_scanner(self):
+        # # 库调用方多次调用时, 每次都能看到目录的最新内容
+        with open(os.path.join(self.src, 'dependency.csv'), 'w', encoding='utf-8'):
+            pass
+        calls = (lambda: find_pkgs(os.path.join(self.src, 'main.py')),
+                 lambda: check_dependency_files(os.path.join(self.src, 'main.py'), self.src, pack_mode=3))
+        for i, call in enumerate(calls):
+            list(SHARED_SCANNER.walk(self.src))
+            new_file = os.path.join(self.src, 'pkg', f'new{i}.py')
+            with open(new_file, 'w'):
+                pass
+            call()
+            self.assertIn(new_file, {entry.path for entry in SHARED_SCANNER.walk_files(self.src)})
+        SHARED_SCANNER.clear()
+
+    def test_copytree_parallel(self):
+        dest = os.path.join(self.temp_dir, 'dest')
+        exclusions = ('__pycache__', 'Doc', '.*', '*.md')
+
+        def ignore_files(src, names):
+            return [name for name in names if any(fnmatch.fnmatch(name, pattern) for pattern in exclusions)]
+
+        copytree_parallel(self.src, dest, ignore_files)
+        expected = {os.path.relpath(path, self.src) for path in walk_files(self.src, {'__pycache__', 'Doc', '.git',
+                                                                                         'README.md'})}
+        self.assertEqual({os.path.relpath(path, dest) for path in walk_files(dest)}, expected)
+        self.assertTrue(os.path.isdir(os.path.join(dest, 'empty')))
+
+    def test_move_files(self):
+        project_dir = os.path.join(self.temp_dir, 'project')
+        keep = {os.path.join(self.src, name).replace('\\', '/') for name in ('main.py', 'pkg/core.pyd')}
+        move_files(self.src, project_dir, keep)
+        self.assertEqual({path.replace('\\', '/') for path in walk_files(self.src)}, keep)
+        removed_dir = os.path.join(project_dir, 'removed_file')
+        self.assertTrue(os.path.isfile(os.path.join(removed_dir, 'pkg', 'sub', 'deep', 'deeper', 'b.txt')))
+        self.assertEqual(len(walk_files(removed_dir)), len(FILES) - len(keep))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+"""
+测试xor混淆
+Created on 2026-10-18
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from embed_bootstrap import load_bootstrap
+from soeasypack.core.easy_pack import xor_bytes, xor_encrypt
+
+KEY = 'aB3dE5fG7hJ9kL1m'
+
+
+def xor_reference(data, key_bytes, offset=0):
+    """逐字节异或, 作为对照"""
+    return bytes(b ^ key_bytes[(offset + i) % len(key_bytes)] for i, b in enumerate(data))
+
+
+class TestXorEncrypt(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.temp_dir, 'soeasypack.sz')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def write(self, data):
+        with open(self.file_path, 'wb') as fp:
+            fp.write(data)
+
+    def read(self):
+        with open(self.file_path, 'rb') as fp:
+            return fp.read()
+
+    def test_xor_bytes_offset(self):
+        data = os.urandom(1000)
+        key_bytes = KEY.encode('utf-8')
+        for offset in (0, 1, 15, 16, 12345):
+            self.assertEqual(xor_bytes(data, key_bytes, offset), xor_reference(data, key_bytes, offset))
+        self.assertEqual(xor_bytes(b'', key_bytes), b'')
+
+    def test_matches_reference_across_chunks(self):
+        data = os.urandom(10007)
+        self.write(data)
+        # # 块大小不是密钥长度的整数倍, 且文件末尾是不完整的块
+        xor_encrypt(self.file_path, KEY, chunk_size=1000)
+        self.assertEqual(self.read(), xor_reference(data, KEY.encode('utf-8')))
+
+    def test_round_trip(self):
+        data = os.urandom(300000)
+        self.write(data)
+        xor_encrypt(self.file_path, KEY)
+        self.assertNotEqual(self.read(), data)
+        xor_encrypt(self.file_path, KEY)
+        self.assertEqual(self.read(), data)
+
+    def test_empty_file(self):
+        self.write(b'')
+        xor_encrypt(self.file_path, KEY)
+        self.assertEqual(self.read(), b'')
+
+    def test_bootstrap_decrypt(self):
+        """嵌入exe引导代码按偏移解密, 与打包时的混淆互逆"""
+        data = os.urandom(20003)
+        key_bytes = KEY.encode('utf-8')
+        xor_decrypt = load_bootstrap()['xor_decrypt']
+        for offset in (0, 7, 4096):
+            self.assertEqual(xor_decrypt(xor_bytes(data, key_bytes, offset), key_bytes, offset), data)
+
+
+if __name__ == '__main__':
+    unittest.main()